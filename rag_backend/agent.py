@@ -8,13 +8,17 @@ Implements multi-step reasoning for complex queries.
 import logging
 from typing import Dict, Any, List, TypedDict, Annotated, Literal
 from dataclasses import dataclass
+import numpy as np
 
-from langgraph.graph import StateGraph, END
+from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
 
+from config import QUERY_EXPANSION_MODE
 from vector_store import PropertyVectorStore
-from rag_chain import RAGSearchPipeline, IntentClassifier, RelevanceScorer
-from embeddings import QueryExpander
+from rag_chain import RAGSearchPipeline
+from query_analysis import RequestContext
+from query_expansion import use_vector_expansion
+from reranker import ResultReranker, sort_by_scores
 
 logger = logging.getLogger(__name__)
 
@@ -29,7 +33,8 @@ class AgentState(TypedDict):
     query: str
     user_preferences: Dict[str, Any]
 
-    # Analysis
+    # Analysis (memoized analysis and embeddings for this request)
+    request: RequestContext
     intent: str
     confidence: float
     extracted_filters: Dict[str, Any]
@@ -78,12 +83,10 @@ class PropertySearchAgent:
         workflow.add_node("generate_suggestions", self._generate_suggestions)
         workflow.add_node("format_output", self._format_output)
 
-        # Set entry point
-        workflow.set_entry_point("analyze_query")
-
-        # Add edges
-        workflow.add_edge("analyze_query", "expand_query")
-        workflow.add_edge("expand_query", "execute_search")
+        # Analysis and expansion run as parallel branches, joined before the search
+        workflow.add_edge(START, "analyze_query")
+        workflow.add_edge(START, "expand_query")
+        workflow.add_edge(["analyze_query", "expand_query"], "execute_search")
         workflow.add_edge("execute_search", "filter_results")
         workflow.add_edge("filter_results", "rank_results")
 
@@ -111,26 +114,21 @@ class PropertySearchAgent:
         query = state["query"]
         logger.info(f"Analyzing query: {query}")
 
-        # Classify intent
-        intent, confidence = IntentClassifier.classify(query)
-
-        # Extract structured filters
-        filters = self.vector_store._extract_filters_from_query(query)
+        # Intent, filters and expansions in one pass
+        parsed = state["request"].analyze(query)
 
         return {
-            "intent": intent,
-            "confidence": confidence,
-            "extracted_filters": filters,
+            "intent": parsed.intent,
+            "confidence": parsed.confidence,
+            "extracted_filters": parsed.filters,
             "iteration": 0,
             "should_refine": False
         }
 
     def _expand_query(self, state: AgentState) -> Dict[str, Any]:
         """Expand query with synonyms and related terms."""
-        query = state["query"]
-
-        # Use query expander
-        expanded = QueryExpander.expand_query(query)
+        # Expansions come from the analysis pass
+        expanded = state["request"].analyze(state["query"]).expanded_queries
 
         logger.info(f"Query expanded to {len(expanded)} variants")
 
@@ -146,15 +144,23 @@ class PropertySearchAgent:
         # Adjust search parameters based on iteration
         top_k = 30 if iteration == 0 else 50
 
-        # Execute hybrid search
-        results = self.vector_store.hybrid_search(query, top_k=top_k)
-
-        # Also search with expanded queries and merge
-        expanded_results = []
-        for exp_query in state.get("expanded_queries", [])[:2]:
-            if exp_query != query:
-                exp_results = self.vector_store.hybrid_search(exp_query, top_k=10)
-                expanded_results.extend(exp_results)
+        if self._vector_expansion():
+            # Synonyms folded into the query vector: a single search
+            results = self.vector_store.hybrid_search(
+                query, top_k, context=state["request"], expand=True
+            )
+            expanded_results = []
+        else:
+            # Hybrid search for the query and up to two expansions in one batch
+            # (one keyword pass, one embedding batch, one FAISS search)
+            expanded = [q for q in state.get("expanded_queries", [])[:2] if q != query]
+            result_sets = self.vector_store.hybrid_search_many(
+                [query, *expanded],
+                [top_k] + [10] * len(expanded),
+                context=state["request"]
+            )
+            results = result_sets[0]
+            expanded_results = [r for exp_results in result_sets[1:] for r in exp_results]
 
         # Deduplicate and merge
         seen_ids = {r["id"] for r in results}
@@ -171,6 +177,10 @@ class PropertySearchAgent:
             "iteration": iteration + 1
         }
 
+    def _vector_expansion(self) -> bool:
+        """Expand in embedding space (QUERY_EXPANSION_MODE vector, or auto with shipped vectors)."""
+        return use_vector_expansion(QUERY_EXPANSION_MODE, self.vector_store.synonym_vectors)
+
     def _filter_results(self, state: AgentState) -> Dict[str, Any]:
         """Apply hard filters to narrow down results."""
         results = state["search_results"]
@@ -215,43 +225,24 @@ class PropertySearchAgent:
     def _rank_results(self, state: AgentState) -> Dict[str, Any]:
         """Re-rank results using multiple signals."""
         results = state.get("refined_results", state.get("search_results", []))
-        query = state["query"]
         intent = state["intent"]
         filters = state["extracted_filters"]
 
-        for result in results:
-            base_score = result.get("_score", 0)
-            boost = 1.0
-
-            # Intent-based boosting
-            if intent == "buy" and result.get("category") == "SALE":
-                boost *= 1.2
-            elif intent == "rent" and result.get("category") == "RENT":
-                boost *= 1.2
-
-            # Filter match boosting
-            filter_matches = result.get("_filter_matches", 0)
-            boost *= (1 + 0.1 * filter_matches)
-
-            # Relevance scoring
-            relevance = RelevanceScorer.calculate_relevance(query, result)
-            result["_relevance"] = relevance
-
-            # Premium property boost (if has smart tags)
-            if result.get("smartTags"):
-                boost *= 1.1
+        reranker = ResultReranker(self.vector_store.catalog, self.vector_store.id_to_idx)
+        rows = reranker.rows(results)
+        base_scores = np.array([r.get("_score", 0) for r in results], dtype=np.float64)
+        filter_matches = np.array([r.get("_filter_matches", 0) for r in results], dtype=np.float64)
 
-            # Completeness boost (properties with more data)
-            completeness = sum([
-                1 for field in ["beds", "baths", "area", "description"]
-                if result.get(field)
-            ]) / 4
-            boost *= (1 + 0.1 * completeness)
+        # Relevance scoring (structured checks, semantic score as fallback)
+        relevance = reranker.relevance(rows, filters, base_scores)
+        for result, value in zip(results, relevance.tolist()):
+            result["_relevance"] = value
 
-            result["_final_score"] = base_score * boost
+        # Intent, filter match, smart tags and completeness boosts
+        final_scores = reranker.agent_scores(rows, base_scores, intent, filter_matches)
 
         # Sort by final score
-        results.sort(key=lambda x: x.get("_final_score", 0), reverse=True)
+        results = sort_by_scores(results, final_scores)
 
         # Check if we need to refine
         should_refine = (
@@ -375,6 +366,7 @@ class PropertySearchAgent:
         initial_state: AgentState = {
             "query": query,
             "user_preferences": user_preferences or {},
+            "request": RequestContext(query),
             "intent": "",
             "confidence": 0.0,
             "extracted_filters": {},
@@ -0,0 +1,268 @@
+"""
+Catalog Module
+==============
+Columnar view of the property catalog for vectorized filtering.
+Numeric fields are NumPy arrays, categorical fields are dictionary-encoded
+and features are stored as a bitset per property. Row i == properties[i].
+"""
+
+import sys
+import logging
+from typing import List, Dict, Any, Optional, Iterable
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Dictionary-encoded string columns
+CATEGORICAL_FIELDS = ("category", "type", "location", "city")
+
+# Fields counted by the completeness ranking prior
+COMPLETENESS_FIELDS = ("beds", "baths", "area", "description")
+
+# Numeric filter keys (query analysis and API spellings) -> type
+NUMERIC_FILTERS = {
+    "min_price": float, "minPrice": float,
+    "max_price": float, "maxPrice": float,
+    "min_area": float, "minArea": float,
+    "max_area": float, "maxArea": float,
+    "beds": int, "min_beds": int,
+}
+
+
+def normalize_filters(filters: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Copy of a filter dict with numeric filters converted to numbers
+    (API clients may send "5000") and a single feature string wrapped in
+    a list. Raises ValueError on invalid values.
+    """
+    normalized = dict(filters)
+    features = normalized.get("features")
+    if isinstance(features, str):
+        normalized["features"] = [features]
+    elif features is not None:
+        if not isinstance(features, (list, tuple)) or not all(isinstance(f, str) for f in features):
+            raise ValueError("Filter 'features' must be a string or a list of strings")
+        normalized["features"] = list(features)
+    for key, kind in NUMERIC_FILTERS.items():
+        value = normalized.get(key)
+        if value is None:
+            continue
+        if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+            raise ValueError(f"Filter '{key}' must be a number")
+        try:
+            number = float(value)
+        except ValueError:
+            raise ValueError(f"Filter '{key}' must be a number, got {value!r}")
+        if not np.isfinite(number):
+            raise ValueError(f"Filter '{key}' must be a finite number, got {value!r}")
+        if kind is int and not number.is_integer():
+            raise ValueError(f"Filter '{key}' must be an integer, got {value!r}")
+        normalized[key] = kind(number)
+    return normalized
+
+
+class PropertyCatalog:
+    """
+    Columnar property catalog.
+    Structured filters run as vectorized mask operations instead of
+    list comprehensions over dicts.
+    """
+
+    def __init__(
+        self,
+        properties: List[Dict[str, Any]],
+        present: Optional[Dict[str, np.ndarray]] = None
+    ):
+        """
+        present: per-row "non-empty" flags for fields the property dicts
+        leave out (cold metadata fields), used by the completeness prior.
+        """
+        self.size = len(properties)
+        present = present or {}
+
+        # Numeric columns (missing values count as 0, like `or 0` in the filters)
+        self.price = np.array([p.get("priceNumeric") or 0 for p in properties], dtype=np.float64)
+        self.area = np.array([p.get("areaNumeric") or 0 for p in properties], dtype=np.float64)
+        self.beds = np.array([p.get("beds") or 0 for p in properties], dtype=np.int16)
+        self.baths = np.array([p.get("baths") or 0 for p in properties], dtype=np.int16)
+
+        # Dictionary-encoded categorical columns (-1 = missing)
+        self.codes: Dict[str, np.ndarray] = {}
+        self.vocabularies: Dict[str, List[str]] = {}
+        self._lookup: Dict[str, Dict[str, int]] = {}
+        for field in CATEGORICAL_FIELDS:
+            self._encode(field, properties)
+
+        # Feature bitset: one bit per distinct (case-insensitive) feature
+        self.feature_names: List[str] = []
+        self._feature_bits: Dict[str, int] = {}
+        for prop in properties:
+            for feature in prop.get("features") or []:
+                key = feature.lower()
+                if key not in self._feature_bits:
+                    self._feature_bits[key] = len(self.feature_names)
+                    self.feature_names.append(feature)
+
+        words = max(1, (len(self.feature_names) + 63) // 64)
+        self.features = np.zeros((self.size, words), dtype=np.uint64)
+        for row, prop in enumerate(properties):
+            for feature in prop.get("features") or []:
+                bit = self._feature_bits[feature.lower()]
+                self.features[row, bit // 64] |= np.uint64(1 << (bit % 64))
+
+        # Query-independent ranking priors
+        self.completeness = np.array(
+            [sum(1 for f in COMPLETENESS_FIELDS if f not in present and p.get(f)) for p in properties],
+            dtype=np.float64
+        )
+        for field in COMPLETENESS_FIELDS:
+            if field in present:
+                self.completeness += present[field]
+        self.completeness /= len(COMPLETENESS_FIELDS)
+        self.has_smart_tags = np.array([bool(p.get("smartTags")) for p in properties], dtype=bool)
+
+        logger.info(
+            f"Catalog built: {self.size} properties, "
+            f"{sum(len(v) for v in self.vocabularies.values())} categorical values, "
+            f"{len(self.feature_names)} features"
+        )
+
+    def _encode(self, field: str, properties: List[Dict[str, Any]]) -> None:
+        """Dictionary-encode a string field and intern the shared values."""
+        lookup: Dict[str, int] = {}
+        vocabulary: List[str] = []
+        codes = np.full(self.size, -1, dtype=np.int32)
+
+        for row, prop in enumerate(properties):
+            value = prop.get(field)
+            if not isinstance(value, str):
+                continue
+            code = lookup.get(value)
+            if code is None:
+                code = len(vocabulary)
+                lookup[value] = code
+                vocabulary.append(sys.intern(value))
+            # Every property now shares one string object per distinct value
+            prop[field] = vocabulary[code]
+            codes[row] = code
+
+        self.codes[field] = codes
+        self.vocabularies[field] = vocabulary
+        self._lookup[field] = lookup
+
+    # ========================================================================
+    # MASKS
+    # ========================================================================
+
+    def equals_mask(self, field: str, value: str) -> np.ndarray:
+        """Rows whose categorical field equals the value exactly."""
+        code = self._lookup[field].get(value)
+        if code is None:
+            return np.zeros(self.size, dtype=bool)
+        return self.codes[field] == code
+
+    def contains_mask(self, field: str, text: str) -> np.ndarray:
+        """Rows whose categorical field contains the text (case-insensitive)."""
+        text_lower = text.lower()
+        matching = [
+            code for code, value in enumerate(self.vocabularies[field])
+            if text_lower in value.lower()
+        ]
+        return np.isin(self.codes[field], matching)
+
+    def features_mask(self, features: Iterable[str]) -> np.ndarray:
+        """Rows having every required feature (case-insensitive)."""
+        required = np.zeros(self.features.shape[1], dtype=np.uint64)
+        for feature in features:
+            bit = self._feature_bits.get(feature.lower())
+            if bit is None:
+                return np.zeros(self.size, dtype=bool)
+            required[bit // 64] |= np.uint64(1 << (bit % 64))
+        return np.all((self.features & required) == required, axis=1)
+
+    def mask(
+        self,
+        category: Optional[str] = None,
+        type: Optional[str] = None,
+        location: Optional[str] = None,
+        city: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        min_area: Optional[float] = None,
+        max_area: Optional[float] = None,
+        min_beds: Optional[int] = None,
+        features: Optional[Iterable[str]] = None
+    ) -> np.ndarray:
+        """
+        Build a boolean mask for structured filters.
+        category/type match exactly, location/city by substring.
+        """
+        mask = np.ones(self.size, dtype=bool)
+
+        if category:
+            mask &= self.equals_mask("category", category)
+        if type:
+            mask &= self.equals_mask("type", type)
+        if location:
+            mask &= self.contains_mask("location", location)
+        if city:
+            mask &= self.contains_mask("city", city)
+        if min_price is not None:
+            mask &= self.price >= min_price
+        if max_price is not None:
+            mask &= self.price <= max_price
+        if min_area is not None:
+            mask &= self.area >= min_area
+        if max_area is not None:
+            mask &= self.area <= max_area
+        if min_beds is not None:
+            mask &= self.beds >= min_beds
+        if features:
+            mask &= self.features_mask(features)
+
+        return mask
+
+    def mask_from_filters(self, filters: Dict[str, Any]) -> np.ndarray:
+        """
+        Build a mask from a filter dict as produced by query analysis
+        ({type, category, beds, location, features}) or sent by API
+        clients (minPrice, maxPrice, minArea, maxArea, city).
+        Raises ValueError on non-numeric price / area / beds values.
+        """
+        filters = normalize_filters(filters)
+        return self.mask(
+            category=filters.get("category"),
+            type=filters.get("type"),
+            location=filters.get("location"),
+            city=filters.get("city"),
+            min_price=filters.get("min_price", filters.get("minPrice")),
+            max_price=filters.get("max_price", filters.get("maxPrice")),
+            min_area=filters.get("min_area", filters.get("minArea")),
+            max_area=filters.get("max_area", filters.get("maxArea")),
+            min_beds=filters.get("beds", filters.get("min_beds")),
+            features=filters.get("features")
+        )
+
+    # ========================================================================
+    # HELPERS
+    # ========================================================================
+
+    def sort_indices(
+        self,
+        indices: np.ndarray,
+        column: str,
+        descending: bool = False
+    ) -> np.ndarray:
+        """Stable sort of row indices by a numeric column."""
+        values = getattr(self, column)[indices]
+        order = np.argsort(-values if descending else values, kind="stable")
+        return indices[order]
+
+    def value_counts(self, field: str, mask: Optional[np.ndarray] = None) -> Dict[str, int]:
+        """Count rows per categorical value (missing values are skipped)."""
+        codes = self.codes[field] if mask is None else self.codes[field][mask]
+        counts = np.bincount(codes[codes >= 0], minlength=len(self.vocabularies[field]))
+        return {
+            self.vocabularies[field][code]: int(count)
+            for code, count in enumerate(counts) if count > 0
+        }
@@ -0,0 +1,119 @@
+"""
+Catalog Loader Module
+=====================
+Streaming reader for property catalogs (properties.json, metadata).
+Listings are yielded one at a time from a JSONL file (one listing per
+line) or, for JSON arrays / {"properties": [...]}, through the ijson
+incremental parser: the raw file is never held in memory, and batch
+consumers keep at most one batch of parsed listings.
+"""
+
+import os
+import logging
+from itertools import islice
+from pathlib import Path
+from typing import List, Dict, Any, Iterable, Iterator, Optional
+import orjson
+
+try:
+    import ijson
+    IJSON_AVAILABLE = True
+except ImportError:
+    IJSON_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+JSONL_SUFFIX = ".jsonl"
+DEFAULT_BATCH_SIZE = 1000
+
+
+def catalog_path(path: Path) -> Path:
+    """The JSONL variant of a JSON catalog when it exists next to it, else the path."""
+    path = Path(path)
+    jsonl = path.with_suffix(JSONL_SUFFIX)
+    return jsonl if path.suffix != JSONL_SUFFIX and jsonl.exists() else path
+
+
+def _json_prefix(f) -> str:
+    """ijson prefix of the listings: top-level array or {"properties": [...]}."""
+    while True:
+        char = f.read(1)
+        if not char or not char.isspace():
+            break
+    f.seek(0)
+    return "item" if char == b"[" else "properties.item"
+
+
+def iter_properties(path: Path) -> Iterator[Dict[str, Any]]:
+    """Yield the listings of a catalog file in order."""
+    path = Path(path)
+    with open(path, "rb") as f:
+        if path.suffix == JSONL_SUFFIX:
+            for line in f:
+                if line.strip():
+                    yield orjson.loads(line)
+            return
+
+        if not IJSON_AVAILABLE:
+            logger.warning(f"ijson not installed - reading {path.name} in one piece")
+            data = orjson.loads(f.read())
+            yield from (data["properties"] if isinstance(data, dict) and "properties" in data else data)
+            return
+
+        yield from ijson.items(f, _json_prefix(f), use_float=True)
+
+
+def iter_batches(path: Path, batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[List[Dict[str, Any]]]:
+    """Listings in lists of up to batch_size."""
+    listings = iter_properties(path)
+    while True:
+        batch = list(islice(listings, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def read_catalog(path: Path) -> List[Dict[str, Any]]:
+    """All listings of a catalog file (streamed, without the raw file in memory)."""
+    return list(iter_properties(path))
+
+
+def write_jsonl(properties: Iterable[Dict[str, Any]], path: Path) -> int:
+    """Write listings one per line (atomically); returns the count."""
+    path = Path(path)
+    tmp = path.with_name(f"{path.name}.tmp")
+    count = 0
+    with open(tmp, "wb") as f:
+        for prop in properties:
+            f.write(orjson.dumps(prop))
+            f.write(b"\n")
+            count += 1
+    os.replace(tmp, path)
+    return count
+
+
+class PropertyStream:
+    """
+    Re-iterable view of a catalog file: every iteration streams the file
+    again, len() counts the listings once. For multi-pass consumers
+    (index building) that must not hold the whole catalog.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._count: Optional[int] = None
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return iter_properties(self.path)
+
+    def __len__(self) -> int:
+        if self._count is None:
+            self._count = sum(1 for _ in self)
+        return self._count
+
+    def head(self, n: int) -> List[Dict[str, Any]]:
+        """The first n listings."""
+        return list(islice(self, n))
+
+    def batches(self, batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[List[Dict[str, Any]]]:
+        return iter_batches(self.path, batch_size)
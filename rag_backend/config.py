@@ -21,7 +21,6 @@ PARENT_DATA_DIR = PROJECT_DIR / "data"
 DATA_DIR = LOCAL_DATA_DIR if LOCAL_DATA_DIR.exists() else PARENT_DATA_DIR
 PROPERTIES_JSON = DATA_DIR / "properties.json"
 FAISS_INDEX_PATH = BASE_DIR / "faiss_index"
-EMBEDDINGS_CACHE = BASE_DIR / "embeddings_cache.pkl"
 
 # ============================================================================
 # MODEL CONFIGURATION
@@ -38,14 +37,50 @@ EMBEDDING_DIMENSION = 384
 EMBEDDING_MODEL_LITE = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
 EMBEDDING_DIMENSION_LITE = 384
 
+# ONNX Runtime export of EMBEDDING_MODEL written by generate_index.py:
+# encodes queries on CPU without PyTorch, in the same space as the index.
+# QUERY_ENCODER: auto (ONNX when exported) | onnx | openai (never local)
+QUERY_ENCODER = os.getenv("QUERY_ENCODER", "auto")
+ONNX_MODEL_DIR = Path(os.getenv("ONNX_MODEL_DIR", str(BASE_DIR / "onnx_model")))
+ONNX_QUANTIZED = os.getenv("ONNX_QUANTIZED", "true").lower() == "true"
+ONNX_THREADS = int(os.getenv("ONNX_THREADS", "1"))
+
 # ============================================================================
 # SEARCH CONFIGURATION
 # ============================================================================
 
+# FAISS index type: auto | flat | hnsw | ivf-flat | ivf-pq
+# (auto = exact flat scan for small catalogs, HNSW then IVF-PQ as it grows)
+FAISS_INDEX_TYPE = os.getenv("FAISS_INDEX_TYPE", "auto")
+
 # Top-K results for semantic search
 DEFAULT_TOP_K = 20
 MAX_TOP_K = 50
 
+# Similar properties: neighbors precomputed per property (exact table is
+# built at startup only for catalogs up to SIMILAR_PRECOMPUTE_MAX)
+SIMILAR_NEIGHBORS = 20
+SIMILAR_PRECOMPUTE_MAX = 5000
+
+# Query embedding cache: in-process LRU (entries, TTL seconds) in front of
+# a SQLite store that survives restarts (QUERY_CACHE_DB="" disables it;
+# same TTL, at most QUERY_CACHE_DB_SIZE rows)
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "2048"))
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "86400"))
+QUERY_CACHE_DB = os.getenv("QUERY_CACHE_DB", str(BASE_DIR / "cache" / "query_embeddings.sqlite3"))
+QUERY_CACHE_DB_SIZE = int(os.getenv("QUERY_CACHE_DB_SIZE", "100000"))
+
+# Document embedding cache keyed by hash(document text, model, dimension),
+# shared with generate_index.py: rebuilds only encode changed listings
+# (DOCUMENT_CACHE_DB="" disables it)
+DOCUMENT_CACHE_DB = os.getenv("DOCUMENT_CACHE_DB", str(BASE_DIR / "cache" / "document_embeddings.sqlite3"))
+
+# Search queue (PropertyVectorStore): queries arriving within
+# SEARCH_BATCH_WAIT_MS are encoded and searched together, up to
+# SEARCH_BATCH_SIZE per batch (1 = off, every request searches alone)
+SEARCH_BATCH_SIZE = int(os.getenv("SEARCH_BATCH_SIZE", "32"))
+SEARCH_BATCH_WAIT_MS = float(os.getenv("SEARCH_BATCH_WAIT_MS", "2"))
+
 # Minimum similarity score (0-1) to include results
 MIN_SIMILARITY_THRESHOLD = 0.25
 
@@ -54,6 +89,27 @@ EXACT_MATCH_BOOST = 2.0
 PARTIAL_MATCH_BOOST = 1.5
 SEMANTIC_MATCH_BOOST = 1.0
 
+# Keyword index field weights (per matching query term)
+KEYWORD_FIELD_WEIGHTS = {
+    "name": PARTIAL_MATCH_BOOST,
+    "location": PARTIAL_MATCH_BOOST * 0.9,
+    "type": PARTIAL_MATCH_BOOST * 0.8,
+    "features": PARTIAL_MATCH_BOOST * 0.7,
+    "description": PARTIAL_MATCH_BOOST * 0.5,
+    "city": PARTIAL_MATCH_BOOST * 0.6,
+}
+
+# Keyword index weights when the full query matches a field
+KEYWORD_PHRASE_WEIGHTS = {
+    "name": EXACT_MATCH_BOOST * 2,
+    "location": EXACT_MATCH_BOOST * 1.5,
+    "type": EXACT_MATCH_BOOST,
+}
+
+# Keyword hits fused into a hybrid search (best first); the rest of the
+# matching listings get no keyword score
+KEYWORD_FUSION_TOP_K = 50
+
 # ============================================================================
 # RAG CONFIGURATION
 # ============================================================================
@@ -66,6 +122,14 @@ CHUNK_SEPARATOR = " | "
 ENABLE_QUERY_EXPANSION = True
 MAX_QUERY_EXPANSIONS = 3
 
+# Agent expansion mode: text (one search per rewritten query, default
+# until vector expansion has been evaluated), vector (synonyms folded into
+# the query vector, one search) or auto (vector when generate_index.py
+# shipped synonym_vectors.npz). SYNONYM_EXPANSION_WEIGHT is the weight
+# of the synonym centroid against the query vector.
+QUERY_EXPANSION_MODE = os.getenv("QUERY_EXPANSION_MODE", "text")
+SYNONYM_EXPANSION_WEIGHT = float(os.getenv("SYNONYM_EXPANSION_WEIGHT", "0.3"))
+
 # ============================================================================
 # LANGGRAPH AGENT CONFIGURATION
 # ============================================================================
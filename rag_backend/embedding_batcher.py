@@ -0,0 +1,201 @@
+"""
+Embedding Batcher Module
+========================
+Micro-batching of concurrent query embedding calls.
+Requests waiting on an embedding at the same time are collected for a
+few milliseconds (or until the batch is full) and sent as one list-input
+call; each caller gets its own row back. Fewer API requests against the
+rate limit, more throughput during traffic spikes.
+"""
+
+import time
+import queue
+import logging
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Dict, Any, Callable, Optional, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BATCH = 32
+DEFAULT_MAX_WAIT_MS = 5.0
+DEFAULT_MAX_INFLIGHT = 4
+
+
+class MicroBatcher(ABC):
+    """
+    Coalesces items submitted from many threads into batches.
+    Subclasses implement process_batch().
+    A collector thread opens a batch on the first pending item, waits up
+    to max_wait_ms for more (max_batch at most) and hands the batch to a
+    small pool, so up to max_inflight process_batch() calls run at once.
+    """
+
+    def __init__(
+        self,
+        max_batch: int = DEFAULT_MAX_BATCH,
+        max_wait_ms: float = DEFAULT_MAX_WAIT_MS,
+        max_inflight: int = DEFAULT_MAX_INFLIGHT,
+        name: str = "batch"
+    ):
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.max_inflight = max_inflight
+        self.name = name
+
+        self._queue: "queue.Queue[Optional[Tuple[Any, Future, float]]]" = queue.Queue()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._collector: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._counters = {
+            "requests": 0,
+            "batches": 0,
+            "largest_batch": 0,
+            "errors": 0,
+        }
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    @abstractmethod
+    def process_batch(self, items: List[Any]) -> List[Any]:
+        """One result per item, in order."""
+
+    def _ensure_started(self) -> None:
+        with self._lock:
+            if self._collector is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_inflight, thread_name_prefix=self.name
+                )
+                self._collector = threading.Thread(
+                    target=self._collect, name=f"{self.name}-collector", daemon=True
+                )
+                self._collector.start()
+
+    def submit(self, item: Any) -> Future:
+        """Queue an item; the future resolves to its result."""
+        future: Future = Future()
+        if self.max_batch <= 1:
+            # Batching disabled: processed in the calling thread
+            self._flush([(item, future, time.monotonic())])
+            return future
+
+        self._ensure_started()
+        self._queue.put((item, future, time.monotonic()))
+        return future
+
+    def call(self, item: Any) -> Any:
+        """Result of one item (blocks until its batch is processed)."""
+        return self.submit(item).result()
+
+    # ========================================================================
+    # WORKER
+    # ========================================================================
+
+    def _collect(self) -> None:
+        executor = self._executor
+        while True:
+            entry = self._queue.get()
+            if entry is None:
+                return
+            batch = [entry]
+            deadline = time.monotonic() + self.max_wait
+            closing = False
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    entry = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if entry is None:
+                    closing = True
+                    break
+                batch.append(entry)
+            executor.submit(self._flush, batch)
+            if closing:
+                return
+
+    def _flush(self, batch: List[Tuple[Any, Future, float]]) -> None:
+        """Run process_batch() and resolve every future of the batch."""
+        now = time.monotonic()
+        waits = [now - enqueued_at for _, _, enqueued_at in batch]
+        with self._lock:
+            self._counters["requests"] += len(batch)
+            self._counters["batches"] += 1
+            self._counters["largest_batch"] = max(self._counters["largest_batch"], len(batch))
+            self._wait_total += sum(waits)
+            self._wait_max = max(self._wait_max, max(waits))
+
+        try:
+            results = self.process_batch([item for item, _, _ in batch])
+        except Exception as e:
+            logger.warning(f"Batched call failed ({self.name}, {len(batch)} items): {e}")
+            with self._lock:
+                self._counters["errors"] += 1
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+
+        for (_, future, _), result in zip(batch, results):
+            future.set_result(result)
+
+    # ========================================================================
+    # API
+    # ========================================================================
+
+    def stats(self) -> Dict[str, Any]:
+        """Batch counters (avg_batch = requests per call) and queue wait times."""
+        with self._lock:
+            requests = self._counters["requests"]
+            batches = self._counters["batches"]
+            return {
+                **self._counters,
+                "avg_batch": round(requests / batches, 2) if batches else 0.0,
+                "queue_wait_avg_ms": round(self._wait_total / requests * 1000, 3) if requests else 0.0,
+                "queue_wait_max_ms": round(self._wait_max * 1000, 3),
+                "max_batch": self.max_batch,
+                "max_wait_ms": self.max_wait * 1000
+            }
+
+    def close(self) -> None:
+        """Flush what is queued and stop the worker threads (restarted on next use)."""
+        with self._lock:
+            collector, executor = self._collector, self._executor
+            self._collector = self._executor = None
+        if collector is not None:
+            self._queue.put(None)
+            collector.join()
+            executor.shutdown(wait=True)
+
+
+class EmbeddingBatcher(MicroBatcher):
+    """
+    Single-text embedding calls coalesced into one embed_fn(texts) call
+    per batch; duplicate texts are sent once.
+    """
+
+    def __init__(
+        self,
+        embed_fn: Callable[[List[str]], np.ndarray],
+        max_batch: int = DEFAULT_MAX_BATCH,
+        max_wait_ms: float = DEFAULT_MAX_WAIT_MS,
+        max_inflight: int = DEFAULT_MAX_INFLIGHT
+    ):
+        super().__init__(max_batch, max_wait_ms, max_inflight, name="embed-batch")
+        self.embed_fn = embed_fn
+        self._counters["texts_sent"] = 0
+
+    def process_batch(self, texts: List[str]) -> List[np.ndarray]:
+        distinct = list(dict.fromkeys(texts))
+        with self._lock:
+            self._counters["texts_sent"] += len(distinct)
+        vectors = self.embed_fn(distinct)
+        rows = {text: i for i, text in enumerate(distinct)}
+        return [vectors[rows[text]] for text in texts]
+
+    def embed(self, text: str) -> np.ndarray:
+        """Embedding of one text (blocks until its batch returns)."""
+        return self.call(text)
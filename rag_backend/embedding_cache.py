@@ -0,0 +1,426 @@
+"""
+Embedding Cache Module
+======================
+Two-tier cache for query embeddings.
+Tier 1 is a bounded in-process LRU with a TTL, tier 2 a SQLite table
+that survives restarts (same TTL, capped, written in batches). Entries are keyed on the normalized query
+(case, accents, whitespace) plus the embedding model and dimension, so
+repeats of popular queries skip the embedding model / OpenAI entirely.
+
+Document embeddings have their own persistent cache, keyed on a hash of
+the document text, model and dimension: index rebuilds only encode the
+listings whose text changed.
+"""
+
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Callable, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 2048
+DEFAULT_TTL_SECONDS = 24 * 3600
+DEFAULT_MAX_DISK_ENTRIES = 100_000
+
+# Query cache writes are flushed to SQLite per batch, or once the oldest
+# pending write is this old
+WRITE_BATCH = 32
+WRITE_DELAY_SECONDS = 5.0
+
+# Rows per SELECT ... IN (...) (SQLite caps bound parameters)
+LOOKUP_CHUNK = 500
+
+
+def normalize_query(query: str) -> str:
+    """Cache key text: casefolded, accents stripped, whitespace collapsed."""
+    decomposed = unicodedata.normalize("NFKD", query.casefold())
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(stripped.split())
+
+
+class QueryEmbeddingCache:
+    """
+    Memory LRU (TTL) in front of an optional SQLite store.
+    Thread-safe; the database is opened on first use and only touched
+    outside the memory-tier lock. Writes are queued and flushed in
+    batches; each flush drops expired rows and the oldest ones beyond
+    max_disk_entries. Cached vectors are read-only arrays shared between
+    callers.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        dimension: int,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        db_path: Optional[Path] = None,
+        max_disk_entries: int = DEFAULT_MAX_DISK_ENTRIES
+    ):
+        self.model = model
+        self.dimension = dimension
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.db_path = Path(db_path) if db_path else None
+        self.max_disk_entries = max_disk_entries
+
+        self._memory: "OrderedDict[str, Tuple[np.ndarray, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self._db_failed = False
+        self._pending: List[Tuple[str, bytes, float]] = []
+        self._counters = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "expired": 0,
+            "evictions": 0,
+            "disk_pruned": 0,
+        }
+
+    # ========================================================================
+    # DISK TIER
+    # ========================================================================
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        """Open the SQLite store (once, under _db_lock); a failure disables the disk tier."""
+        if self._db is not None or self._db_failed or self.db_path is None:
+            return self._db
+        try:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            db = sqlite3.connect(str(self.db_path), check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS query_embeddings ("
+                " model TEXT NOT NULL, dimension INTEGER NOT NULL, query TEXT NOT NULL,"
+                " vector BLOB NOT NULL, created_at REAL NOT NULL,"
+                " PRIMARY KEY (model, dimension, query))"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS query_embeddings_age ON query_embeddings (created_at)")
+            db.commit()
+            self._db = db
+            logger.info(f"Query embedding cache at {self.db_path}")
+        except sqlite3.Error as e:
+            logger.warning(f"Query embedding disk cache disabled: {e}")
+            self._db_failed = True
+        return self._db
+
+    def _disk_get(self, key: str) -> Tuple[Optional[np.ndarray], bool]:
+        """(vector, expired): rows older than the TTL are not served."""
+        with self._db_lock:
+            db = self._connect()
+            if db is None:
+                return None, False
+            try:
+                row = db.execute(
+                    "SELECT vector, created_at FROM query_embeddings"
+                    " WHERE model = ? AND dimension = ? AND query = ?",
+                    (self.model, self.dimension, key)
+                ).fetchone()
+            except sqlite3.Error as e:
+                logger.warning(f"Query embedding cache read failed: {e}")
+                return None, False
+        if row is None:
+            return None, False
+        if row[1] + self.ttl_seconds <= time.time():
+            return None, True
+        return np.frombuffer(row[0], dtype=np.float32), False
+
+    def _queue_write(self, key: str, vector: np.ndarray) -> Optional[List[Tuple[str, bytes, float]]]:
+        """Queue a disk write (under _lock); returns the batch to flush when due."""
+        if self.db_path is None or self._db_failed:
+            return None
+        self._pending.append((key, vector.tobytes(), time.time()))
+        if len(self._pending) >= WRITE_BATCH or time.time() - self._pending[0][2] >= WRITE_DELAY_SECONDS:
+            batch, self._pending = self._pending, []
+            return batch
+        return None
+
+    def _disk_write(self, batch: List[Tuple[str, bytes, float]]) -> None:
+        """Write a batch in one transaction, then prune expired and excess rows."""
+        with self._db_lock:
+            db = self._connect()
+            if db is None:
+                return
+            try:
+                db.executemany(
+                    "INSERT OR REPLACE INTO query_embeddings VALUES (?, ?, ?, ?, ?)",
+                    [(self.model, self.dimension, key, blob, created_at) for key, blob, created_at in batch]
+                )
+                pruned = db.execute(
+                    "DELETE FROM query_embeddings WHERE created_at <= ?",
+                    (time.time() - self.ttl_seconds,)
+                ).rowcount
+                pruned += db.execute(
+                    "DELETE FROM query_embeddings WHERE rowid IN ("
+                    " SELECT rowid FROM query_embeddings ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_disk_entries,)
+                ).rowcount
+                db.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Query embedding cache write failed: {e}")
+                return
+        if pruned:
+            with self._lock:
+                self._counters["disk_pruned"] += pruned
+
+    def flush(self) -> None:
+        """Write the queued embeddings to the disk tier now."""
+        with self._lock:
+            batch, self._pending = self._pending, []
+        if batch:
+            self._disk_write(batch)
+
+    # ========================================================================
+    # MEMORY TIER
+    # ========================================================================
+
+    def _memory_put(self, key: str, vector: np.ndarray) -> None:
+        self._memory[key] = (vector, time.monotonic() + self.ttl_seconds)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    # ========================================================================
+    # API
+    # ========================================================================
+
+    def get(self, query: str) -> Optional[np.ndarray]:
+        """Cached embedding of the query, or None."""
+        key = normalize_query(query)
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                vector, expires_at = entry
+                if expires_at > time.monotonic():
+                    self._memory.move_to_end(key)
+                    self._counters["memory_hits"] += 1
+                    return vector
+                del self._memory[key]
+                self._counters["expired"] += 1
+
+        # Disk tier outside the lock: a slow read never blocks memory hits
+        vector, expired = self._disk_get(key)
+        with self._lock:
+            if expired:
+                self._counters["expired"] += 1
+            if vector is not None and len(vector) == self.dimension:
+                self._memory_put(key, vector)
+                self._counters["disk_hits"] += 1
+                return vector
+
+            self._counters["misses"] += 1
+            return None
+
+    def put(self, query: str, vector: np.ndarray) -> np.ndarray:
+        """Store an embedding; returns the read-only cached array."""
+        key = normalize_query(query)
+        vector = np.array(vector, dtype=np.float32).ravel()
+        vector.setflags(write=False)
+        with self._lock:
+            self._memory_put(key, vector)
+            batch = self._queue_write(key, vector)
+        if batch:
+            self._disk_write(batch)
+        return vector
+
+    def get_or_compute(self, query: str, compute: Callable[[str], np.ndarray]) -> np.ndarray:
+        """Cached embedding, computing and storing it on a miss."""
+        vector = self.get(query)
+        if vector is None:
+            vector = self.put(query, compute(query))
+        return vector
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and tier sizes."""
+        disk_entries = None
+        with self._db_lock:
+            if self._db is not None:
+                try:
+                    disk_entries = self._db.execute(
+                        "SELECT COUNT(*) FROM query_embeddings WHERE model = ? AND dimension = ?",
+                        (self.model, self.dimension)
+                    ).fetchone()[0]
+                except sqlite3.Error:
+                    pass
+        with self._lock:
+            lookups = self._counters["memory_hits"] + self._counters["disk_hits"] + self._counters["misses"]
+            hits = lookups - self._counters["misses"]
+            return {
+                **self._counters,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "disk_entries": disk_entries,
+                "pending_writes": len(self._pending),
+                "model": self.model,
+                "dimension": self.dimension
+            }
+
+    def clear_memory(self) -> None:
+        """Drop the in-process tier (the disk tier is kept)."""
+        with self._lock:
+            self._memory.clear()
+
+    def close(self) -> None:
+        """Flush queued writes and close the database."""
+        self.flush()
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+class DocumentEmbeddingCache:
+    """
+    Persistent document text -> embedding store (SQLite, no expiry).
+    Keys hash the text together with the model and dimension, so a model
+    change never serves old vectors. Without a database path every
+    lookup misses and embed() simply encodes.
+    """
+
+    def __init__(self, model: str, dimension: int, db_path: Optional[Path] = None):
+        self.model = model
+        self.dimension = dimension
+        self.db_path = Path(db_path) if db_path else None
+
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_failed = False
+        self._counters = {
+            "hits": 0,
+            "misses": 0,
+            "encoded": 0,
+        }
+
+    def key(self, text: str) -> str:
+        """Hash of document text + model + dimension."""
+        return hashlib.sha256(f"{self.model}\0{self.dimension}\0{text}".encode("utf-8")).hexdigest()
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        """Open the SQLite store (once); a failure disables the cache."""
+        if self._db is not None or self._db_failed or self.db_path is None:
+            return self._db
+        try:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            db = sqlite3.connect(str(self.db_path), check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS document_embeddings ("
+                " key TEXT PRIMARY KEY, model TEXT NOT NULL, dimension INTEGER NOT NULL,"
+                " vector BLOB NOT NULL, created_at REAL NOT NULL)"
+            )
+            db.commit()
+            self._db = db
+            logger.info(f"Document embedding cache at {self.db_path}")
+        except sqlite3.Error as e:
+            logger.warning(f"Document embedding cache disabled: {e}")
+            self._db_failed = True
+        return self._db
+
+    def get_many(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """Cached embedding per text (None where missing)."""
+        keys = [self.key(text) for text in texts]
+        found: Dict[str, np.ndarray] = {}
+        with self._lock:
+            db = self._connect()
+            if db is not None:
+                distinct = list(dict.fromkeys(keys))
+                try:
+                    for start in range(0, len(distinct), LOOKUP_CHUNK):
+                        chunk = distinct[start:start + LOOKUP_CHUNK]
+                        rows = db.execute(
+                            f"SELECT key, vector FROM document_embeddings"
+                            f" WHERE key IN ({','.join('?' * len(chunk))})",
+                            chunk
+                        ).fetchall()
+                        for key, blob in rows:
+                            vector = np.frombuffer(blob, dtype=np.float32)
+                            if len(vector) == self.dimension:
+                                found[key] = vector
+                except sqlite3.Error as e:
+                    logger.warning(f"Document embedding cache read failed: {e}")
+        return [found.get(key) for key in keys]
+
+    def put_many(self, texts: List[str], vectors: np.ndarray) -> None:
+        """Store embeddings (one transaction)."""
+        now = time.time()
+        rows = [
+            (self.key(text), self.model, self.dimension,
+             np.asarray(vector, dtype=np.float32).tobytes(), now)
+            for text, vector in zip(texts, vectors)
+        ]
+        with self._lock:
+            db = self._connect()
+            if db is None:
+                return
+            try:
+                db.executemany("INSERT OR REPLACE INTO document_embeddings VALUES (?, ?, ?, ?, ?)", rows)
+                db.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Document embedding cache write failed: {e}")
+
+    def embed(
+        self,
+        texts: List[str],
+        encode_fn: Callable[[List[str]], np.ndarray],
+        refresh: bool = False
+    ) -> np.ndarray:
+        """
+        Embeddings (len(texts), dimension) float32: cached rows are reused,
+        the distinct missing texts go to encode_fn in one call and are
+        stored. refresh=True re-encodes (and re-stores) everything.
+        """
+        vectors = [None] * len(texts) if refresh else self.get_many(texts)
+        misses = sum(1 for vector in vectors if vector is None)
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, vectors) if vector is None))
+
+        if missing:
+            encoded = np.asarray(encode_fn(missing), dtype=np.float32)
+            self.put_many(missing, encoded)
+            rows = dict(zip(missing, encoded))
+            vectors = [rows[text] if vector is None else vector for text, vector in zip(texts, vectors)]
+
+        with self._lock:
+            self._counters["hits"] += len(texts) - misses
+            self._counters["misses"] += misses
+            self._counters["encoded"] += len(missing)
+
+        if not vectors:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        return np.vstack(vectors).astype(np.float32, copy=False)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters (per document) and stored entries for this model."""
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"]
+            entries = None
+            if self._db is not None:
+                try:
+                    entries = self._db.execute(
+                        "SELECT COUNT(*) FROM document_embeddings WHERE model = ? AND dimension = ?",
+                        (self.model, self.dimension)
+                    ).fetchone()[0]
+                except sqlite3.Error:
+                    pass
+            return {
+                **self._counters,
+                "hit_rate": round(self._counters["hits"] / lookups, 4) if lookups else 0.0,
+                "entries": entries,
+                "model": self.model,
+                "dimension": self.dimension
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
@@ -0,0 +1,192 @@
+"""
+Embedding Pipeline Module
+=========================
+Streaming, resumable bulk document embedding for generate_index.py.
+Texts are consumed lazily in chunks, encoded (across a multi-process
+SentenceTransformer pool for large catalogs) and written straight into
+an on-disk .npy memmap. A checkpoint after every chunk records how many
+rows are done and a digest of their texts, so an interrupted build
+resumes where it stopped instead of starting over.
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+from itertools import islice
+from pathlib import Path
+from typing import List, Dict, Any, Callable, Iterable, Iterator, Optional
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 4096
+DEFAULT_BATCH_SIZE = 32
+
+# Below this many texts to encode, a process pool costs more than it saves
+POOL_MIN_TEXTS = 2000
+
+
+def checkpoint_path(output_path: Path) -> Path:
+    return Path(f"{output_path}.checkpoint.json")
+
+
+# ============================================================================
+# ENCODER
+# ============================================================================
+
+class PoolEncoder:
+    """
+    Callable texts -> normalized float32 embeddings for a SentenceTransformer.
+    With workers > 1 large calls go through a multi-process pool (one
+    model copy per CPU worker, started on first use); small calls and
+    workers <= 1 encode in-process.
+    """
+
+    def __init__(self, model, workers: int = 0, batch_size: int = DEFAULT_BATCH_SIZE):
+        self.model = model
+        self.workers = workers
+        self.batch_size = batch_size
+        self._pool = None
+
+    def __call__(self, texts: List[str]) -> np.ndarray:
+        if self.workers > 1 and len(texts) >= POOL_MIN_TEXTS:
+            if self._pool is None:
+                logger.info(f"Starting {self.workers}-process encoding pool")
+                self._pool = self.model.start_multi_process_pool(target_devices=["cpu"] * self.workers)
+            embeddings = self.model.encode_multi_process(texts, self._pool, batch_size=self.batch_size)
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            return (embeddings / np.maximum(norms, 1e-12)).astype(np.float32)
+
+        return np.asarray(self.model.encode(
+            texts,
+            normalize_embeddings=True,
+            batch_size=self.batch_size,
+            show_progress_bar=False
+        ), dtype=np.float32)
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self.model.stop_multi_process_pool(self._pool)
+            self._pool = None
+
+    def __enter__(self) -> "PoolEncoder":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+# ============================================================================
+# PIPELINE
+# ============================================================================
+
+def _chunks(texts: Iterable[str], size: int) -> Iterator[List[str]]:
+    iterator = iter(texts)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _load_checkpoint(path: Path, run: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """The checkpoint of an interrupted run with the same parameters, if any."""
+    if not path.exists():
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            checkpoint = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if any(checkpoint.get(key) != value for key, value in run.items()):
+        return None
+    return checkpoint
+
+
+def _save_checkpoint(path: Path, checkpoint: Dict[str, Any]) -> None:
+    """Atomic write: a crash never leaves a truncated checkpoint."""
+    tmp = Path(f"{path}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp, path)
+
+
+def embed_to_file(
+    texts: Callable[[], Iterable[str]],
+    total: int,
+    dimension: int,
+    embed_fn: Callable[[List[str]], np.ndarray],
+    output_path: Path,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    model_key: str = "",
+    resume: bool = True,
+    progress: Callable[[str], None] = logger.info
+) -> Dict[str, Any]:
+    """
+    Embed `total` texts chunk by chunk into a float32 (total, dimension)
+    .npy at output_path, checkpointing after each chunk. texts() returns
+    a fresh (lazy) iterable of the texts in row order. A matching
+    checkpoint (same total / dimension / model_key and the same leading
+    texts) resumes after its last completed row.
+    Returns stats: rows, resumed_rows, seconds, docs_per_second.
+    """
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    ckpt_path = checkpoint_path(output_path)
+    run = {"total": total, "dimension": dimension, "model": model_key}
+
+    checkpoint = _load_checkpoint(ckpt_path, run) if resume and output_path.exists() else None
+    text_iter = iter(texts())
+    digest = hashlib.sha256()
+    done = 0
+
+    if checkpoint is not None:
+        # Same leading texts as the interrupted run? (hashing is cheap next to encoding)
+        for text in islice(text_iter, checkpoint["done"]):
+            digest.update(text.encode("utf-8") + b"\0")
+        if digest.hexdigest() == checkpoint["digest"]:
+            done = checkpoint["done"]
+            progress(f"  Resuming after {done}/{total} embedded rows")
+        else:
+            progress("  Checkpoint does not match the input - starting over")
+            checkpoint = None
+            text_iter = iter(texts())
+            digest = hashlib.sha256()
+
+    if checkpoint is None:
+        embeddings = np.lib.format.open_memmap(
+            output_path, mode="w+", dtype=np.float32, shape=(total, dimension)
+        )
+        _save_checkpoint(ckpt_path, {**run, "done": 0, "digest": digest.hexdigest()})
+    else:
+        embeddings = np.lib.format.open_memmap(output_path, mode="r+")
+
+    resumed = done
+    started = time.perf_counter()
+    for chunk in _chunks(text_iter, chunk_size):
+        if done + len(chunk) > total:
+            raise ValueError(f"More than {total} texts")
+        embeddings[done:done + len(chunk)] = embed_fn(chunk)
+        embeddings.flush()
+        for text in chunk:
+            digest.update(text.encode("utf-8") + b"\0")
+        done += len(chunk)
+        _save_checkpoint(ckpt_path, {**run, "done": done, "digest": digest.hexdigest()})
+
+        elapsed = time.perf_counter() - started
+        rate = (done - resumed) / elapsed if elapsed > 0 else 0.0
+        progress(f"  Embedded {done}/{total} ({rate:.0f} docs/s)")
+
+    del embeddings
+    if done != total:
+        raise ValueError(f"Expected {total} texts, got {done}")
+
+    seconds = time.perf_counter() - started
+    return {
+        "rows": total,
+        "resumed_rows": resumed,
+        "seconds": round(seconds, 3),
+        "docs_per_second": round((total - resumed) / seconds, 1) if seconds > 0 else 0.0
+    }
@@ -5,20 +5,34 @@ Sentence Transformers-based embedding generation for property documents.
 Optimized for French real estate content.
 """
 
-import pickle
 import logging
-from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any
 import numpy as np
-from sentence_transformers import SentenceTransformer
+
+try:
+    from sentence_transformers import SentenceTransformer
+    SENTENCE_TRANSFORMERS_AVAILABLE = True
+except ImportError:
+    SENTENCE_TRANSFORMERS_AVAILABLE = False
 
 from config import (
     EMBEDDING_MODEL,
     EMBEDDING_DIMENSION,
-    EMBEDDINGS_CACHE,
     CHUNK_FIELDS,
-    CHUNK_SEPARATOR
+    CHUNK_SEPARATOR,
+    QUERY_CACHE_SIZE,
+    QUERY_CACHE_TTL,
+    QUERY_CACHE_DB,
+    QUERY_CACHE_DB_SIZE,
+    DOCUMENT_CACHE_DB,
+    QUERY_ENCODER,
+    ONNX_MODEL_DIR,
+    ONNX_QUANTIZED,
+    ONNX_THREADS
 )
+from embedding_cache import QueryEmbeddingCache, DocumentEmbeddingCache
+from onnx_encoder import QUERY_PREFIX, load_onnx_encoder, query_cache_model
+from query_analysis import SYNONYMS, LOCATION_ALIASES, analyze_query
 
 logger = logging.getLogger(__name__)
 
@@ -31,12 +45,38 @@ class PropertyEmbedder:
 
     def __init__(self, model_name: str = EMBEDDING_MODEL):
         """Initialize the embedding model."""
+        if not SENTENCE_TRANSFORMERS_AVAILABLE:
+            raise ImportError("sentence-transformers is required: pip install sentence-transformers")
         logger.info(f"Loading embedding model: {model_name}")
         self.model = SentenceTransformer(model_name)
         self.model_name = model_name
         self.dimension = self.model.get_sentence_embedding_dimension()
         logger.info(f"Model loaded. Embedding dimension: {self.dimension}")
 
+        # Queries go through the ONNX export of the same model when present
+        self.query_encoder = None
+        if QUERY_ENCODER in ("auto", "onnx"):
+            encoder = load_onnx_encoder(ONNX_MODEL_DIR, quantized=ONNX_QUANTIZED, num_threads=ONNX_THREADS)
+            if encoder is not None and encoder.model_name == model_name:
+                self.query_encoder = encoder
+
+        # Repeated queries skip the model
+        self.query_cache = QueryEmbeddingCache(
+            query_cache_model(self.query_encoder.model_id if self.query_encoder else model_name),
+            self.dimension,
+            max_entries=QUERY_CACHE_SIZE,
+            ttl_seconds=QUERY_CACHE_TTL,
+            db_path=QUERY_CACHE_DB or None,
+            max_disk_entries=QUERY_CACHE_DB_SIZE
+        )
+
+        # Document vectors persist per text: rebuilds encode changed listings only
+        self.document_cache = DocumentEmbeddingCache(
+            model_name,
+            self.dimension,
+            db_path=DOCUMENT_CACHE_DB or None
+        )
+
     def create_document_text(self, property_data: Dict[str, Any]) -> str:
         """
         Create a rich text representation of a property for embedding.
@@ -100,22 +140,41 @@ class PropertyEmbedder:
         """Generate embedding for a single text."""
         return self.model.encode(text, normalize_embeddings=True, show_progress_bar=False)
 
-    def embed_texts(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
-        """Generate embeddings for multiple texts with batching."""
+    def embed_texts(self, texts: List[str], batch_size: int = 32, refresh: bool = False) -> np.ndarray:
+        """
+        Generate embeddings for multiple texts with batching.
+        Texts already in the document cache are not re-encoded
+        (refresh=True encodes everything again).
+        """
         logger.info(f"Embedding {len(texts)} texts...")
-        embeddings = self.model.encode(
+        before = self.document_cache.stats()
+        embeddings = self.document_cache.embed(
             texts,
-            normalize_embeddings=True,
-            batch_size=batch_size,
-            show_progress_bar=True
+            lambda missing: self.model.encode(
+                missing,
+                normalize_embeddings=True,
+                batch_size=batch_size,
+                show_progress_bar=True
+            ),
+            refresh=refresh
+        )
+        after = self.document_cache.stats()
+        hits = after["hits"] - before["hits"]
+        logger.info(
+            f"Embeddings generated. Shape: {embeddings.shape} "
+            f"(cache hits {hits}/{len(texts)}, encoded {after['encoded'] - before['encoded']})"
         )
-        logger.info(f"Embeddings generated. Shape: {embeddings.shape}")
         return embeddings
 
-    def embed_properties(self, properties: List[Dict[str, Any]]) -> tuple[np.ndarray, List[str]]:
+    def embed_properties(
+        self,
+        properties: List[Dict[str, Any]],
+        refresh: bool = False
+    ) -> tuple[np.ndarray, List[str]]:
         """
         Generate embeddings for all properties.
         Returns embeddings array and list of property IDs.
+        Only listings whose document text changed are encoded.
         """
         texts = []
         ids = []
@@ -125,54 +184,42 @@ class PropertyEmbedder:
             texts.append(doc_text)
             ids.append(prop["id"])
 
-        embeddings = self.embed_texts(texts)
+        embeddings = self.embed_texts(texts, refresh=refresh)
         return embeddings, ids
 
     def embed_query(self, query: str) -> np.ndarray:
         """
         Generate embedding for a search query.
         Adds query-specific prefix for better retrieval.
+        Served from the query embedding cache when seen before.
         """
-        # Prefix for asymmetric search (query vs documents)
-        prefixed_query = f"Recherche immobilière: {query}"
-        return self.embed_text(prefixed_query)
+        encode = self.query_encoder.encode_query if self.query_encoder else self.embed_text
+        return self.query_cache.get_or_compute(query, lambda q: encode(f"{QUERY_PREFIX}{q}"))
 
-    def save_embeddings(
-        self,
-        embeddings: np.ndarray,
-        property_ids: List[str],
-        path: Path = EMBEDDINGS_CACHE
-    ) -> None:
-        """Save embeddings to cache file."""
-        cache_data = {
-            "embeddings": embeddings,
-            "property_ids": property_ids,
-            "model_name": self.model_name,
-            "dimension": self.dimension
-        }
-        with open(path, "wb") as f:
-            pickle.dump(cache_data, f)
-        logger.info(f"Embeddings cached to {path}")
-
-    def load_embeddings(self, path: Path = EMBEDDINGS_CACHE) -> Optional[tuple[np.ndarray, List[str]]]:
-        """Load embeddings from cache if available."""
-        if not path.exists():
-            return None
-
-        try:
-            with open(path, "rb") as f:
-                cache_data = pickle.load(f)
-
-            # Verify model compatibility
-            if cache_data.get("model_name") != self.model_name:
-                logger.warning("Cache model mismatch. Regenerating embeddings.")
-                return None
-
-            logger.info(f"Loaded cached embeddings: {len(cache_data['property_ids'])} properties")
-            return cache_data["embeddings"], cache_data["property_ids"]
-        except Exception as e:
-            logger.error(f"Error loading cache: {e}")
-            return None
+    def embed_queries(self, queries: List[str]) -> np.ndarray:
+        """
+        Embeddings of several queries: cache hits, then one batched
+        model call for the rest (same vectors as embed_query).
+        """
+        vectors = [self.query_cache.get(query) for query in queries]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            encoded = self.encode_queries([queries[i] for i in missing])
+            for i, vector in zip(missing, encoded):
+                vectors[i] = self.query_cache.put(queries[i], vector)
+        return np.stack(vectors)
+
+    def encode_queries(self, queries: List[str]) -> np.ndarray:
+        """Query embeddings in one model call, without the cache."""
+        texts = [f"{QUERY_PREFIX}{query}" for query in queries]
+        if self.query_encoder:
+            return self.query_encoder.encode(texts)
+        return self.model.encode(
+            texts,
+            normalize_embeddings=True,
+            batch_size=len(texts),
+            show_progress_bar=False
+        )
 
 
 class QueryExpander:
@@ -181,43 +228,9 @@ class QueryExpander:
     for better semantic search coverage.
     """
 
-    # French real estate synonyms
-    SYNONYMS = {
-        "appartement": ["appart", "flat", "logement", "résidence"],
-        "villa": ["maison", "demeure", "propriété", "pavillon"],
-        "bureau": ["office", "local professionnel", "espace de travail"],
-        "magasin": ["boutique", "commerce", "local commercial", "shop"],
-        "luxe": ["haut standing", "prestige", "premium", "haut de gamme"],
-        "meublé": ["équipé", "aménagé", "furnished"],
-        "terrasse": ["balcon", "rooftop", "extérieur"],
-        "piscine": ["pool", "bassin"],
-        "garage": ["parking", "stationnement", "place de parking"],
-        "neuf": ["nouveau", "récent", "moderne", "contemporain"],
-        "centre ville": ["centre", "downtown", "hyper centre"],
-        "calme": ["tranquille", "paisible", "résidentiel"],
-        "vue mer": ["vue océan", "front de mer", "bord de mer"],
-        "jardin": ["espace vert", "terrain", "extérieur"],
-        "lumineux": ["clair", "ensoleillé", "baigné de lumière"],
-        "spacieux": ["grand", "vaste", "généreux"],
-        "standing": ["luxe", "haut de gamme", "prestige"],
-        "location": ["louer", "à louer", "bail"],
-        "achat": ["vente", "acheter", "à vendre"],
-        "chambres": ["pièces", "ch", "bedroom"],
-    }
-
-    # Location aliases
-    LOCATION_ALIASES = {
-        "casa": "casablanca",
-        "anfa": "anfa",
-        "californie": "californie",
-        "bouskoura": "bouskoura",
-        "ain diab": "ain diab",
-        "maarif": "maarif",
-        "racine": "racine",
-        "gauthier": "gauthier",
-        "triangle d'or": "triangle d'or",
-        "corniche": "corniche",
-    }
+    # French real estate synonyms and location aliases (see query_analysis)
+    SYNONYMS = SYNONYMS
+    LOCATION_ALIASES = LOCATION_ALIASES
 
     @classmethod
     def expand_query(cls, query: str) -> List[str]:
@@ -225,22 +238,4 @@ class QueryExpander:
         Generate expanded versions of the query.
         Returns original query + expanded versions.
         """
-        expanded = [query]
-        query_lower = query.lower()
-
-        # Add synonym expansions
-        for term, synonyms in cls.SYNONYMS.items():
-            if term in query_lower:
-                for synonym in synonyms[:2]:  # Limit to 2 synonyms per term
-                    expanded_query = query_lower.replace(term, synonym)
-                    if expanded_query not in expanded:
-                        expanded.append(expanded_query)
-
-        # Add location expansions
-        for alias, full_name in cls.LOCATION_ALIASES.items():
-            if alias in query_lower and alias != full_name:
-                expanded_query = query_lower.replace(alias, full_name)
-                if expanded_query not in expanded:
-                    expanded.append(expanded_query)
-
-        return expanded[:4]  # Limit total expansions
+        return analyze_query(query).expanded_queries
@@ -0,0 +1,477 @@
+"""
+FAISS Utilities
+===============
+Helpers shared by the vector store, the servers and generate_index.py.
+Kept free of ML dependencies (only numpy + faiss).
+"""
+
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
+import faiss
+
+# Use a bitmap selector once candidates exceed this fraction of the index
+# (n/8 bytes for the bitmap vs. a hash set entry per candidate id)
+BITMAP_SELECTOR_DENSITY = 1 / 64
+
+
+def _base_index(index: faiss.Index) -> faiss.Index:
+    """Unwrap ID maps to reach the index that interprets search params."""
+    index = faiss.downcast_index(index)
+    if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        return faiss.downcast_index(index.index)
+    return index
+
+
+def search_parameters(index: faiss.Index, selector: faiss.IDSelector) -> faiss.SearchParameters:
+    """
+    Build search parameters carrying an ID selector.
+    Keeps the index's own efSearch / nprobe, which the params would
+    otherwise reset to the FAISS defaults.
+    """
+    base = _base_index(index)
+    if isinstance(base, faiss.IndexHNSW):
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=base.hnsw.efSearch)
+    if isinstance(base, faiss.IndexIVF):
+        return faiss.SearchParametersIVF(sel=selector, nprobe=base.nprobe)
+    return faiss.SearchParameters(sel=selector)
+
+
+def filtered_search(
+    index: faiss.Index,
+    query_vectors: np.ndarray,
+    k: int,
+    candidates: Optional[np.ndarray] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Search only among the candidate ids.
+    FAISS skips every other vector while scanning, so a selective filter
+    costs a fraction of a full search and only k results are ranked.
+    """
+    query_vectors = np.ascontiguousarray(query_vectors, dtype=np.float32)
+    if candidates is None:
+        return index.search(query_vectors, k)
+
+    candidates = np.asarray(candidates, dtype=np.int64)
+    if candidates.size == 0 or k <= 0:
+        nq = query_vectors.shape[0]
+        return (
+            np.full((nq, max(k, 0)), -np.inf, dtype=np.float32),
+            np.full((nq, max(k, 0)), -1, dtype=np.int64)
+        )
+
+    is_id_map = isinstance(faiss.downcast_index(index), (faiss.IndexIDMap, faiss.IndexIDMap2))
+    if not is_id_map and candidates.size > index.ntotal * BITMAP_SELECTOR_DENSITY:
+        mask = np.zeros(index.ntotal, dtype=bool)
+        mask[candidates] = True
+        # The selector only points at the bitmap: keep it alive until search returns
+        bitmap = np.packbits(mask, bitorder="little")
+        selector = faiss.IDSelectorBitmap(bitmap)
+    else:
+        selector = faiss.IDSelectorBatch(candidates)
+
+    params = search_parameters(index, selector)
+    return index.search(query_vectors, min(k, candidates.size), params=params)
+
+
+# ============================================================================
+# INDEX TYPES
+# ============================================================================
+
+INDEX_TYPES = ("flat", "hnsw", "ivf-flat", "ivf-pq")
+
+# Size-based default: exact scan while it is cheap, HNSW while the graph
+# fits in memory, IVF-PQ beyond that
+FLAT_MAX_VECTORS = 20_000
+HNSW_MAX_VECTORS = 500_000
+
+
+def default_index_type(num_vectors: int) -> str:
+    """Pick an index type suited to the catalog size."""
+    if num_vectors <= FLAT_MAX_VECTORS:
+        return "flat"
+    if num_vectors <= HNSW_MAX_VECTORS:
+        return "hnsw"
+    return "ivf-pq"
+
+
+def default_nlist(num_vectors: int) -> int:
+    """~4*sqrt(n) inverted lists, with at least 39 training points per list."""
+    nlist = int(4 * np.sqrt(num_vectors))
+    return int(max(1, min(nlist, num_vectors // 39)))
+
+
+def default_pq_m(dimension: int) -> int:
+    """Largest sub-quantizer count <= dim/8 that divides the dimension."""
+    m = max(1, dimension // 8)
+    while dimension % m:
+        m -= 1
+    return m
+
+
+def default_pq_nbits(num_vectors: int, pq_nbits: int = 8) -> int:
+    """PQ codebooks need ~39 training points per centroid (2^nbits centroids)."""
+    return int(min(pq_nbits, max(1, np.log2(max(num_vectors // 39, 2)))))
+
+
+def build_ann_index(
+    embeddings: np.ndarray,
+    index_type: str = "auto",
+    hnsw_m: int = 32,
+    ef_construction: int = 200,
+    ef_search: int = 64,
+    nlist: Optional[int] = None,
+    nprobe: Optional[int] = None,
+    pq_m: Optional[int] = None,
+    pq_nbits: int = 8
+) -> Tuple[faiss.Index, Dict[str, Any]]:
+    """
+    Build an inner-product FAISS index of the requested type.
+    Returns the index and the parameters used (recorded with the artifact).
+    """
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+    num_vectors, dimension = embeddings.shape
+    if index_type == "auto":
+        index_type = default_index_type(num_vectors)
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type: {index_type} (expected one of {INDEX_TYPES})")
+
+    params: Dict[str, Any] = {}
+    metric = faiss.METRIC_INNER_PRODUCT
+
+    if index_type == "flat":
+        index = faiss.IndexFlatIP(dimension)
+
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dimension, hnsw_m, metric)
+        index.hnsw.efConstruction = ef_construction
+        index.hnsw.efSearch = ef_search
+        params = {"M": hnsw_m, "efConstruction": ef_construction, "efSearch": ef_search}
+
+    else:
+        nlist = nlist or default_nlist(num_vectors)
+        nprobe = min(nprobe or max(1, nlist // 16), nlist)
+        quantizer = faiss.IndexFlatIP(dimension)
+        if index_type == "ivf-flat":
+            index = faiss.IndexIVFFlat(quantizer, dimension, nlist, metric)
+            params = {"nlist": nlist, "nprobe": nprobe}
+        else:
+            pq_m = pq_m or default_pq_m(dimension)
+            pq_nbits = default_pq_nbits(num_vectors, pq_nbits)
+            index = faiss.IndexIVFPQ(quantizer, dimension, nlist, pq_m, pq_nbits, metric)
+            params = {"nlist": nlist, "nprobe": nprobe, "pq_m": pq_m, "pq_nbits": pq_nbits}
+        index.train(embeddings)
+        index.nprobe = nprobe
+
+    index.add(embeddings)
+
+    info = {
+        "index_type": index_type,
+        "params": params,
+        "ntotal": int(index.ntotal),
+        "dimension": int(dimension),
+    }
+    return index, info
+
+
+def set_search_param(index: faiss.Index, value: int) -> None:
+    """Set the speed/recall knob of an index (efSearch or nprobe)."""
+    base = _base_index(index)
+    if isinstance(base, faiss.IndexHNSW):
+        base.hnsw.efSearch = value
+    elif isinstance(base, faiss.IndexIVF):
+        base.nprobe = value
+
+
+def search_param_sweep(index: faiss.Index) -> Tuple[str, List[int]]:
+    """Settings worth benchmarking for an index (empty for exact indexes)."""
+    base = _base_index(index)
+    if isinstance(base, faiss.IndexHNSW):
+        return "efSearch", [16, 32, 64, 128, 256]
+    if isinstance(base, faiss.IndexIVF):
+        values = [v for v in (1, 2, 4, 8, 16, 32, 64, 128) if v <= base.nlist]
+        return "nprobe", values
+    return "", []
+
+
+def recall_report(
+    index: faiss.Index,
+    embeddings: np.ndarray,
+    k: int = 10,
+    num_queries: int = 200,
+    noise: float = 0.05,
+    seed: int = 42
+) -> List[Dict[str, Any]]:
+    """
+    Measure recall@k and latency against an exact IndexFlatIP.
+    Queries are perturbed document vectors so the self-match is not free.
+    The index is left with its original search setting.
+    """
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+    rng = np.random.default_rng(seed)
+    sample = rng.choice(len(embeddings), size=min(num_queries, len(embeddings)), replace=False)
+    queries = embeddings[sample] + rng.normal(0, noise, (len(sample), embeddings.shape[1])).astype(np.float32)
+    faiss.normalize_L2(queries)
+    k = min(k, len(embeddings))
+
+    exact = faiss.IndexFlatIP(embeddings.shape[1])
+    exact.add(embeddings)
+    _, truth = exact.search(queries, k)
+
+    def measure(setting: str) -> Dict[str, Any]:
+        start = time.perf_counter()
+        _, found = index.search(queries, k)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        hits = sum(len(set(f[f >= 0]) & set(t)) for f, t in zip(found, truth))
+        return {
+            "setting": setting,
+            f"recall@{k}": round(hits / (k * len(queries)), 4),
+            "latency_ms": round(elapsed_ms / len(queries), 4),
+        }
+
+    param_name, values = search_param_sweep(index)
+    if not values:
+        return [measure("exact")]
+
+    base = _base_index(index)
+    original = base.hnsw.efSearch if param_name == "efSearch" else base.nprobe
+    rows = []
+    for value in values:
+        set_search_param(index, value)
+        rows.append(measure(f"{param_name}={value}"))
+    set_search_param(index, original)
+    return rows
+
+
+# ============================================================================
+# LOADING
+# ============================================================================
+
+@contextmanager
+def atomic_path(path):
+    """
+    Yield a temporary path next to `path`, renamed over it on success.
+    The servers memory-map the artifacts: a rewrite in place would
+    truncate pages they still read (SIGBUS), while a rename leaves open
+    mappings on the previous file.
+    """
+    path = Path(path)
+    tmp = path.with_name(f"{path.name}.tmp")
+    try:
+        yield tmp
+        os.replace(tmp, path)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+def read_index_mmap(path) -> faiss.Index:
+    """
+    Open an index memory-mapped and read-only.
+    Flat / SQ / HNSW codes are used in place from the mapped file and IVF
+    lists are mapped too, so start-up does not copy the vectors and the
+    pages are shared between worker processes through the page cache.
+    Falls back to a regular read if the file cannot be mapped.
+    """
+    flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY
+    try:
+        return faiss.read_index(str(path), flags)
+    except RuntimeError:
+        return faiss.read_index(str(path))
+
+
+# ============================================================================
+# QUANTIZED VARIANTS
+# ============================================================================
+
+# Index files written by generate_index.py, by variant
+INDEX_VARIANTS = {
+    "float32": "index.faiss",
+    "sq8": "index_sq8.faiss",
+    "pq": "index_pq.faiss",
+}
+
+# Raw embedding matrices (np.load(..., mmap_mode="r") friendly)
+EMBEDDINGS_FILE = "embeddings.npy"
+FLOAT16_EMBEDDINGS_FILE = "embeddings_f16.npy"
+
+# Candidates fetched per requested result before the exact rerank
+RERANK_FACTOR = 4
+
+# Precomputed top-K neighbor table (arrays "ids" and "scores", row-aligned)
+NEIGHBORS_FILE = "neighbors.npz"
+
+# Index parameters and version; written after every other artifact of a
+# generation (the servers reload when it changes)
+INDEX_INFO_FILE = "index_info.json"
+
+
+def build_quantized_index(
+    embeddings: np.ndarray,
+    variant: str,
+    pq_m: Optional[int] = None,
+    pq_nbits: int = 8
+) -> faiss.Index:
+    """
+    Build a compressed inner-product index.
+    sq8: one byte per dimension (4x smaller than float32).
+    pq: pq_m bytes per vector, stored in a single-list IVF so that
+    ID selectors (filter pushdown) keep working.
+    """
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+    num_vectors, dimension = embeddings.shape
+    metric = faiss.METRIC_INNER_PRODUCT
+
+    if variant == "sq8":
+        index = faiss.IndexScalarQuantizer(dimension, faiss.ScalarQuantizer.QT_8bit, metric)
+    elif variant == "pq":
+        pq_m = pq_m or default_pq_m(dimension)
+        pq_nbits = default_pq_nbits(num_vectors, pq_nbits)
+        index = faiss.IndexIVFPQ(faiss.IndexFlatIP(dimension), dimension, 1, pq_m, pq_nbits, metric)
+        index.nprobe = 1
+    else:
+        raise ValueError(f"Unknown quantized variant: {variant}")
+
+    index.train(embeddings)
+    index.add(embeddings)
+    return index
+
+
+def rerank_exact(
+    query_vector: np.ndarray,
+    indices: np.ndarray,
+    vectors: np.ndarray,
+    k: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Rescore approximate candidates with the stored vectors (float16 or
+    float32, computed in float32) and keep the k best.
+    Returns (scores, indices) for a single query.
+    """
+    indices = np.asarray(indices, dtype=np.int64)
+    indices = indices[indices >= 0]
+    query = np.asarray(query_vector, dtype=np.float32).ravel()
+    exact = vectors[indices].astype(np.float32) @ query
+    order = np.argsort(-exact, kind="stable")[:k]
+    return exact[order], indices[order]
+
+
+# ============================================================================
+# SIMILAR PROPERTIES
+# ============================================================================
+
+def build_neighbor_table(
+    index: faiss.Index,
+    embeddings: np.ndarray,
+    k: int = 20,
+    batch_size: int = 4096
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Top-k neighbors of every row (itself excluded), best first.
+    Returns (ids int32, scores float32), both of shape (n, k); -1 pads.
+    """
+    num_vectors = len(embeddings)
+    k = max(0, min(k, num_vectors - 1))
+    ids = np.full((num_vectors, k), -1, dtype=np.int32)
+    scores = np.zeros((num_vectors, k), dtype=np.float32)
+    if k == 0:
+        return ids, scores
+
+    for start in range(0, num_vectors, batch_size):
+        batch = np.ascontiguousarray(embeddings[start:start + batch_size], dtype=np.float32)
+        batch_scores, batch_ids = index.search(batch, k + 1)
+
+        # Move the row itself (if returned) to the end, keep the first k
+        rows = np.arange(start, start + len(batch))[:, None]
+        order = np.argsort(batch_ids == rows, axis=1, kind="stable")[:, :k]
+        ids[start:start + len(batch)] = np.take_along_axis(batch_ids, order, axis=1)
+        scores[start:start + len(batch)] = np.take_along_axis(batch_scores, order, axis=1)
+
+    return ids, scores
+
+
+def similar_rows(
+    index: faiss.Index,
+    row: int,
+    k: int,
+    embeddings: Optional[np.ndarray] = None,
+    neighbors: Optional[Tuple[np.ndarray, np.ndarray]] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Rows most similar to a row, best first (the row itself excluded).
+    Served from the neighbor table when it is wide enough, otherwise by
+    one search with the stored vector; nothing is re-embedded.
+    Returns (ids, scores).
+    """
+    if neighbors is not None and k <= neighbors[0].shape[1]:
+        ids, scores = neighbors[0][row, :k], neighbors[1][row, :k]
+        valid = ids >= 0
+        return ids[valid].astype(np.int64), scores[valid]
+
+    if embeddings is not None:
+        query = np.asarray(embeddings[row], dtype=np.float32)
+    else:
+        query = index.reconstruct(int(row))
+
+    scores, ids = index.search(query.reshape(1, -1), k + 1)
+    keep = (ids[0] >= 0) & (ids[0] != row)
+    return ids[0][keep][:k], scores[0][keep][:k]
+
+
+# ============================================================================
+# INCREMENTAL UPDATES
+# ============================================================================
+
+def owned_copy(index: faiss.Index) -> faiss.Index:
+    """In-memory copy of an index (memory-mapped indexes cannot be modified)."""
+    return faiss.deserialize_index(faiss.serialize_index(index))
+
+
+def to_id_map(index: faiss.Index, embeddings: np.ndarray) -> faiss.Index:
+    """
+    Writable index whose ids are row numbers (row i == properties[i]).
+    IVF indexes store ids natively and are only copied. Other indexes are
+    wrapped in an IndexIDMap2: emptied (training is kept) and refilled with
+    the stored vectors under explicit ids; nothing is re-embedded.
+    """
+    index = owned_copy(index)
+    if isinstance(index, (faiss.IndexIDMap2, faiss.IndexIVF)):
+        return index
+
+    index.reset()
+    id_map = faiss.IndexIDMap2(index)
+    id_map.add_with_ids(
+        np.ascontiguousarray(embeddings, dtype=np.float32),
+        np.arange(len(embeddings), dtype=np.int64)
+    )
+    return id_map
+
+
+def replace_ids(
+    index: faiss.Index,
+    remove_ids: np.ndarray,
+    add_ids: np.ndarray,
+    embeddings: np.ndarray
+) -> faiss.Index:
+    """
+    Remove ids, then insert embeddings[add_ids] under those ids.
+    Indexes without removal support (HNSW) are refilled from the full
+    embedding matrix instead, which still costs no re-embedding.
+    """
+    remove_ids = np.asarray(remove_ids, dtype=np.int64)
+    add_ids = np.asarray(add_ids, dtype=np.int64)
+
+    try:
+        if remove_ids.size:
+            index.remove_ids(faiss.IDSelectorBatch(remove_ids))
+    except RuntimeError:
+        base = faiss.clone_index(faiss.downcast_index(index.index))
+        base.reset()
+        index = faiss.IndexIDMap2(base)
+        add_ids = np.arange(len(embeddings), dtype=np.int64)
+
+    if add_ids.size:
+        index.add_with_ids(np.ascontiguousarray(embeddings[add_ids], dtype=np.float32), add_ids)
+    return index
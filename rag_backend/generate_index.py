@@ -5,14 +5,22 @@ Run this script locally to pre-compute embeddings and build the FAISS index.
 This allows the production server to run without loading ML models.
 
 Usage:
-    python generate_index.py
+    python generate_index.py                      # size-based index type
+    python generate_index.py --index-type hnsw    # flat | hnsw | ivf-flat | ivf-pq
+    python generate_index.py --index-type ivf-pq --nlist 1024 --nprobe 16
+    python generate_index.py --no-onnx            # skip the ONNX query encoder export
+    python generate_index.py --no-static          # skip the static word encoder
+    python generate_index.py --no-cache           # re-encode every listing
+    python generate_index.py --workers 8          # encoding processes (default: all cores)
 
 Requirements (local only):
-    pip install sentence-transformers faiss-cpu
+    pip install sentence-transformers faiss-cpu onnx onnxruntime
 """
 
+import os
 import json
-import pickle
+import argparse
+from datetime import datetime
 import numpy as np
 from pathlib import Path
 
@@ -31,134 +39,235 @@ except ImportError:
     print("Run: pip install faiss-cpu")
     exit(1)
 
+from index_updates import UPDATES_JOURNAL_FILE, create_search_text
+from embedding_cache import DocumentEmbeddingCache
+from catalog_loader import PropertyStream, catalog_path
+from metadata_store import METADATA_HOT_FILE, METADATA_COLD_FILE, write_metadata
+from embedding_pipeline import DEFAULT_CHUNK_SIZE, PoolEncoder, embed_to_file
+from onnx_encoder import ONNX_AVAILABLE, ONNX_INT8_MODEL_FILE, QUERY_PREFIX, export_onnx, parity_report
+from static_encoder import STATIC_ENCODER_FILE, distill_static_encoder
+from query_expansion import SYNONYM_VECTORS_FILE, build_synonym_vectors
+from query_analysis import GAZETTEERS, SYNONYMS
+from faiss_utils import (
+    INDEX_TYPES,
+    INDEX_VARIANTS,
+    INDEX_INFO_FILE,
+    EMBEDDINGS_FILE,
+    FLOAT16_EMBEDDINGS_FILE,
+    NEIGHBORS_FILE,
+    atomic_path,
+    build_ann_index,
+    build_neighbor_table,
+    build_quantized_index,
+    recall_report
+)
+
 # Configuration
 BASE_DIR = Path(__file__).parent
 DATA_DIR = BASE_DIR.parent / "data"
 PROPERTIES_JSON = DATA_DIR / "properties.json"
 INDEX_DIR = BASE_DIR / "faiss_index"
-EMBEDDINGS_CACHE = BASE_DIR / "embeddings_cache.pkl"
+ONNX_DIR = BASE_DIR / "onnx_model"
+DOCUMENT_CACHE_DB = BASE_DIR / "cache" / "document_embeddings.sqlite3"
+BUILD_EMBEDDINGS_FILE = BASE_DIR / "cache" / "embeddings_build.npy"
 
 # Model - multilingual for French support
 EMBEDDING_MODEL = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
 EMBEDDING_DIMENSION = 384
 
 
-def load_properties():
-    """Load properties from JSON file."""
-    print(f"Loading properties from {PROPERTIES_JSON}")
-
-    with open(PROPERTIES_JSON, "r", encoding="utf-8") as f:
-        data = json.load(f)
+def load_properties() -> PropertyStream:
+    """
+    Open the catalog (JSONL variant when present) as a stream: each pass
+    over the listings re-reads the file instead of holding the catalog.
+    """
+    path = catalog_path(PROPERTIES_JSON)
+    print(f"Loading properties from {path}")
 
-    if isinstance(data, dict) and "properties" in data:
-        properties = data["properties"]
-    else:
-        properties = data
+    properties = PropertyStream(path)
 
     print(f"Loaded {len(properties)} properties")
     return properties
 
 
-def create_search_text(prop: dict) -> str:
-    """Create searchable text from property."""
-    parts = []
-
-    # Name and type
-    if prop.get("name"):
-        parts.append(prop["name"])
-    if prop.get("type"):
-        parts.append(prop["type"])
-
-    # Location info
-    if prop.get("location"):
-        parts.append(prop["location"])
-    if prop.get("city"):
-        parts.append(prop["city"])
-
-    # Category
-    category = prop.get("category", "")
-    if category == "SALE":
-        parts.append("à vendre vente achat")
-    elif category == "RENT":
-        parts.append("à louer location")
-
-    # Features
-    features = prop.get("features", [])
-    if features:
-        parts.append(" ".join(features))
-
-    # Description (truncated)
-    desc = prop.get("description", "")
-    if desc:
-        parts.append(desc[:500])
-
-    # Price info
-    price = prop.get("price", "")
-    if price:
-        parts.append(price)
-
-    # Size info
-    if prop.get("beds"):
-        parts.append(f"{prop['beds']} chambres")
-    if prop.get("baths"):
-        parts.append(f"{prop['baths']} salles de bain")
-    if prop.get("area"):
-        parts.append(prop["area"])
-
-    return " | ".join(parts)
-
-
-def generate_embeddings(properties: list, model: SentenceTransformer) -> np.ndarray:
-    """Generate embeddings for all properties."""
+def generate_embeddings(
+    properties: PropertyStream,
+    model: SentenceTransformer,
+    use_cache: bool = True,
+    workers: int = 0,
+    chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> np.ndarray:
+    """
+    Generate embeddings for all properties.
+    Search texts are built lazily and embedded chunk by chunk into an
+    on-disk memmap, with a checkpoint per chunk (an interrupted build
+    resumes). Listings whose search text is in the document embedding
+    cache (same model and dimension) are reused; the others are encoded,
+    across a `workers`-process pool for large chunks.
+    """
     print(f"Generating embeddings for {len(properties)} properties...")
 
-    # Create search texts
-    texts = [create_search_text(prop) for prop in properties]
+    dimension = model.get_sentence_embedding_dimension()
+    cache = DocumentEmbeddingCache(EMBEDDING_MODEL, dimension, db_path=DOCUMENT_CACHE_DB)
+
+    with PoolEncoder(model, workers=workers) as encoder:
+        stats = embed_to_file(
+            lambda: (create_search_text(prop) for prop in properties),
+            len(properties),
+            dimension,
+            lambda chunk: cache.embed(chunk, encoder, refresh=not use_cache),
+            BUILD_EMBEDDINGS_FILE,
+            chunk_size=chunk_size,
+            model_key=EMBEDDING_MODEL,
+            resume=use_cache,
+            progress=print
+        )
+    cache_stats = cache.stats()
+    cache.close()
+
+    embeddings_array = np.load(BUILD_EMBEDDINGS_FILE, mmap_mode="r")
+    print(f"Generated embeddings with shape: {embeddings_array.shape}")
+    if stats["resumed_rows"]:
+        print(f"  Resumed: {stats['resumed_rows']} rows from the previous run")
+    print(
+        f"  Cache: {cache_stats['hits']}/{cache_stats['hits'] + cache_stats['misses']} reused "
+        f"(hit rate {cache_stats['hit_rate']:.1%}), {cache_stats['encoded']} encoded"
+    )
+    print(f"  Throughput: {stats['docs_per_second']} docs/s ({stats['seconds']}s)")
 
-    # Generate embeddings in batches
-    batch_size = 32
-    all_embeddings = []
+    return embeddings_array
 
-    for i in range(0, len(texts), batch_size):
-        batch = texts[i:i + batch_size]
-        embeddings = model.encode(batch, show_progress_bar=False, normalize_embeddings=True)
-        all_embeddings.append(embeddings)
-        print(f"  Processed {min(i + batch_size, len(texts))}/{len(texts)}")
 
-    embeddings_array = np.vstack(all_embeddings).astype(np.float32)
-    print(f"Generated embeddings with shape: {embeddings_array.shape}")
+def build_faiss_index(embeddings: np.ndarray, index_type: str = "auto", **params) -> tuple:
+    """Build FAISS index from embeddings. Returns (index, index_info)."""
+    print(f"Building FAISS index (type: {index_type})...")
 
-    return embeddings_array
+    # Inner product on normalized embeddings == cosine similarity
+    index, info = build_ann_index(embeddings, index_type, **params)
 
+    print(f"FAISS index built with {index.ntotal} vectors ({info['index_type']}, {info['params']})")
+    return index, info
 
-def build_faiss_index(embeddings: np.ndarray) -> faiss.Index:
-    """Build FAISS index from embeddings."""
-    print("Building FAISS index...")
 
-    dimension = embeddings.shape[1]
+def print_recall_report(index: faiss.Index, embeddings: np.ndarray, k: int = 10) -> list:
+    """Print recall@k vs. latency against the exact index."""
+    print(f"\nRecall@{k} vs. exact IndexFlatIP:")
+    rows = recall_report(index, embeddings, k=k)
+
+    print(f"  {'setting':<16} {'recall@' + str(k):>10} {'ms/query':>10}")
+    for row in rows:
+        print(f"  {row['setting']:<16} {row[f'recall@{k}']:>10.4f} {row['latency_ms']:>10.4f}")
+
+    return rows
+
+
+def save_quantized_variants(embeddings: np.ndarray, pq_m: int = None) -> dict:
+    """
+    Save compressed variants for small-memory deployments:
+    SQ8 and PQ indexes plus a float16 copy of the embeddings
+    (used by the servers for the exact rerank and similar properties).
+    Returns the file sizes in bytes.
+    """
+    INDEX_DIR.mkdir(exist_ok=True)
+    sizes = {}
+
+    for variant in ("sq8", "pq"):
+        index = build_quantized_index(embeddings, variant, pq_m=pq_m)
+        path = INDEX_DIR / INDEX_VARIANTS[variant]
+        with atomic_path(path) as tmp:
+            faiss.write_index(index, str(tmp))
+        sizes[variant] = path.stat().st_size
+        print(f"Saved {variant} index to {path} ({sizes[variant] / 1024:.1f} KB)")
 
-    # Use IndexFlatIP for cosine similarity (embeddings are normalized)
-    index = faiss.IndexFlatIP(dimension)
-    index.add(embeddings)
+    path = INDEX_DIR / FLOAT16_EMBEDDINGS_FILE
+    with atomic_path(path) as tmp, open(tmp, "wb") as f:
+        np.save(f, embeddings.astype(np.float16))
+    sizes["float16"] = path.stat().st_size
+    print(f"Saved float16 embeddings to {path} ({sizes['float16'] / 1024:.1f} KB)")
 
-    print(f"FAISS index built with {index.ntotal} vectors")
-    return index
+    return sizes
 
 
-def save_index(index: faiss.Index, properties: list, embeddings: np.ndarray):
-    """Save FAISS index and metadata."""
+def save_neighbor_table(index: faiss.Index, embeddings: np.ndarray, k: int) -> None:
+    """Save the top-k similar properties of every property (O(1) lookups)."""
+    INDEX_DIR.mkdir(exist_ok=True)
+    ids, scores = build_neighbor_table(index, embeddings, k)
+    path = INDEX_DIR / NEIGHBORS_FILE
+    with atomic_path(path) as tmp, open(tmp, "wb") as f:
+        np.savez(f, ids=ids, scores=scores)
+    print(f"Saved top-{ids.shape[1]} neighbor table to {path}")
+
+
+def query_vocabulary() -> list:
+    """Words the query analyzer knows (types, locations, features, synonyms...)."""
+    words = [keyword for entries in GAZETTEERS.values() for keyword, _ in entries]
+    words += [synonym for synonyms in SYNONYMS.values() for synonym in synonyms]
+    return words
+
+
+def save_static_encoder(
+    model: SentenceTransformer,
+    properties: PropertyStream,
+    index: faiss.Index,
+    k: int = 10
+) -> None:
+    """Distill the static word encoder shipped next to the index and report its quality."""
+    INDEX_DIR.mkdir(exist_ok=True)
+    print("\nDistilling static query encoder...")
+    texts = (create_search_text(p) for p in properties)
+    encoder = distill_static_encoder(model, texts, extra_words=query_vocabulary())
+    path = INDEX_DIR / STATIC_ENCODER_FILE
+    with atomic_path(path) as tmp, open(tmp, "wb") as f:
+        encoder.save(f)
+    print(f"Saved {len(encoder.vocab)}-word static encoder to {path} ({path.stat().st_size / 1024:.1f} KB)")
+
+    # Agreement with the full model on listing-like queries
+    queries = sorted({f"{p.get('type', '')} {p.get('location', '')}".strip() for p in properties})[:200]
+    static = [encoder.encode(q) for q in queries]
+    pairs = [(q, v) for q, v in zip(queries, static) if v is not None]
+    if not pairs:
+        return
+    reference = model.encode([q for q, _ in pairs], normalize_embeddings=True, show_progress_bar=False)
+    approx = np.stack([v for _, v in pairs])
+    k = min(k, index.ntotal)
+    _, exact_ids = index.search(np.ascontiguousarray(reference, dtype=np.float32), k)
+    _, static_ids = index.search(approx, k)
+    overlap = np.mean([len(set(a) & set(b)) / k for a, b in zip(exact_ids, static_ids)])
+    cosine = float(np.mean(np.sum(reference * approx, axis=1)))
+    print(f"  {len(pairs)} queries: mean cosine {cosine:.4f}, top-{k} overlap {overlap:.4f}")
+
+
+def save_synonym_vectors(model: SentenceTransformer) -> None:
+    """Embed the query expansion synonyms (as queries) for embedding-space expansion."""
+    INDEX_DIR.mkdir(exist_ok=True)
+    vectors = build_synonym_vectors(
+        lambda terms: model.encode(
+            [f"{QUERY_PREFIX}{term}" for term in terms],
+            normalize_embeddings=True,
+            show_progress_bar=False
+        ),
+        EMBEDDING_MODEL
+    )
+    path = INDEX_DIR / SYNONYM_VECTORS_FILE
+    with atomic_path(path) as tmp, open(tmp, "wb") as f:
+        vectors.save(f)
+    print(f"Saved {len(vectors.terms)} synonym vectors to {path}")
+
+
+def save_index(index: faiss.Index, properties: PropertyStream, embeddings: np.ndarray):
+    """Save FAISS index, metadata and embeddings (index_info.json comes last)."""
     # Create index directory
     INDEX_DIR.mkdir(exist_ok=True)
 
     # Save FAISS index
     index_path = INDEX_DIR / "index.faiss"
-    faiss.write_index(index, str(index_path))
+    with atomic_path(index_path) as tmp:
+        faiss.write_index(index, str(tmp))
     print(f"Saved FAISS index to {index_path}")
 
     # Save property metadata (without embeddings, just for ID lookup)
-    metadata = []
-    for prop in properties:
-        metadata.append({
+    metadata = (
+        {
             "id": prop.get("id"),
             "name": prop.get("name"),
             "type": prop.get("type"),
@@ -177,25 +286,105 @@ def save_index(index: faiss.Index, properties: list, embeddings: np.ndarray):
             "smartTags": prop.get("smartTags", []),
             "description": prop.get("description", ""),
             "url": prop.get("url", "")
-        })
-
-    metadata_path = INDEX_DIR / "metadata.json"
-    with open(metadata_path, "w", encoding="utf-8") as f:
-        json.dump(metadata, f, ensure_ascii=False, indent=2)
-    print(f"Saved metadata to {metadata_path}")
-
-    # Save embeddings cache (for similar property search)
-    cache_data = {
-        "embeddings": embeddings,
-        "property_ids": [p.get("id") for p in properties]
-    }
-    with open(EMBEDDINGS_CACHE, "wb") as f:
-        pickle.dump(cache_data, f)
-    print(f"Saved embeddings cache to {EMBEDDINGS_CACHE}")
+        }
+        for prop in properties
+    )
+
+    # Binary hot/cold metadata: servers decode the hot fields at startup
+    # and memory-map descriptions / images
+    count = write_metadata(metadata, INDEX_DIR)
+    print(f"Saved metadata for {count} properties to {INDEX_DIR / METADATA_HOT_FILE}")
+    for legacy_name in ("metadata.json", "metadata.jsonl"):
+        legacy_path = INDEX_DIR / legacy_name
+        if legacy_path.exists():
+            legacy_path.unlink()
+            print(f"Removed superseded {legacy_path}")
+
+    # Save raw embedding matrix (memory-mapped by the servers, row i == metadata[i])
+    embeddings_path = INDEX_DIR / EMBEDDINGS_FILE
+    with atomic_path(embeddings_path) as tmp, open(tmp, "wb") as f:
+        np.save(f, np.ascontiguousarray(embeddings, dtype=np.float32))
+    print(f"Saved embeddings to {embeddings_path}")
+
+
+def save_index_info(index_info: dict) -> None:
+    """
+    Save index parameters (type, build/search settings, recall report)
+    and the snapshot version reported by the servers. Written last: the
+    servers reload when this marker changes, so they never load a
+    generation whose other artifacts are still being written.
+    """
+    info_path = INDEX_DIR / INDEX_INFO_FILE
+    with atomic_path(info_path) as tmp, open(tmp, "w", encoding="utf-8") as f:
+        json.dump({
+            **index_info,
+            "embedding_model": EMBEDDING_MODEL,
+            "version": datetime.now().strftime("%Y%m%d-%H%M%S")
+        }, f, indent=2)
+    print(f"Saved index info to {info_path}")
+
+
+def save_onnx_encoder(model: SentenceTransformer, properties: PropertyStream, quantize: bool = True):
+    """Export the model to ONNX (+ int8) for the servers' local query encoder."""
+    print(f"\nExporting ONNX query encoder to {ONNX_DIR}...")
+    info = export_onnx(model, EMBEDDING_MODEL, ONNX_DIR, quantize=quantize)
+    print(f"Exported {info['model']} ({info['dimension']} dims, max {info['max_length']} tokens)")
+
+    # Same-space check on real queries and listing texts
+    sample = properties.head(32)
+    texts = [f"Recherche immobilière: {p.get('name', '')}" for p in sample]
+    texts += [create_search_text(p) for p in sample]
+    for variant, cosine in parity_report(model, ONNX_DIR, texts).items():
+        print(f"  {variant:<8} min cosine vs. sentence-transformers: {cosine:.4f}")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Generate the FAISS index")
+    parser.add_argument(
+        "--index-type", default="auto", choices=["auto", *INDEX_TYPES],
+        help="Index type (auto: flat for small catalogs, then HNSW, then IVF-PQ)"
+    )
+    parser.add_argument("--hnsw-m", type=int, default=32, help="HNSW graph degree")
+    parser.add_argument("--ef-search", type=int, default=64, help="HNSW search depth")
+    parser.add_argument("--nlist", type=int, default=None, help="IVF inverted lists")
+    parser.add_argument("--nprobe", type=int, default=None, help="IVF lists probed per query")
+    parser.add_argument("--pq-m", type=int, default=None, help="PQ sub-quantizers")
+    parser.add_argument("--recall-k", type=int, default=10, help="k for the recall report")
+    parser.add_argument(
+        "--neighbors", type=int, default=20,
+        help="Similar properties precomputed per property (0 to skip)"
+    )
+    parser.add_argument(
+        "--cache", action=argparse.BooleanOptionalAction, default=True,
+        help="Reuse cached document embeddings and resume interrupted builds"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=os.cpu_count() or 1,
+        help="Encoding processes for large catalogs (1 = in-process)"
+    )
+    parser.add_argument(
+        "--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+        help="Listings embedded per checkpointed chunk"
+    )
+    parser.add_argument(
+        "--static", action=argparse.BooleanOptionalAction, default=True,
+        help="Distill the static word encoder (autocomplete / no-API-key queries)"
+    )
+    parser.add_argument(
+        "--onnx", action=argparse.BooleanOptionalAction, default=True,
+        help="Export the ONNX query encoder used by the servers"
+    )
+    parser.add_argument(
+        "--quantize", action=argparse.BooleanOptionalAction, default=True,
+        help="Also write the dynamic int8 ONNX model"
+    )
+    return parser.parse_args()
 
 
 def main():
     """Main function to generate index."""
+    args = parse_args()
+
     print("=" * 60)
     print("FAISS Index Generator")
     print("=" * 60)
@@ -209,21 +398,81 @@ def main():
     print("Model loaded successfully")
 
     # Generate embeddings
-    embeddings = generate_embeddings(properties, model)
+    embeddings = generate_embeddings(
+        properties,
+        model,
+        use_cache=args.cache,
+        workers=args.workers,
+        chunk_size=args.chunk_size
+    )
 
     # Build FAISS index
-    index = build_faiss_index(embeddings)
+    index, index_info = build_faiss_index(
+        embeddings,
+        args.index_type,
+        hnsw_m=args.hnsw_m,
+        ef_search=args.ef_search,
+        nlist=args.nlist,
+        nprobe=args.nprobe,
+        pq_m=args.pq_m
+    )
+
+    # Recall / latency trade-off against the exact index
+    index_info["recall"] = print_recall_report(index, embeddings, args.recall_k)
+
+    # Compressed variants (SQ8 / PQ / float16)
+    index_info["variants"] = save_quantized_variants(embeddings, args.pq_m)
 
     # Save everything
     save_index(index, properties, embeddings)
 
+    # Similar-properties table (a previous one no longer matches the rows)
+    if args.neighbors > 0:
+        save_neighbor_table(index, embeddings, args.neighbors)
+    else:
+        (INDEX_DIR / NEIGHBORS_FILE).unlink(missing_ok=True)
+
+    # Synonym vectors (agent query expansion in embedding space)
+    save_synonym_vectors(model)
+
+    # Static word encoder (same vector space, no model at query time)
+    if args.static:
+        save_static_encoder(model, properties, index)
+
+    # Local query encoder (same vector space as the index)
+    onnx_exported = False
+    if args.onnx:
+        if ONNX_AVAILABLE:
+            save_onnx_encoder(model, properties, quantize=args.quantize)
+            onnx_exported = True
+        else:
+            print("\nWARNING: onnxruntime/tokenizers not installed - skipping ONNX export")
+
+    # Marker last: the servers pick up the new generation from here
+    save_index_info(index_info)
+
+    # Journaled upserts applied to the previous generation (ignored from now on)
+    (INDEX_DIR / UPDATES_JOURNAL_FILE).unlink(missing_ok=True)
+
     print("\n" + "=" * 60)
     print("Index generation complete!")
     print("=" * 60)
     print(f"\nFiles created:")
     print(f"  - {INDEX_DIR / 'index.faiss'}")
-    print(f"  - {INDEX_DIR / 'metadata.json'}")
-    print(f"  - {EMBEDDINGS_CACHE}")
+    print(f"  - {INDEX_DIR / INDEX_INFO_FILE}")
+    for variant in ("sq8", "pq"):
+        print(f"  - {INDEX_DIR / INDEX_VARIANTS[variant]}")
+    print(f"  - {INDEX_DIR / FLOAT16_EMBEDDINGS_FILE}")
+    print(f"  - {INDEX_DIR / METADATA_HOT_FILE}")
+    print(f"  - {INDEX_DIR / METADATA_COLD_FILE}")
+    print(f"  - {INDEX_DIR / EMBEDDINGS_FILE}")
+    if args.neighbors > 0:
+        print(f"  - {INDEX_DIR / NEIGHBORS_FILE}")
+    print(f"  - {INDEX_DIR / SYNONYM_VECTORS_FILE}")
+    if args.static:
+        print(f"  - {INDEX_DIR / STATIC_ENCODER_FILE}")
+    if onnx_exported:
+        print(f"  - {ONNX_DIR} (deploy {ONNX_INT8_MODEL_FILE if args.quantize else 'model.onnx'}, tokenizer.json, encoder_info.json)")
     print(f"\nNow commit these files and deploy to Render.")
 
 
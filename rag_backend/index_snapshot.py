@@ -0,0 +1,245 @@
+"""
+Index Snapshot Module
+=====================
+Versioned, immutable bundle of everything the servers search with.
+A new snapshot is loaded in the background and swapped in with a single
+reference assignment: requests keep the snapshot they started with.
+"""
+
+import hashlib
+import logging
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
+import faiss
+import orjson
+
+from catalog import PropertyCatalog
+from catalog_loader import catalog_path, iter_properties
+from metadata_store import PropertyStore, load_metadata
+from keyword_index import KeywordIndex
+from index_updates import (
+    UPDATES_JOURNAL_FILE,
+    apply_updates,
+    create_search_text,
+    journal_embed_fn,
+    read_journal
+)
+from static_encoder import STATIC_ENCODER_FILE, StaticQueryEncoder, load_static_encoder
+from faiss_utils import (
+    INDEX_VARIANTS,
+    INDEX_INFO_FILE,
+    EMBEDDINGS_FILE,
+    FLOAT16_EMBEDDINGS_FILE,
+    NEIGHBORS_FILE,
+    read_index_mmap
+)
+
+logger = logging.getLogger(__name__)
+
+METADATA_FILE = "metadata.json"  # legacy; metadata.msgpack, then metadata.jsonl, are preferred
+
+
+@dataclass
+class IndexSnapshot:
+    """Everything derived from one set of index artifacts (row i == properties[i])."""
+    version: str
+    fingerprint: str
+    index: faiss.Index
+    properties: PropertyStore
+    catalog: PropertyCatalog
+    keyword_index: KeywordIndex
+    embeddings: Optional[np.ndarray] = None
+    neighbors: Optional[Tuple[np.ndarray, np.ndarray]] = None
+    content_hashes: Optional[List[str]] = None  # computed on first index update
+    static_encoder: Optional[StaticQueryEncoder] = None
+    embedding_model: Optional[str] = None  # model the document vectors were built with
+    updates: int = 0  # update batches applied on top of the artifacts
+    loaded_at: float = field(default_factory=time.time)
+    id_to_idx: Dict[str, int] = field(init=False)
+
+    def __post_init__(self):
+        self.id_to_idx = {p.get("id"): i for i, p in enumerate(self.properties.iter_hot())}
+
+    @property
+    def property_ids(self) -> List[str]:
+        return [p.get("id") for p in self.properties.iter_hot()]
+
+    def with_updates(self, result: Dict[str, Any], updates: int) -> "IndexSnapshot":
+        """
+        New snapshot from an index_updates.apply_updates() result.
+        The version gets an update counter; the neighbor table is dropped
+        since rows moved (lookups fall back to the stored vectors).
+        """
+        base_version = self.version.split("+")[0]
+        return IndexSnapshot(
+            version=f"{base_version}+{updates}",
+            fingerprint=self.fingerprint,
+            index=result["index"],
+            properties=PropertyStore.from_records(result["properties"]),
+            catalog=PropertyCatalog(result["properties"]),
+            keyword_index=KeywordIndex(
+                result["properties"],
+                field_weights=self.keyword_index.field_weights,
+                phrase_weights=self.keyword_index.phrase_weights
+            ),
+            embeddings=result["embeddings"],
+            content_hashes=result["hashes"],
+            static_encoder=self.static_encoder,
+            embedding_model=self.embedding_model,
+            updates=updates
+        )
+
+
+def artifact_fingerprint(index_dir: Path) -> str:
+    """
+    Changes when a new artifact generation is complete: generate_index.py
+    writes index_info.json after every other file, so only that marker is
+    watched (every file but the update journal, for an index directory
+    without one).
+    """
+    digest = hashlib.sha256()
+    info_path = index_dir / INDEX_INFO_FILE
+    if info_path.exists():
+        paths = [info_path]
+    elif index_dir.exists():
+        paths = sorted(p for p in index_dir.iterdir() if p.name != UPDATES_JOURNAL_FILE)
+    else:
+        paths = []
+    for path in paths:
+        if path.is_file():
+            stat = path.stat()
+            digest.update(f"{path.name}:{stat.st_ino}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+    return digest.hexdigest()[:12]
+
+
+def load_snapshot(
+    index_dir: Path,
+    index_variant: str,
+    field_weights: Dict[str, float],
+    phrase_weights: Dict[str, float]
+) -> IndexSnapshot:
+    """
+    Load a snapshot from the artifacts in index_dir and replay the
+    update journal recorded on top of them.
+    Raises FileNotFoundError / ValueError on missing or inconsistent
+    artifacts (including a generation written while loading), so a
+    failed reload never replaces a working snapshot.
+    """
+    fingerprint = artifact_fingerprint(index_dir)
+
+    # Version (else the artifact fingerprint), vector count and document
+    # embedding model recorded by generate_index.py
+    info = {}
+    info_path = index_dir / INDEX_INFO_FILE
+    if info_path.exists():
+        with open(info_path, "rb") as f:
+            info = orjson.loads(f.read())
+    version = info.get("version", fingerprint)
+    embedding_model = info.get("embedding_model")
+
+    # FAISS index (compressed variant if configured and available)
+    index_path = index_dir / INDEX_VARIANTS.get(index_variant, INDEX_VARIANTS["float32"])
+    if not index_path.exists():
+        logger.warning(f"Index variant '{index_variant}' not found, using float32 index")
+        index_path = index_dir / INDEX_VARIANTS["float32"]
+    if not index_path.exists():
+        raise FileNotFoundError(f"FAISS index not found at {index_path}")
+
+    # Memory-mapped: near-instant start, pages shared between workers
+    index = read_index_mmap(index_path)
+    logger.info(f"Loaded FAISS index {index_path.name} with {index.ntotal} vectors")
+    if info.get("ntotal") is not None and index.ntotal != info["ntotal"]:
+        raise ValueError(f"{index_path.name} has {index.ntotal} vectors but {INDEX_INFO_FILE} {info['ntotal']}")
+
+    # Metadata: binary hot/cold store, else the (streamed) JSON catalog
+    properties = load_metadata(index_dir)
+    if properties is None:
+        metadata_path = catalog_path(index_dir / METADATA_FILE)
+        if not metadata_path.exists():
+            raise FileNotFoundError(f"Metadata not found at {metadata_path}")
+        properties = PropertyStore.from_records(iter_properties(metadata_path))
+        logger.info(f"Loaded {len(properties)} properties from {metadata_path.name}")
+
+    if index.ntotal != len(properties):
+        raise ValueError(f"Index has {index.ntotal} vectors but metadata has {len(properties)} properties")
+
+    # Memory-map embeddings (optional, for exact rerank and similar property search).
+    # Compressed index variants pair with the half-size float16 store.
+    embeddings = None
+    embedding_files = [EMBEDDINGS_FILE, FLOAT16_EMBEDDINGS_FILE]
+    if index_variant != "float32":
+        embedding_files.reverse()
+    for name in embedding_files:
+        embeddings_path = index_dir / name
+        if embeddings_path.exists():
+            embeddings = np.load(embeddings_path, mmap_mode="r")
+            if embeddings.shape != (index.ntotal, index.d):
+                raise ValueError(f"{name} has shape {embeddings.shape}, index ({index.ntotal}, {index.d})")
+            logger.info(f"Mapped embeddings {name} {embeddings.shape}")
+            break
+
+    # Precomputed similar properties (optional, from generate_index.py)
+    neighbors = None
+    neighbors_path = index_dir / NEIGHBORS_FILE
+    if neighbors_path.exists():
+        with np.load(neighbors_path) as data:
+            ids, scores = data["ids"], data["scores"]
+        if len(ids) != index.ntotal or ids.shape != scores.shape:
+            raise ValueError(f"{NEIGHBORS_FILE} has {len(ids)} rows, index {index.ntotal}")
+        if ids.size and ids.max() >= index.ntotal:
+            raise ValueError(f"{NEIGHBORS_FILE} refers to rows beyond the index")
+        neighbors = (ids, scores)
+        logger.info(f"Loaded top-{ids.shape[1]} neighbor table")
+
+    # Static query encoder distilled from the index model (optional)
+    static_encoder = load_static_encoder(index_dir / STATIC_ENCODER_FILE)
+    if static_encoder is not None and static_encoder.dimension != index.d:
+        logger.warning(f"Static encoder has {static_encoder.dimension} dims, index {index.d} - ignored")
+        static_encoder = None
+
+    # A generation completed while loading may have replaced some of the
+    # files read above: the next reload picks it up whole
+    if artifact_fingerprint(index_dir) != fingerprint:
+        raise ValueError("Index artifacts changed while loading")
+
+    snapshot = IndexSnapshot(
+        version=version,
+        fingerprint=fingerprint,
+        index=index,
+        properties=properties,
+        # Columns from the hot fields (+ cold presence flags); keyword
+        # postings stream the full listings one at a time
+        catalog=PropertyCatalog(
+            properties.hot_records(),
+            present={"description": properties.present("description")}
+        ),
+        keyword_index=KeywordIndex(
+            properties,
+            field_weights=field_weights,
+            phrase_weights=phrase_weights
+        ),
+        embeddings=embeddings,
+        neighbors=neighbors,
+        static_encoder=static_encoder,
+        embedding_model=embedding_model
+    )
+
+    # Replay the upserts / deletes applied since this generation was built
+    for entry in read_journal(index_dir, version):
+        result = apply_updates(
+            snapshot.properties,
+            snapshot.embeddings,
+            snapshot.index,
+            entry["upserts"],
+            entry["delete_ids"],
+            text_fn=create_search_text,
+            embed_fn=journal_embed_fn(entry),
+            hashes=snapshot.content_hashes
+        )
+        snapshot = snapshot.with_updates(result, snapshot.updates + 1)
+    if snapshot.updates:
+        logger.info(f"Replayed {snapshot.updates} journaled index updates")
+    return snapshot
@@ -0,0 +1,262 @@
+"""
+Index Updates Module
+====================
+Incremental upsert / delete for the row-aligned FAISS index.
+Listings are compared by a hash of their document text: only new or
+changed ones are re-embedded, every other vector is reused.
+Applied batches are appended to a journal next to the index artifacts
+and replayed on load, so updates survive reloads and restarts until
+the next generate_index.py run.
+"""
+
+import os
+import hashlib
+import logging
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Callable, Iterable
+import numpy as np
+import faiss
+import msgpack
+
+from faiss_utils import to_id_map, replace_ids
+
+logger = logging.getLogger(__name__)
+
+# Update batches applied on top of an artifact generation (msgpack stream)
+UPDATES_JOURNAL_FILE = "updates.journal"
+
+
+def create_search_text(prop: dict) -> str:
+    """Create searchable text from property."""
+    parts = []
+
+    # Name and type
+    if prop.get("name"):
+        parts.append(prop["name"])
+    if prop.get("type"):
+        parts.append(prop["type"])
+
+    # Location info
+    if prop.get("location"):
+        parts.append(prop["location"])
+    if prop.get("city"):
+        parts.append(prop["city"])
+
+    # Category
+    category = prop.get("category", "")
+    if category == "SALE":
+        parts.append("à vendre vente achat")
+    elif category == "RENT":
+        parts.append("à louer location")
+
+    # Features
+    features = prop.get("features", [])
+    if features:
+        parts.append(" ".join(features))
+
+    # Description (truncated)
+    desc = prop.get("description", "")
+    if desc:
+        parts.append(desc[:500])
+
+    # Price info
+    price = prop.get("price", "")
+    if price:
+        parts.append(price)
+
+    # Size info
+    if prop.get("beds"):
+        parts.append(f"{prop['beds']} chambres")
+    if prop.get("baths"):
+        parts.append(f"{prop['baths']} salles de bain")
+    if prop.get("area"):
+        parts.append(prop["area"])
+
+    return " | ".join(parts)
+
+
+
+def content_hash(text: str) -> str:
+    """Stable fingerprint of a listing's document text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def apply_updates(
+    properties: List[Dict[str, Any]],
+    embeddings: Optional[np.ndarray],
+    index: faiss.Index,
+    upserts: Iterable[Dict[str, Any]],
+    delete_ids: Iterable[str],
+    text_fn: Callable[[Dict[str, Any]], str],
+    embed_fn: Callable[[List[str]], np.ndarray],
+    hashes: Optional[List[str]] = None
+) -> Dict[str, Any]:
+    """
+    Upsert and delete listings by property id.
+
+    FAISS ids stay equal to row numbers (IndexIDMap2 or native IVF ids),
+    so the catalog, keyword index and score arrays remain row-aligned.
+    A deleted row is filled with the last row, so only that one vector
+    moves. Inputs are not modified: the new state is returned for the
+    caller to swap in.
+
+    Returns {properties, embeddings, index, hashes, embedded, stats};
+    embedded holds the new vectors by content hash (journal entries).
+    """
+    if embeddings is None:
+        embeddings = index.reconstruct_n(0, index.ntotal)
+    if hashes is None:
+        hashes = [content_hash(text_fn(prop)) for prop in properties]
+
+    properties = list(properties)
+    hashes = list(hashes)
+    old_size = len(properties)
+    row_of = {prop.get("id"): row for row, prop in enumerate(properties)}
+    stats = {"added": 0, "updated": 0, "unchanged": 0, "deleted": 0, "embedded": 0}
+
+    # Classify upserts: only new or changed text needs an embedding
+    pending: Dict[int, str] = {}
+    for prop in upserts:
+        property_id = prop.get("id")
+        if not property_id:
+            raise ValueError("Upserted properties need an 'id'")
+
+        text = text_fn(prop)
+        text_hash = content_hash(text)
+        row = row_of.get(property_id)
+
+        if row is None:
+            row = len(properties)
+            row_of[property_id] = row
+            properties.append(prop)
+            hashes.append(text_hash)
+            pending[row] = text
+            stats["added"] += 1
+        else:
+            properties[row] = prop
+            if hashes[row] == text_hash and row not in pending:
+                stats["unchanged"] += 1
+            else:
+                hashes[row] = text_hash
+                pending[row] = text
+                stats["updated"] += 1
+
+    # Embed the pending texts in one batch
+    dimension = embeddings.shape[1]
+    new_embeddings = np.empty((len(properties), dimension), dtype=embeddings.dtype)
+    new_embeddings[:old_size] = embeddings
+    dirty = set(pending)
+    embedded = {"hashes": [], "vectors": np.empty((0, dimension), dtype=np.float32)}
+    if pending:
+        rows = list(pending)
+        vectors = np.asarray(embed_fn([pending[row] for row in rows]), dtype=np.float32)
+        new_embeddings[rows] = vectors
+        embedded = {"hashes": [hashes[row] for row in rows], "vectors": vectors}
+        stats["embedded"] = len(rows)
+
+    # Deletes: move the last row into the hole
+    for property_id in delete_ids:
+        row = row_of.pop(property_id, None)
+        if row is None:
+            continue
+        last = len(properties) - 1
+        if row != last:
+            properties[row] = properties[last]
+            hashes[row] = hashes[last]
+            new_embeddings[row] = new_embeddings[last]
+            row_of[properties[row].get("id")] = row
+            dirty.add(row)
+        properties.pop()
+        hashes.pop()
+        dirty.discard(last)
+        stats["deleted"] += 1
+
+    new_size = len(properties)
+    new_embeddings = new_embeddings[:new_size]
+
+    # Only rewrite the rows whose vector changed (plus rows that disappeared)
+    index = to_id_map(index, embeddings)
+    remove = sorted({row for row in dirty if row < old_size} | set(range(new_size, old_size)))
+    index = replace_ids(
+        index,
+        np.array(remove, dtype=np.int64),
+        np.array(sorted(dirty), dtype=np.int64),
+        new_embeddings
+    )
+
+    logger.info(
+        f"Index update: {stats['added']} added, {stats['updated']} updated, "
+        f"{stats['unchanged']} unchanged, {stats['deleted']} deleted "
+        f"({stats['embedded']} embedded, {new_size} total)"
+    )
+    return {
+        "properties": properties,
+        "embeddings": new_embeddings,
+        "index": index,
+        "hashes": hashes,
+        "embedded": embedded,
+        "stats": stats,
+    }
+
+
+# ============================================================================
+# JOURNAL
+# ============================================================================
+
+def append_journal(
+    index_dir: Path,
+    base_version: str,
+    upserts: List[Dict[str, Any]],
+    delete_ids: List[str],
+    embedded: Dict[str, Any]
+) -> None:
+    """
+    Durably append one applied batch (with the vectors it embedded, so a
+    replay never calls an encoder). base_version is the version of the
+    generation the batch applies to; entries of other generations are
+    ignored.
+    """
+    vectors = np.ascontiguousarray(embedded["vectors"], dtype=np.float32)
+    entry = msgpack.packb({
+        "base": base_version,
+        "upserts": list(upserts),
+        "delete_ids": list(delete_ids),
+        "hashes": list(embedded["hashes"]),
+        "dimension": vectors.shape[1] if vectors.ndim == 2 else 0,
+        "vectors": vectors.tobytes(),
+    })
+    with open(Path(index_dir) / UPDATES_JOURNAL_FILE, "ab") as f:
+        f.write(entry)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def read_journal(index_dir: Path, base_version: str) -> List[Dict[str, Any]]:
+    """Journaled batches for a generation, in order (a torn last write is dropped)."""
+    path = Path(index_dir) / UPDATES_JOURNAL_FILE
+    if not path.exists():
+        return []
+    entries = []
+    with open(path, "rb") as f:
+        try:
+            for entry in msgpack.Unpacker(f, raw=False):
+                entries.append(entry)
+        except (msgpack.UnpackException, ValueError) as e:
+            logger.warning(f"{UPDATES_JOURNAL_FILE} is damaged after {len(entries)} entries: {e}")
+    return [entry for entry in entries if isinstance(entry, dict) and entry.get("base") == base_version]
+
+
+def journal_embed_fn(entry: Dict[str, Any]) -> Callable[[List[str]], np.ndarray]:
+    """embed_fn for replaying a journal entry: its recorded vectors, by content hash."""
+    vectors = np.frombuffer(entry["vectors"], dtype=np.float32)
+    if entry["dimension"]:
+        vectors = vectors.reshape(-1, entry["dimension"])
+    by_hash = dict(zip(entry["hashes"], vectors))
+
+    def embed(texts: List[str]) -> np.ndarray:
+        try:
+            return np.stack([by_hash[content_hash(text)] for text in texts])
+        except KeyError:
+            raise ValueError(f"{UPDATES_JOURNAL_FILE} entry has no vector for an updated listing")
+
+    return embed
@@ -0,0 +1,263 @@
+"""
+Keyword Index Module
+====================
+Inverted index for keyword search over property text fields.
+Built once at load time; query cost scales with matching postings,
+not with catalog size.
+"""
+
+import logging
+from typing import List, Dict, Any, Optional, Tuple, Iterable, Set
+import numpy as np
+
+from scoring import top_k_indices
+
+logger = logging.getLogger(__name__)
+
+# Size of the character n-grams used to find vocabulary terms by substring
+GRAM_SIZE = 3
+
+# Bound for the per-term lookup memo (popular query terms repeat a lot)
+TERM_CACHE_SIZE = 4096
+
+
+def field_text(prop: Dict[str, Any], field: str) -> str:
+    """Get the searchable lowercase text of a property field."""
+    value = prop.get(field)
+    if not value:
+        return ""
+    if isinstance(value, list):
+        return " ".join(str(v) for v in value).lower()
+    return str(value).lower()
+
+
+class KeywordIndex:
+    """
+    Per-field posting lists over whitespace tokens.
+
+    A query term matches a field when it is a substring of the field text,
+    exactly like the historical linear scans. Since terms never contain
+    whitespace, that is the same as being a substring of one token, so
+    terms are resolved against the vocabulary (through a character n-gram
+    index) and the postings of the matching tokens are merged.
+    """
+
+    def __init__(
+        self,
+        properties: List[Dict[str, Any]],
+        field_weights: Dict[str, float],
+        phrase_weights: Optional[Dict[str, float]] = None,
+        value_fields: Iterable[str] = ("category",),
+        min_term_length: int = 2
+    ):
+        self.size = len(properties)
+        self.field_weights = dict(field_weights)
+        self.phrase_weights = dict(phrase_weights or {})
+        self.min_term_length = min_term_length
+
+        self._vocab: Dict[str, int] = {}
+        self._terms: List[str] = []
+        self._grams: Dict[str, Set[int]] = {}
+        self._postings: Dict[str, Dict[int, np.ndarray]] = {}
+        self._phrase_texts: Dict[str, List[str]] = {}
+        self._values: Dict[str, Dict[str, np.ndarray]] = {}
+        self._term_cache: Dict[str, np.ndarray] = {}
+
+        self._build(properties, list(value_fields))
+
+    # ========================================================================
+    # BUILD
+    # ========================================================================
+
+    def _term_id(self, token: str) -> int:
+        """Intern a token in the vocabulary and index its n-grams."""
+        term_id = self._vocab.get(token)
+        if term_id is None:
+            term_id = len(self._terms)
+            self._vocab[token] = term_id
+            self._terms.append(token)
+            for gram in self._token_grams(token):
+                self._grams.setdefault(gram, set()).add(term_id)
+        return term_id
+
+    @staticmethod
+    def _token_grams(token: str) -> Set[str]:
+        if len(token) < GRAM_SIZE:
+            return set()
+        return {token[i:i + GRAM_SIZE] for i in range(len(token) - GRAM_SIZE + 1)}
+
+    def _build(self, properties: List[Dict[str, Any]], value_fields: List[str]) -> None:
+        fields = list(dict.fromkeys([*self.field_weights, *self.phrase_weights]))
+        raw_postings: Dict[str, Dict[int, List[int]]] = {field: {} for field in fields}
+        raw_values: Dict[str, Dict[str, List[int]]] = {field: {} for field in value_fields}
+        self._phrase_texts = {field: [] for field in self.phrase_weights}
+
+        for doc_id, prop in enumerate(properties):
+            for field in fields:
+                text = field_text(prop, field)
+                if field in self._phrase_texts:
+                    self._phrase_texts[field].append(text)
+                for token in set(text.split()):
+                    raw_postings[field].setdefault(self._term_id(token), []).append(doc_id)
+
+            for field in value_fields:
+                value = prop.get(field)
+                if value is not None:
+                    raw_values[field].setdefault(value, []).append(doc_id)
+
+        self._postings = {
+            field: {term_id: np.array(docs, dtype=np.int32) for term_id, docs in postings.items()}
+            for field, postings in raw_postings.items()
+        }
+        self._values = {
+            field: {value: np.array(docs, dtype=np.int32) for value, docs in values.items()}
+            for field, values in raw_values.items()
+        }
+
+        total_postings = sum(len(p) for postings in self._postings.values() for p in postings.values())
+        logger.info(
+            f"Keyword index built: {self.size} documents, {len(self._terms)} terms, "
+            f"{total_postings} postings"
+        )
+
+    # ========================================================================
+    # LOOKUP
+    # ========================================================================
+
+    def _expand_term(self, term: str) -> np.ndarray:
+        """Find the ids of every vocabulary token containing the term."""
+        cached = self._term_cache.get(term)
+        if cached is not None:
+            return cached
+
+        grams = self._token_grams(term)
+        if grams:
+            # Intersect n-gram sets, smallest first, then verify
+            gram_sets = sorted((self._grams.get(g, set()) for g in grams), key=len)
+            candidates = set.intersection(*gram_sets) if gram_sets[0] else set()
+            matches = [tid for tid in candidates if term in self._terms[tid]]
+        else:
+            # Very short terms: scan the vocabulary (not the catalog)
+            matches = [tid for tid, token in enumerate(self._terms) if term in token]
+
+        term_ids = np.array(sorted(matches), dtype=np.int32)
+        if len(self._term_cache) >= TERM_CACHE_SIZE:
+            self._term_cache.clear()
+        self._term_cache[term] = term_ids
+        return term_ids
+
+    def _field_docs(self, field: str, term_ids: np.ndarray) -> np.ndarray:
+        """Union of the field postings of the given vocabulary tokens."""
+        postings = self._postings.get(field, {})
+        chunks = [postings[tid] for tid in term_ids.tolist() if tid in postings]
+        if not chunks:
+            return np.empty(0, dtype=np.int32)
+        if len(chunks) == 1:
+            return chunks[0]
+        return np.unique(np.concatenate(chunks))
+
+    def _phrase_docs(self, field: str, query_lower: str, terms: List[str]) -> np.ndarray:
+        """Documents whose field contains the full query as a substring."""
+        docs = None
+        for term in terms:
+            term_docs = self._field_docs(field, self._expand_term(term))
+            docs = term_docs if docs is None else np.intersect1d(docs, term_docs, assume_unique=True)
+            if docs.size == 0:
+                return docs
+
+        texts = self._phrase_texts[field]
+        return np.array([d for d in docs.tolist() if query_lower in texts[d]], dtype=np.int32)
+
+    def docs_with_value(self, field: str, value: Any) -> np.ndarray:
+        """Documents whose field equals the value exactly (e.g. category)."""
+        return self._values.get(field, {}).get(value, np.empty(0, dtype=np.int32))
+
+    # ========================================================================
+    # QUERY
+    # ========================================================================
+
+    def _term_docs(self, term: str) -> List[Tuple[np.ndarray, float]]:
+        """(doc_ids, weight) of every field a query term matches in."""
+        if len(term) < self.min_term_length:
+            return []
+        term_ids = self._expand_term(term)
+        if term_ids.size == 0:
+            return []
+        return [(self._field_docs(field, term_ids), weight) for field, weight in self.field_weights.items()]
+
+    def score(
+        self,
+        query: str,
+        boosts: Optional[List[Tuple[np.ndarray, float]]] = None,
+        term_docs: Optional[Dict[str, List[Tuple[np.ndarray, float]]]] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Score documents matching the query.
+        Returns (doc_ids, scores) for matching documents only, sorted by doc id.
+        Extra (doc_ids, weight) boosts are added in the same pass; term_docs
+        memoizes per-term postings across queries (see score_many).
+        An empty or whitespace-only query matches nothing (the linear scans
+        gave every listing the same phrase score for it).
+        """
+        if term_docs is None:
+            term_docs = {}
+        query_lower = query.lower()
+        terms = query_lower.split()
+
+        doc_chunks: List[np.ndarray] = []
+        weight_chunks: List[np.ndarray] = []
+
+        def add(docs: np.ndarray, weight: float) -> None:
+            if docs.size:
+                doc_chunks.append(docs)
+                weight_chunks.append(np.full(docs.size, weight, dtype=np.float64))
+
+        # Full query exact match (highest priority)
+        if terms:
+            for field, weight in self.phrase_weights.items():
+                add(self._phrase_docs(field, query_lower, terms), weight)
+
+        # Individual term matching
+        for term in terms:
+            matches = term_docs.get(term)
+            if matches is None:
+                matches = term_docs[term] = self._term_docs(term)
+            for docs, weight in matches:
+                add(docs, weight)
+
+        for docs, weight in boosts or []:
+            add(docs, weight)
+
+        if not doc_chunks:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+
+        doc_ids, inverse = np.unique(np.concatenate(doc_chunks), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(weight_chunks))
+        return doc_ids.astype(np.int64), scores
+
+    def score_many(self, queries: List[str]) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        score() for several queries (e.g. a query and its expansions) in
+        one pass: the postings of a term shared by the queries are merged
+        once.
+        """
+        term_docs: Dict[str, List[Tuple[np.ndarray, float]]] = {}
+        return [self.score(query, term_docs=term_docs) for query in queries]
+
+    def search(
+        self,
+        query: str,
+        top_k: int = 50,
+        boosts: Optional[List[Tuple[np.ndarray, float]]] = None,
+        mask: Optional[np.ndarray] = None
+    ) -> List[Tuple[int, float]]:
+        """
+        Keyword search returning (index, score) tuples, best first.
+        An optional boolean mask over the catalog restricts the results.
+        """
+        doc_ids, scores = self.score(query, boosts)
+        doc_mask = mask[doc_ids] if mask is not None else None
+        return [
+            (int(doc_ids[i]), float(scores[i]))
+            for i in top_k_indices(scores, top_k, doc_mask)
+        ]
@@ -0,0 +1,193 @@
+"""
+Metadata Store Module
+=====================
+Compact binary property metadata with hot / cold column groups.
+Hot fields (id, name, type, location, price, features...) are decoded
+once at load into small dicts; cold fields (description, images and any
+other field) stay msgpack-encoded in a memory-mapped file and are
+decoded per record, only when a full listing is returned. Rows are
+reached through an offset table (row -> byte range), so resident memory
+no longer grows with description length. Per-row presence flags of
+the cold fields are kept with the hot records (catalog completeness).
+"""
+
+import os
+import mmap
+import logging
+from collections.abc import Sequence
+from pathlib import Path
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Union
+import numpy as np
+import msgpack
+
+logger = logging.getLogger(__name__)
+
+METADATA_HOT_FILE = "metadata.msgpack"
+METADATA_COLD_FILE = "metadata_cold.msgpack"
+FORMAT_VERSION = 1
+
+# Fields kept decoded in memory (result cards, filters, stats); every
+# other field is cold
+HOT_FIELDS = (
+    "id", "name", "type", "category", "location", "city",
+    "price", "priceNumeric", "beds", "baths", "area", "areaNumeric",
+    "image", "features", "smartTags", "url",
+)
+
+# Cold fields with a per-row "non-empty" flag kept in memory
+FLAGGED_FIELDS = ("description", "images")
+
+
+def _split(record: Dict[str, Any]) -> tuple:
+    hot = {field: record[field] for field in HOT_FIELDS if field in record}
+    cold = {field: value for field, value in record.items() if field not in hot}
+    return hot, cold
+
+
+class PropertyStore(Sequence):
+    """
+    Read-only sequence of listings (row i == index row i).
+    store[i] decodes the full listing (a new dict); hot(i) and iter_hot()
+    return the shared hot-field dicts without touching the cold file.
+    """
+
+    def __init__(
+        self,
+        hot: List[Dict[str, Any]],
+        cold: Union[bytes, mmap.mmap],
+        offsets: np.ndarray,
+        flags: Dict[str, np.ndarray]
+    ):
+        if len(offsets) != len(hot) + 1:
+            raise ValueError(f"{len(hot)} hot records but {len(offsets) - 1} cold offsets")
+        self._hot = hot
+        self._cold = cold
+        self._offsets = offsets
+        self._flags = flags
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict[str, Any]]) -> "PropertyStore":
+        """In-memory store built from listing dicts (e.g. after an index update)."""
+        hot: List[Dict[str, Any]] = []
+        chunks: List[bytes] = []
+        offsets = [0]
+        flags: Dict[str, List[bool]] = {field: [] for field in FLAGGED_FIELDS}
+        for record in records:
+            hot_fields, cold_fields = _split(record)
+            hot.append(hot_fields)
+            chunks.append(msgpack.packb(cold_fields))
+            offsets.append(offsets[-1] + len(chunks[-1]))
+            for field, values in flags.items():
+                values.append(bool(cold_fields.get(field)))
+        return cls(
+            hot,
+            b"".join(chunks),
+            np.array(offsets, dtype=np.int64),
+            {field: np.array(values, dtype=bool) for field, values in flags.items()}
+        )
+
+    @classmethod
+    def open(cls, index_dir: Path) -> "PropertyStore":
+        """Load the hot records and memory-map the cold ones."""
+        index_dir = Path(index_dir)
+        with open(index_dir / METADATA_HOT_FILE, "rb") as f:
+            header = msgpack.unpackb(f.read())
+        if header.get("format") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported metadata format: {header.get('format')}")
+
+        offsets = np.frombuffer(header["cold_offsets"], dtype=np.int64)
+        cold: Union[bytes, mmap.mmap] = b""
+        with open(index_dir / METADATA_COLD_FILE, "rb") as f:
+            if offsets[-1] > 0:
+                cold = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(cold) < offsets[-1]:
+            raise ValueError(f"{METADATA_COLD_FILE} is truncated")
+        flags = {
+            field: np.unpackbits(np.frombuffer(bits, dtype=np.uint8), count=header["count"]).astype(bool)
+            for field, bits in header["flags"].items()
+        }
+        return cls(header["hot"], cold, offsets, flags)
+
+    def __len__(self) -> int:
+        return len(self._hot)
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [self[i] for i in range(*row.indices(len(self)))]
+        row = int(row)
+        if row < 0:
+            row += len(self._hot)
+        if not 0 <= row < len(self._hot):
+            raise IndexError("property row out of range")
+        record = dict(self._hot[row])
+        record.update(msgpack.unpackb(self._cold[self._offsets[row]:self._offsets[row + 1]]))
+        return record
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for row in range(len(self._hot)):
+            yield self[row]
+
+    def hot(self, row: int) -> Dict[str, Any]:
+        """Hot fields of a listing (shared dict: do not modify)."""
+        return self._hot[row]
+
+    def iter_hot(self) -> Iterator[Dict[str, Any]]:
+        """Hot fields of every listing, in row order (no cold decoding)."""
+        return iter(self._hot)
+
+    def hot_records(self) -> List[Dict[str, Any]]:
+        """All hot-field dicts (shared: do not modify)."""
+        return self._hot
+
+    def present(self, field: str) -> np.ndarray:
+        """Per-row "field is non-empty" flags of a cold field in FLAGGED_FIELDS."""
+        return self._flags[field]
+
+
+def write_metadata(records: Iterable[Dict[str, Any]], index_dir: Path) -> int:
+    """
+    Write listings as hot records + memory-mappable cold file.
+    Cold records are streamed to disk; returns the count.
+    Both files are written under temporary names and renamed into place,
+    cold first and hot last: a running server keeps its mapping of the
+    previous cold file, and a reader never pairs the new cold file with
+    the old offset table.
+    """
+    index_dir = Path(index_dir)
+    cold_path = index_dir / METADATA_COLD_FILE
+    hot_path = index_dir / METADATA_HOT_FILE
+    hot: List[Dict[str, Any]] = []
+    offsets = [0]
+    flags: Dict[str, List[bool]] = {field: [] for field in FLAGGED_FIELDS}
+    cold_tmp = Path(f"{cold_path}.tmp")
+    with open(cold_tmp, "wb") as f:
+        for record in records:
+            hot_fields, cold_fields = _split(record)
+            hot.append(hot_fields)
+            offsets.append(offsets[-1] + f.write(msgpack.packb(cold_fields)))
+            for field, values in flags.items():
+                values.append(bool(cold_fields.get(field)))
+
+    hot_tmp = Path(f"{hot_path}.tmp")
+    with open(hot_tmp, "wb") as f:
+        f.write(msgpack.packb({
+            "format": FORMAT_VERSION,
+            "count": len(hot),
+            "hot": hot,
+            "cold_offsets": np.array(offsets, dtype=np.int64).tobytes(),
+            "flags": {field: np.packbits(values).tobytes() for field, values in flags.items()}
+        }))
+
+    os.replace(cold_tmp, cold_path)
+    os.replace(hot_tmp, hot_path)
+    return len(hot)
+
+
+def load_metadata(index_dir: Path) -> Optional[PropertyStore]:
+    """The binary metadata store, or None when not generated."""
+    index_dir = Path(index_dir)
+    if not (index_dir / METADATA_HOT_FILE).exists():
+        return None
+    store = PropertyStore.open(index_dir)
+    logger.info(f"Opened binary metadata: {len(store)} properties")
+    return store
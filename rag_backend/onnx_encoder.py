@@ -0,0 +1,213 @@
+"""
+ONNX Encoder Module
+===================
+CPU query encoder for the index model (paraphrase-multilingual-MiniLM)
+running on ONNX Runtime + HF tokenizers, without PyTorch.
+generate_index.py exports the model (float32 and dynamic int8) next to
+the index; the servers and PropertyEmbedder load it to embed queries
+locally, in the same vector space as the documents.
+"""
+
+import json
+import logging
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+import numpy as np
+
+try:
+    import onnxruntime as ort
+    from tokenizers import Tokenizer
+    ONNX_AVAILABLE = True
+except ImportError:
+    ONNX_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+ONNX_MODEL_FILE = "model.onnx"
+ONNX_INT8_MODEL_FILE = "model_int8.onnx"
+TOKENIZER_FILE = "tokenizer.json"
+ENCODER_INFO_FILE = "encoder_info.json"
+
+# Prefix for asymmetric search (query vs documents), added to every query
+# encoded with the index model
+QUERY_PREFIX = "Recherche immobilière: "
+
+
+def query_cache_model(model: str) -> str:
+    """Query cache key of a model encoding prefixed queries (unprefixed vectors are not reused)."""
+    return f"{model}|{QUERY_PREFIX}"
+
+
+# ============================================================================
+# RUNTIME
+# ============================================================================
+
+class OnnxQueryEncoder:
+    """
+    Tokenize, run the transformer, mean-pool over the attention mask and
+    L2-normalize: the same pipeline as SentenceTransformer.encode(...,
+    normalize_embeddings=True) for a mean-pooling model.
+    """
+
+    def __init__(self, model_dir: Path, quantized: bool = True, num_threads: int = 1):
+        model_dir = Path(model_dir)
+        with open(model_dir / ENCODER_INFO_FILE, "r", encoding="utf-8") as f:
+            self.info: Dict[str, Any] = json.load(f)
+
+        self.model_name = self.info["model"]
+        self.dimension = self.info["dimension"]
+        self.quantized = quantized
+        self.model_id = f"{self.model_name}#onnx{'-int8' if quantized else ''}"
+
+        self.tokenizer = Tokenizer.from_file(str(model_dir / TOKENIZER_FILE))
+        self.tokenizer.enable_truncation(max_length=self.info["max_length"])
+        self.tokenizer.enable_padding(pad_id=self.info["pad_id"], pad_token=self.info["pad_token"])
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = num_threads
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        model_path = model_dir / (ONNX_INT8_MODEL_FILE if quantized else ONNX_MODEL_FILE)
+        self.session = ort.InferenceSession(
+            str(model_path), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = [i.name for i in self.session.get_inputs()]
+        logger.info(f"ONNX encoder loaded: {model_path.name} ({self.model_id}, {self.dimension} dims)")
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Normalized embeddings (n, dimension) float32."""
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.zeros_like(input_ids)
+        hidden = self.session.run(None, {name: feeds[name] for name in self.input_names})[0]
+
+        # Mean pooling over real tokens
+        mask = attention_mask[..., None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return (pooled / np.maximum(norms, 1e-12)).astype(np.float32)
+
+    def encode_query(self, query: str) -> np.ndarray:
+        """Normalized embedding of one query."""
+        return self.encode([query])[0]
+
+
+def load_onnx_encoder(
+    model_dir: Path,
+    quantized: bool = True,
+    num_threads: int = 1
+) -> Optional[OnnxQueryEncoder]:
+    """The exported encoder, or None when the runtime or the files are missing."""
+    if not ONNX_AVAILABLE:
+        logger.warning("onnxruntime/tokenizers not installed - local query encoder disabled")
+        return None
+
+    model_file = ONNX_INT8_MODEL_FILE if quantized else ONNX_MODEL_FILE
+    missing = [
+        name for name in (model_file, TOKENIZER_FILE, ENCODER_INFO_FILE)
+        if not (Path(model_dir) / name).exists()
+    ]
+    if missing:
+        logger.warning(f"ONNX encoder files missing in {model_dir}: {', '.join(missing)}")
+        return None
+
+    try:
+        return OnnxQueryEncoder(model_dir, quantized=quantized, num_threads=num_threads)
+    except Exception as e:
+        logger.error(f"Failed to load ONNX encoder: {e}")
+        return None
+
+
+# ============================================================================
+# EXPORT (local, needs sentence-transformers / PyTorch)
+# ============================================================================
+
+def export_onnx(
+    model,
+    model_name: str,
+    output_dir: Path,
+    quantize: bool = True,
+    opset: int = 14
+) -> Dict[str, Any]:
+    """
+    Export a mean-pooling SentenceTransformer to ONNX (+ dynamic int8).
+    Returns the encoder info written next to the model files.
+    """
+    import torch
+
+    pooling = model[1]
+    if not getattr(pooling, "pooling_mode_mean_tokens", False):
+        raise ValueError("Only mean-pooling sentence-transformers models can be exported")
+
+    transformer = model[0].auto_model.eval()
+    tokenizer = model.tokenizer
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    sample = tokenizer(["Recherche immobilière: villa avec piscine à Anfa"], return_tensors="pt")
+    input_names = [n for n in ("input_ids", "attention_mask", "token_type_ids") if n in sample]
+
+    class HiddenStates(torch.nn.Module):
+        """Positional inputs -> last hidden state (pooling runs in NumPy)."""
+
+        def __init__(self, module):
+            super().__init__()
+            self.module = module
+
+        def forward(self, *inputs):
+            return self.module(**dict(zip(input_names, inputs))).last_hidden_state
+
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+    with torch.no_grad():
+        torch.onnx.export(
+            HiddenStates(transformer),
+            tuple(sample[name] for name in input_names),
+            str(output_dir / ONNX_MODEL_FILE),
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+            do_constant_folding=True
+        )
+
+    tokenizer.backend_tokenizer.save(str(output_dir / TOKENIZER_FILE))
+
+    if quantize:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        quantize_dynamic(
+            str(output_dir / ONNX_MODEL_FILE),
+            str(output_dir / ONNX_INT8_MODEL_FILE),
+            weight_type=QuantType.QInt8
+        )
+
+    info = {
+        "model": model_name,
+        "dimension": model.get_sentence_embedding_dimension(),
+        "max_length": model.max_seq_length,
+        "pooling": "mean",
+        "inputs": input_names,
+        "pad_id": tokenizer.pad_token_id,
+        "pad_token": tokenizer.pad_token,
+        "quantized": quantize
+    }
+    with open(output_dir / ENCODER_INFO_FILE, "w", encoding="utf-8") as f:
+        json.dump(info, f, indent=2)
+
+    return info
+
+
+def parity_report(model, output_dir: Path, texts: List[str]) -> Dict[str, float]:
+    """Minimum cosine similarity between SentenceTransformer and ONNX embeddings."""
+    reference = model.encode(texts, normalize_embeddings=True, show_progress_bar=False)
+    report = {}
+    for quantized in (False, True):
+        encoder = load_onnx_encoder(output_dir, quantized=quantized)
+        if encoder is not None:
+            cosines = np.sum(reference * encoder.encode(texts), axis=1)
+            report["int8" if quantized else "float32"] = round(float(cosines.min()), 4)
+    return report
@@ -0,0 +1,491 @@
+"""
+Query Analysis Module
+=====================
+Single-pass query understanding shared by every search path.
+All keyword vocabularies (types, categories, locations, features, intents,
+synonyms) are compiled into one Aho-Corasick automaton, so a query is
+scanned once whatever the vocabulary size, and the regexes are compiled
+once at import. analyze_query() returns a ParsedQuery with the filters,
+intents, expansions and budget every caller used to compute separately.
+A RequestContext memoizes analyses and embeddings for one request.
+"""
+
+import re
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional, Tuple, Iterable, Iterator, Set, Callable
+
+
+# ============================================================================
+# VOCABULARIES
+# ============================================================================
+
+# Property type keywords -> catalog type (first match wins)
+PROPERTY_TYPES = {
+    "villa": "Villa",
+    "appartement": "Appartement",
+    "appart": "Appartement",
+    "bureau": "Bureau",
+    "magasin": "Magasin",
+    "boutique": "Magasin",
+    "terrain": "Terrain",
+    "entrepôt": "Entrepôt",
+    "entrepot": "Entrepôt",
+    "studio": "Studio",
+    "duplex": "Duplex",
+    "riad": "Riad",
+    "ferme": "Ferme",
+    "immeuble": "Immeuble",
+}
+
+# Transaction keywords -> catalog category (RENT checked first)
+CATEGORY_KEYWORDS = {
+    "RENT": ["louer", "location", "à louer", "bail", "loue"],
+    "SALE": ["acheter", "vendre", "vente", "à vendre", "achat"],
+}
+
+# Common areas (first match wins)
+LOCATIONS = [
+    "anfa", "californie", "maarif", "racine", "gauthier",
+    "bouskoura", "ain diab", "corniche", "triangle d'or",
+    "bourgogne", "palmier", "oasis", "val fleuri", "oulfa",
+    "hay hassani", "sidi maarouf", "lissasfa", "polo"
+]
+
+# Feature keywords -> catalog feature
+FEATURE_KEYWORDS = {
+    "meublé": "Meublé",
+    "meuble": "Meublé",
+    "piscine": "Piscine",
+    "terrasse": "Terrasse",
+    "jardin": "Jardin",
+    "parking": "Parking",
+    "garage": "Garage",
+    "ascenseur": "Ascenseur",
+    "neuf": "Neuf",
+    "climatisation": "Climatisation",
+    "clim": "Climatisation",
+}
+
+# Search intents for the RAG pipeline and agent (scored by keyword coverage)
+INTENTS = {
+    "buy": {
+        "keywords": ["acheter", "achat", "vendre", "vente", "à vendre", "investir", "investissement"],
+        "category": "SALE"
+    },
+    "rent": {
+        "keywords": ["louer", "location", "à louer", "bail", "mensuel", "mois"],
+        "category": "RENT"
+    },
+    "search_type": {
+        "keywords": ["villa", "appartement", "bureau", "magasin", "terrain", "studio"],
+        "action": "filter_type"
+    },
+    "search_location": {
+        "keywords": ["anfa", "californie", "maarif", "bouskoura", "où", "quartier", "zone"],
+        "action": "filter_location"
+    },
+    "search_features": {
+        "keywords": ["meublé", "piscine", "terrasse", "jardin", "parking", "neuf"],
+        "action": "filter_features"
+    },
+    "search_specs": {
+        "keywords": ["chambre", "pièce", "m²", "surface", "grand", "spacieux"],
+        "action": "filter_specs"
+    },
+    "similar": {
+        "keywords": ["similaire", "comme", "ressemblant", "même genre", "du même type"],
+        "action": "find_similar"
+    },
+    "recommendations": {
+        "keywords": ["recommander", "suggérer", "conseiller", "proposer", "meilleur"],
+        "action": "recommend"
+    }
+}
+
+# Search API intents: (intent, confidence, keywords), first match wins
+SEARCH_INTENTS = [
+    ("rent", 0.9, ["louer", "location"]),
+    ("buy", 0.9, ["acheter", "vente"]),
+    ("search_type", 0.8, ["villa", "appartement", "bureau", "maison"]),
+    ("search_location", 0.85, ["anfa", "maarif", "californie", "bouskoura"]),
+]
+
+# Conversational intents for the chat agent, first match wins
+CHAT_INTENTS = {
+    "search": ["cherche", "recherche", "trouve", "montre", "veux"],
+    "price_inquiry": ["prix", "coût", "budget", "combien"],
+    "location_inquiry": ["quartier", "zone", "où", "localisation"],
+    "similar_search": ["similaire", "comme", "autre", "alternative"],
+    "details": ["détail", "plus d'info", "description"],
+    "greeting": ["bonjour", "salut", "hello", "bonsoir"],
+    "farewell": ["merci", "au revoir", "bye"],
+}
+
+# Category boosts for the servers' keyword search (RENT checked first)
+KEYWORD_BOOST_CATEGORIES = {
+    "RENT": ["louer", "location", "à louer"],
+    "SALE": ["acheter", "vente", "à vendre"],
+}
+
+# Client profile vocabularies (chat agent)
+PROFILE_LOCATIONS = ["anfa", "californie", "maarif", "racine", "gauthier", "bouskoura"]
+TRANSACTION_KEYWORDS = {
+    "SALE": ["acheter", "achat", "vente"],
+    "RENT": ["louer", "location", "bail"],
+}
+
+# French real estate synonyms
+SYNONYMS = {
+    "appartement": ["appart", "flat", "logement", "résidence"],
+    "villa": ["maison", "demeure", "propriété", "pavillon"],
+    "bureau": ["office", "local professionnel", "espace de travail"],
+    "magasin": ["boutique", "commerce", "local commercial", "shop"],
+    "luxe": ["haut standing", "prestige", "premium", "haut de gamme"],
+    "meublé": ["équipé", "aménagé", "furnished"],
+    "terrasse": ["balcon", "rooftop", "extérieur"],
+    "piscine": ["pool", "bassin"],
+    "garage": ["parking", "stationnement", "place de parking"],
+    "neuf": ["nouveau", "récent", "moderne", "contemporain"],
+    "centre ville": ["centre", "downtown", "hyper centre"],
+    "calme": ["tranquille", "paisible", "résidentiel"],
+    "vue mer": ["vue océan", "front de mer", "bord de mer"],
+    "jardin": ["espace vert", "terrain", "extérieur"],
+    "lumineux": ["clair", "ensoleillé", "baigné de lumière"],
+    "spacieux": ["grand", "vaste", "généreux"],
+    "standing": ["luxe", "haut de gamme", "prestige"],
+    "location": ["louer", "à louer", "bail"],
+    "achat": ["vente", "acheter", "à vendre"],
+    "chambres": ["pièces", "ch", "bedroom"],
+}
+
+# Location aliases
+LOCATION_ALIASES = {
+    "casa": "casablanca",
+    "anfa": "anfa",
+    "californie": "californie",
+    "bouskoura": "bouskoura",
+    "ain diab": "ain diab",
+    "maarif": "maarif",
+    "racine": "racine",
+    "gauthier": "gauthier",
+    "triangle d'or": "triangle d'or",
+    "corniche": "corniche",
+}
+
+# Bedroom count patterns for filters (first pattern that matches wins)
+BED_PATTERNS = [
+    re.compile(r"(\d+)\s*chambre"),
+    re.compile(r"(\d+)\s*ch\b"),
+    re.compile(r"(\d+)\s*pièce"),
+    re.compile(r"(\d+)\s*bedroom"),
+]
+
+# Client profile patterns (chat agent)
+BUDGET_PATTERN = re.compile(r"(\d+(?:\.\d+)?)\s*(?:millions?|m|mad|dh)")
+BEDROOM_PATTERN = re.compile(r"(\d+)\s*(?:chambre|ch\b|bedroom)")
+
+MAX_EXPANDED_QUERIES = 4
+SYNONYMS_PER_TERM = 2
+
+
+def _labelled(groups: Dict[str, List[str]]) -> List[Tuple[str, str]]:
+    """Flatten {label: [keywords]} into (keyword, label) pairs, in label order."""
+    return [(keyword, label) for label, keywords in groups.items() for keyword in keywords]
+
+
+# Every gazetteer as an ordered list of (keyword, value): a keyword's
+# position is its priority, so "first match wins" is the lowest position
+GAZETTEERS: Dict[str, List[Tuple[str, Any]]] = {
+    "type": list(PROPERTY_TYPES.items()),
+    "category": _labelled(CATEGORY_KEYWORDS),
+    "location": [(loc, loc) for loc in LOCATIONS],
+    "feature": list(FEATURE_KEYWORDS.items()),
+    "intent": _labelled({name: spec["keywords"] for name, spec in INTENTS.items()}),
+    "search_intent": [
+        (keyword, (intent, confidence))
+        for intent, confidence, keywords in SEARCH_INTENTS
+        for keyword in keywords
+    ],
+    "chat_intent": _labelled(CHAT_INTENTS),
+    "boost_category": _labelled(KEYWORD_BOOST_CATEGORIES),
+    "profile_location": [(loc, loc) for loc in PROFILE_LOCATIONS],
+    "transaction": _labelled(TRANSACTION_KEYWORDS),
+    "synonym": list(SYNONYMS.items()),
+    "location_alias": list(LOCATION_ALIASES.items()),
+}
+
+
+# ============================================================================
+# AUTOMATON
+# ============================================================================
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick automaton over (keyword, payload) pairs.
+    Reports every keyword occurring as a substring of the text (the same
+    semantics as `keyword in text`) in a single pass over the text.
+    """
+
+    def __init__(self, keywords: Iterable[Tuple[str, Any]]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Any]] = [[]]
+
+        for keyword, payload in keywords:
+            self._add(keyword, payload)
+        self._link()
+
+    def _add(self, keyword: str, payload: Any) -> None:
+        state = 0
+        for char in keyword:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = next_state
+        self._out[state].append(payload)
+
+    def _link(self) -> None:
+        """Breadth-first failure links; outputs inherit their suffix outputs."""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                self._out[next_state] = self._out[next_state] + self._out[self._fail[next_state]]
+
+    def iter_matches(self, text: str) -> Iterator[Any]:
+        """Yield the payload of every keyword occurrence in the text."""
+        state = 0
+        for char in text:
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            yield from self._out[state]
+
+    def scan(self, text: str) -> Dict[str, Set[int]]:
+        """Positions of the matched keywords, per gazetteer."""
+        hits: Dict[str, Set[int]] = {}
+        for group, position in self.iter_matches(text):
+            hits.setdefault(group, set()).add(position)
+        return hits
+
+
+_automaton = KeywordAutomaton(
+    (keyword, (group, position))
+    for group, entries in GAZETTEERS.items()
+    for position, (keyword, _) in enumerate(entries)
+)
+
+# Keyword count per classifier intent (score = matched share of the keywords)
+_intent_sizes = {name: len(spec["keywords"]) for name, spec in INTENTS.items()}
+
+
+# ============================================================================
+# PARSED QUERY
+# ============================================================================
+
+@dataclass
+class ParsedQuery:
+    """Everything derived from one query, computed in a single analysis pass."""
+    query: str
+    query_lower: str
+    filters: Dict[str, Any] = field(default_factory=dict)
+    intent: str = "general"
+    confidence: float = 0.5
+    search_intent: Dict[str, Any] = field(
+        default_factory=lambda: {"intent": "general", "confidence": 0.5}
+    )
+    chat_intent: str = "general"
+    category_boost: Optional[str] = None
+    expanded_queries: List[str] = field(default_factory=list)
+    expansion_terms: List[str] = field(default_factory=list)
+    budget: Optional[float] = None
+    bedrooms: Optional[int] = None
+    locations: List[str] = field(default_factory=list)
+    transaction_type: Optional[str] = None
+
+
+def _matched(hits: Dict[str, Set[int]], group: str) -> List[Tuple[str, Any]]:
+    """Matched (keyword, value) pairs of a gazetteer, in priority order."""
+    entries = GAZETTEERS[group]
+    return [entries[position] for position in sorted(hits.get(group, ()))]
+
+
+def _first(hits: Dict[str, Set[int]], group: str) -> Any:
+    """Value of the highest-priority matched keyword, or None."""
+    positions = hits.get(group)
+    return GAZETTEERS[group][min(positions)][1] if positions else None
+
+
+def _extract_filters(query_lower: str, hits: Dict[str, Set[int]]) -> Dict[str, Any]:
+    """
+    Structured filters from the query.
+    E.g., "villa 4 chambres anfa" -> {type: "Villa", beds: 4, location: "anfa"}
+    """
+    filters: Dict[str, Any] = {}
+
+    prop_type = _first(hits, "type")
+    if prop_type:
+        filters["type"] = prop_type
+
+    category = _first(hits, "category")
+    if category:
+        filters["category"] = category
+
+    for pattern in BED_PATTERNS:
+        match = pattern.search(query_lower)
+        if match:
+            filters["beds"] = int(match.group(1))
+            break
+
+    location = _first(hits, "location")
+    if location:
+        filters["location"] = location
+
+    features = [feature for _, feature in _matched(hits, "feature")]
+    if features:
+        filters["features"] = features
+
+    return filters
+
+
+def _classify_intent(hits: Dict[str, Set[int]]) -> Tuple[str, float]:
+    """Best intent by keyword coverage, as (intent, confidence)."""
+    counts: Dict[str, int] = {}
+    for _, intent in _matched(hits, "intent"):
+        counts[intent] = counts.get(intent, 0) + 1
+
+    if not counts:
+        return "general", 0.5
+
+    # Score in INTENTS order so ties keep the first intent
+    intent_scores = {
+        intent: counts[intent] / size
+        for intent, size in _intent_sizes.items() if intent in counts
+    }
+    best_intent = max(intent_scores, key=intent_scores.get)
+    return best_intent, min(intent_scores[best_intent] * 2, 1.0)  # Scale to 0-1
+
+
+def _expand(query: str, query_lower: str, hits: Dict[str, Set[int]]) -> Tuple[List[str], List[str]]:
+    """
+    Original query + synonym and location alias rewrites, and the
+    replacement term of each kept rewrite (for embedding-space expansion).
+    """
+    expanded = [query]
+    terms = []
+
+    rewrites = [
+        (term, synonym)
+        for term, synonyms in _matched(hits, "synonym")
+        for synonym in synonyms[:SYNONYMS_PER_TERM]
+    ]
+    rewrites += [
+        (alias, full_name)
+        for alias, full_name in _matched(hits, "location_alias")
+        if alias != full_name
+    ]
+
+    for term, replacement in rewrites:
+        if len(expanded) >= MAX_EXPANDED_QUERIES:
+            break
+        expanded_query = query_lower.replace(term, replacement)
+        if expanded_query not in expanded:
+            expanded.append(expanded_query)
+            terms.append(replacement)
+
+    return expanded, terms
+
+
+def _extract_budget(query_lower: str) -> Optional[float]:
+    """Budget in MAD ("2.5 millions", "3m", "900000 dh")."""
+    match = BUDGET_PATTERN.search(query_lower)
+    if not match:
+        return None
+    value = float(match.group(1))
+    if "million" in query_lower or "m" in match.group(0):
+        value *= 1_000_000
+    return value
+
+
+def analyze_query(query: str) -> ParsedQuery:
+    """Analyze a query with one automaton pass and the compiled regexes."""
+    query_lower = query.lower()
+    hits = _automaton.scan(query_lower)
+
+    intent, confidence = _classify_intent(hits)
+    search_intent = _first(hits, "search_intent") or ("general", 0.5)
+    bed_match = BEDROOM_PATTERN.search(query_lower)
+    expanded_queries, expansion_terms = _expand(query, query_lower, hits)
+
+    return ParsedQuery(
+        query=query,
+        query_lower=query_lower,
+        filters=_extract_filters(query_lower, hits),
+        intent=intent,
+        confidence=confidence,
+        search_intent={"intent": search_intent[0], "confidence": search_intent[1]},
+        chat_intent=_first(hits, "chat_intent") or "general",
+        category_boost=_first(hits, "boost_category"),
+        expanded_queries=expanded_queries,
+        expansion_terms=expansion_terms,
+        budget=_extract_budget(query_lower),
+        bedrooms=int(bed_match.group(1)) if bed_match else None,
+        locations=[loc for loc, _ in _matched(hits, "profile_location")],
+        transaction_type=_first(hits, "transaction")
+    )
+
+
+# ============================================================================
+# REQUEST CONTEXT
+# ============================================================================
+
+class RequestContext:
+    """
+    Per-request memo of query analyses and query embeddings, keyed by
+    query text. Created once per search request and passed down to the
+    pipeline, agent and vector store, so the main query (and each
+    expanded query) is analyzed and embedded once however many search
+    and scoring steps use it.
+    """
+
+    def __init__(self, query: str):
+        self.query = query
+        self._analyses: Dict[str, ParsedQuery] = {}
+        self._embeddings: Dict[str, Any] = {}
+        self._lock = threading.Lock()  # parallel graph branches share the context
+
+    @property
+    def parsed(self) -> ParsedQuery:
+        """Analysis of the request's main query."""
+        return self.analyze(self.query)
+
+    def analyze(self, query: Optional[str] = None) -> ParsedQuery:
+        """Memoized analyze_query() (defaults to the main query)."""
+        query = self.query if query is None else query
+        with self._lock:
+            parsed = self._analyses.get(query)
+            if parsed is None:
+                parsed = self._analyses[query] = analyze_query(query)
+        return parsed
+
+    def cached_embedding(self, query: str) -> Optional[Any]:
+        """Embedding already memoized for the query, if any."""
+        return self._embeddings.get(query)
+
+    def embedding(self, query: str, embed_fn: Callable[[str], Any]) -> Any:
+        """Memoized query embedding from embed_fn."""
+        vector = self._embeddings.get(query)
+        if vector is None:
+            vector = self._embeddings[query] = embed_fn(query)
+        return vector
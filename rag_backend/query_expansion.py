@@ -0,0 +1,136 @@
+"""
+Query Expansion Module
+======================
+Embedding-space query expansion.
+Every synonym and location alias the query analyzer can rewrite to is
+embedded once at index-build time. At query time the replacement terms
+of the matched rewrites are folded into the query vector as a weighted
+centroid: one vector addition and one search, instead of one extra
+embedding and search per rewritten query string.
+"""
+
+import logging
+from pathlib import Path
+from typing import List, Dict, Callable, Optional
+import numpy as np
+
+from query_analysis import SYNONYMS, LOCATION_ALIASES, SYNONYMS_PER_TERM
+
+logger = logging.getLogger(__name__)
+
+SYNONYM_VECTORS_FILE = "synonym_vectors.npz"
+
+# Weight of the synonym centroid against the query vector (weight 1)
+DEFAULT_EXPANSION_WEIGHT = 0.3
+
+
+def expansion_vocabulary() -> List[str]:
+    """Every replacement term query_analysis._expand() can produce."""
+    terms = [synonym for synonyms in SYNONYMS.values() for synonym in synonyms[:SYNONYMS_PER_TERM]]
+    terms += [full_name for alias, full_name in LOCATION_ALIASES.items() if alias != full_name]
+    return list(dict.fromkeys(terms))
+
+
+class SynonymVectors:
+    """Replacement term -> query-space vector table."""
+
+    def __init__(self, terms: List[str], vectors: np.ndarray, model_name: str = "", shipped: bool = False):
+        self.terms = list(terms)
+        self.vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        self.model_name = model_name
+        self.shipped = shipped  # loaded from generate_index.py's file
+        self.lookup: Dict[str, int] = {term: i for i, term in enumerate(self.terms)}
+
+    @property
+    def dimension(self) -> int:
+        return self.vectors.shape[1]
+
+    def shift(self, terms: List[str], weight: float = DEFAULT_EXPANSION_WEIGHT) -> Optional[np.ndarray]:
+        """
+        weight * centroid of the known terms' vectors, to add to the
+        query vector before renormalizing; None without any known term.
+        """
+        rows = [self.lookup[term] for term in terms if term in self.lookup]
+        if not rows or weight <= 0:
+            return None
+        return (weight * self.vectors[rows].mean(axis=0)).astype(np.float32)
+
+    def save(self, path: Path) -> None:
+        np.savez(
+            path,
+            terms=np.array(self.terms),
+            vectors=self.vectors,
+            model_name=np.array(self.model_name)
+        )
+
+    @classmethod
+    def load(cls, path: Path) -> "SynonymVectors":
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data["terms"].tolist(), data["vectors"], str(data["model_name"]))
+
+
+def fold_expansion(query_vector: np.ndarray, shift: Optional[np.ndarray]) -> np.ndarray:
+    """Query vector moved towards its synonyms, renormalized (unchanged without shift)."""
+    if shift is None:
+        return query_vector
+    folded = query_vector + shift
+    norm = np.linalg.norm(folded)
+    if norm == 0:
+        return query_vector
+    return (folded / norm).astype(np.float32)
+
+
+def build_synonym_vectors(
+    encode_fn: Callable[[List[str]], np.ndarray],
+    model_name: str = ""
+) -> SynonymVectors:
+    """Embed the expansion vocabulary with encode_fn (query encoding, prefix included)."""
+    terms = expansion_vocabulary()
+    return SynonymVectors(terms, encode_fn(terms), model_name)
+
+
+def load_synonym_vectors(
+    path: Path,
+    model_name: Optional[str] = None,
+    dimension: Optional[int] = None
+) -> Optional[SynonymVectors]:
+    """
+    Precomputed synonym vectors, or None when absent, unreadable or built
+    for another model / dimension or an older synonym list.
+    """
+    if not path.exists():
+        return None
+    try:
+        vectors = SynonymVectors.load(path)
+    except Exception as e:
+        logger.warning(f"Failed to load synonym vectors: {e}")
+        return None
+
+    if model_name is not None and vectors.model_name != model_name:
+        logger.warning(f"Synonym vectors built with {vectors.model_name}, not {model_name} - ignored")
+        return None
+    if dimension is not None and vectors.dimension != dimension:
+        logger.warning(f"Synonym vectors have {vectors.dimension} dims, expected {dimension} - ignored")
+        return None
+    if set(expansion_vocabulary()) - set(vectors.lookup):
+        logger.warning("Synonym vectors miss terms of the current synonym list - ignored")
+        return None
+
+    vectors.shipped = True
+    logger.info(f"Loaded {len(vectors.terms)} synonym vectors")
+    return vectors
+
+
+def use_vector_expansion(mode: str, vectors: Optional[SynonymVectors]) -> bool:
+    """
+    Whether the agent expands in embedding space (QUERY_EXPANSION_MODE):
+    "vector" whenever synonym vectors exist, "auto" only with the ones
+    shipped by generate_index.py, "text" never.
+    """
+    if vectors is None:
+        return False
+    if mode == "vector":
+        return True
+    if mode == "auto":
+        return vectors.shipped
+    return False
@@ -8,13 +8,15 @@ Implements context-aware search with re-ranking.
 import logging
 from typing import List, Dict, Any, Optional
 from dataclasses import dataclass, field
+import numpy as np
 
 from langchain_core.documents import Document
 from langchain_core.retrievers import BaseRetriever
 from langchain_core.callbacks import CallbackManagerForRetrieverRun
 
 from vector_store import PropertyVectorStore
-from embeddings import QueryExpander
+from query_analysis import INTENTS, RequestContext, analyze_query
+from reranker import ResultReranker, sort_by_scores
 
 logger = logging.getLogger(__name__)
 
@@ -27,6 +29,7 @@ class SearchContext:
     filters: Dict[str, Any] = field(default_factory=dict)
     intent: str = "general"
     confidence: float = 0.0
+    request: Optional[RequestContext] = None
 
 
 class IntentClassifier:
@@ -35,40 +38,7 @@ class IntentClassifier:
     Helps optimize search strategy.
     """
 
-    INTENTS = {
-        "buy": {
-            "keywords": ["acheter", "achat", "vendre", "vente", "à vendre", "investir", "investissement"],
-            "category": "SALE"
-        },
-        "rent": {
-            "keywords": ["louer", "location", "à louer", "bail", "mensuel", "mois"],
-            "category": "RENT"
-        },
-        "search_type": {
-            "keywords": ["villa", "appartement", "bureau", "magasin", "terrain", "studio"],
-            "action": "filter_type"
-        },
-        "search_location": {
-            "keywords": ["anfa", "californie", "maarif", "bouskoura", "où", "quartier", "zone"],
-            "action": "filter_location"
-        },
-        "search_features": {
-            "keywords": ["meublé", "piscine", "terrasse", "jardin", "parking", "neuf"],
-            "action": "filter_features"
-        },
-        "search_specs": {
-            "keywords": ["chambre", "pièce", "m²", "surface", "grand", "spacieux"],
-            "action": "filter_specs"
-        },
-        "similar": {
-            "keywords": ["similaire", "comme", "ressemblant", "même genre", "du même type"],
-            "action": "find_similar"
-        },
-        "recommendations": {
-            "keywords": ["recommander", "suggérer", "conseiller", "proposer", "meilleur"],
-            "action": "recommend"
-        }
-    }
+    INTENTS = INTENTS
 
     @classmethod
     def classify(cls, query: str) -> tuple[str, float]:
@@ -76,25 +46,8 @@ class IntentClassifier:
         Classify the intent of a query.
         Returns (intent, confidence).
         """
-        query_lower = query.lower()
-        intent_scores = {}
-
-        for intent, config in cls.INTENTS.items():
-            score = 0
-            for keyword in config["keywords"]:
-                if keyword in query_lower:
-                    score += 1
-
-            if score > 0:
-                intent_scores[intent] = score / len(config["keywords"])
-
-        if not intent_scores:
-            return "general", 0.5
-
-        best_intent = max(intent_scores, key=intent_scores.get)
-        confidence = min(intent_scores[best_intent] * 2, 1.0)  # Scale to 0-1
-
-        return best_intent, confidence
+        parsed = analyze_query(query)
+        return parsed.intent, parsed.confidence
 
 
 class PropertyRetriever(BaseRetriever):
@@ -179,20 +132,25 @@ class RAGSearchPipeline:
             top_k=20
         )
 
-    def analyze_query(self, query: str) -> SearchContext:
+    def analyze_query(
+        self,
+        query: str,
+        request: Optional[RequestContext] = None
+    ) -> SearchContext:
         """
         Analyze query to create search context.
         """
-        context = SearchContext(query=query)
-
-        # Classify intent
-        context.intent, context.confidence = IntentClassifier.classify(query)
-
-        # Expand query
-        context.expanded_queries = QueryExpander.expand_query(query)
-
-        # Extract filters from vector store
-        context.filters = self.vector_store._extract_filters_from_query(query)
+        # Intent, expansions and filters in one pass
+        request = request or RequestContext(query)
+        parsed = request.analyze(query)
+        context = SearchContext(
+            query=query,
+            expanded_queries=parsed.expanded_queries,
+            filters=parsed.filters,
+            intent=parsed.intent,
+            confidence=parsed.confidence,
+            request=request
+        )
 
         logger.info(f"Query analysis: intent={context.intent}, confidence={context.confidence:.2f}")
         logger.info(f"Filters: {context.filters}")
@@ -213,7 +171,7 @@ class RAGSearchPipeline:
         context = self.analyze_query(query)
 
         # Execute search
-        results = self.vector_store.hybrid_search(query, top_k=top_k * 2)
+        results = self.vector_store.hybrid_search(query, top_k=top_k * 2, context=context.request)
 
         # Re-rank based on intent
         reranked = self._rerank_by_intent(results, context)
@@ -241,38 +199,15 @@ class RAGSearchPipeline:
         """
         Re-rank results based on detected intent.
         """
-        for result in results:
-            score = result.get("_score", 0)
-
-            # Intent-based boosting
-            if context.intent in ["buy", "rent"]:
-                expected_category = "SALE" if context.intent == "buy" else "RENT"
-                if result.get("category") == expected_category:
-                    score *= 1.3
-
-            # Location match boost
-            if "location" in context.filters:
-                if context.filters["location"].lower() in result.get("location", "").lower():
-                    score *= 1.25
-
-            # Type match boost
-            if "type" in context.filters:
-                if result.get("type") == context.filters["type"]:
-                    score *= 1.2
-
-            # Feature match boost
-            if "features" in context.filters:
-                prop_features = [f.lower() for f in result.get("features", [])]
-                matches = sum(1 for f in context.filters["features"] if f.lower() in prop_features)
-                if matches > 0:
-                    score *= (1 + 0.1 * matches)
+        reranker = ResultReranker(self.vector_store.catalog, self.vector_store.id_to_idx)
+        rows = reranker.rows(results)
+        scores = np.array([r.get("_score", 0) for r in results], dtype=np.float64)
 
-            result["_final_score"] = score
+        # Intent category, location, type and feature match boosts
+        final_scores = reranker.intent_scores(rows, scores, context.intent, context.filters)
 
         # Sort by final score
-        results.sort(key=lambda x: x.get("_final_score", 0), reverse=True)
-
-        return results
+        return sort_by_scores(results, final_scores)
 
     def get_similar(self, property_id: str, top_k: int = 5) -> Dict[str, Any]:
         """
@@ -297,20 +232,22 @@ class RelevanceScorer:
     """
 
     @staticmethod
-    def calculate_relevance(query: str, result: Dict[str, Any]) -> float:
+    def calculate_relevance(
+        query: str,
+        result: Dict[str, Any],
+        filters: Optional[Dict[str, Any]] = None
+    ) -> float:
         """
         Calculate how relevant a result is to the query.
+        Pass the query's filters when scoring many results for one query.
         Returns score 0-1.
         """
-        query_lower = query.lower()
-        query_terms = set(query_lower.split())
-
         score = 0.0
         total_checks = 0
 
         # Extract filters from query
-        from vector_store import PropertyVectorStore
-        filters = PropertyVectorStore._extract_filters_from_query(None, query)
+        if filters is None:
+            filters = analyze_query(query).filters
 
         # Check type match
         if "type" in filters:
@@ -354,14 +291,26 @@ class RelevanceScorer:
     def filter_by_relevance(
         results: List[Dict[str, Any]],
         query: str,
-        min_relevance: float = 0.7
+        min_relevance: float = 0.7,
+        reranker: Optional[ResultReranker] = None
     ) -> List[Dict[str, Any]]:
         """
         Filter results to only include highly relevant ones.
+        With a reranker over the results' catalog, relevance is
+        computed for all results at once.
         """
+        filters = analyze_query(query).filters
+
+        if reranker is not None:
+            scores = np.array([r.get("_score", 0.5) for r in results], dtype=np.float64)
+            relevance = reranker.relevance(reranker.rows(results), filters, scores)
+            for result, value in zip(results, relevance.tolist()):
+                result["_relevance"] = value
+            return [r for r, keep in zip(results, relevance >= min_relevance) if keep]
+
         filtered = []
         for result in results:
-            relevance = RelevanceScorer.calculate_relevance(query, result)
+            relevance = RelevanceScorer.calculate_relevance(query, result, filters)
             result["_relevance"] = relevance
             if relevance >= min_relevance:
                 filtered.append(result)
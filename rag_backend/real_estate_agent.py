@@ -18,6 +18,7 @@ from typing import List, Dict, Any, Optional, TypedDict, Literal, Annotated
 from dataclasses import dataclass, field
 from datetime import datetime
 from pathlib import Path
+import numpy as np
 
 # Load environment variables
 from dotenv import load_dotenv
@@ -30,6 +31,7 @@ from langgraph.graph.message import add_messages
 
 from vector_store import PropertyVectorStore
 from embeddings import PropertyEmbedder
+from query_analysis import ParsedQuery, analyze_query
 
 logger = logging.getLogger(__name__)
 
@@ -295,12 +297,13 @@ class EliteRealEstateAgent:
         """Process user input and prepare for LLM."""
         user_query = state["user_query"]
 
-        # Detect intent from query
-        intent = self._detect_intent(user_query)
+        # Intent and profile signals from one analysis pass
+        parsed = analyze_query(user_query)
+        intent = parsed.chat_intent
 
         # Update client profile based on query
         profile = state.get("client_profile", {})
-        profile = self._update_client_profile(profile, user_query)
+        profile = self._update_client_profile(profile, parsed)
 
         return {
             "current_intent": intent,
@@ -432,8 +435,17 @@ class EliteRealEstateAgent:
             cat = "à vendre" if args["category"] == "SALE" else "à louer"
             query = f"{query} {cat}"
 
-        # Execute search
-        results = self.vector_store.hybrid_search(query, top_k=10)
+        # Execute search (explicit criteria are pushed down as filters)
+        filters = {
+            key: value for key, value in {
+                "category": args.get("category"),
+                "type": args.get("property_type"),
+                "beds": args.get("min_beds"),
+                "max_price": args.get("max_price"),
+                "location": args.get("location"),
+            }.items() if value
+        }
+        results = self.vector_store.hybrid_search(query, top_k=10, filters=filters)
 
         # Apply additional filters
         filtered = []
@@ -543,43 +555,42 @@ class EliteRealEstateAgent:
         prop_type = args.get("property_type", "")
         category = args.get("category", "")
 
-        # Filter properties for the location
-        relevant = []
-        for prop in self.vector_store.properties:
-            if location in prop.get("location", "").lower():
-                if prop_type and prop.get("type") != prop_type:
-                    continue
-                if category and prop.get("category") != category:
-                    continue
-                if prop.get("priceNumeric", 0) > 0:
-                    relevant.append(prop)
-
-        if not relevant:
+        # Filter properties for the location (vectorized over catalog columns)
+        catalog = self.vector_store.catalog
+        mask = catalog.mask(
+            location=location or None,
+            type=prop_type or None,
+            category=category or None
+        )
+        mask &= catalog.price > 0
+
+        if not mask.any():
             return {
                 "location": location,
                 "message": "Pas assez de données pour cette zone"
             }
 
         # Calculate statistics
-        prices = [p["priceNumeric"] for p in relevant]
-        areas = [p["areaNumeric"] for p in relevant if p.get("areaNumeric")]
+        prices = catalog.price[mask]
+        areas = catalog.area[mask]
+        areas = areas[areas > 0]
 
-        avg_price = sum(prices) / len(prices)
-        min_price = min(prices)
-        max_price = max(prices)
+        avg_price = float(prices.mean())
+        min_price = float(prices.min())
+        max_price = float(prices.max())
 
-        avg_area = sum(areas) / len(areas) if areas else 0
+        avg_area = float(areas.mean()) if areas.size else 0
         price_per_m2 = avg_price / avg_area if avg_area > 0 else 0
 
         # Count by type
-        by_type = {}
-        for p in relevant:
-            t = p.get("type", "Autre")
-            by_type[t] = by_type.get(t, 0) + 1
+        by_type = catalog.value_counts("type", mask)
+        missing_type = int(np.count_nonzero(catalog.codes["type"][mask] < 0))
+        if missing_type:
+            by_type["Autre"] = by_type.get("Autre", 0) + missing_type
 
         return {
             "location": location,
-            "total_properties": len(relevant),
+            "total_properties": int(np.count_nonzero(mask)),
             "price_stats": {
                 "average": round(avg_price),
                 "min": round(min_price),
@@ -597,55 +608,27 @@ class EliteRealEstateAgent:
 
     def _detect_intent(self, query: str) -> str:
         """Detect user intent from query."""
-        query_lower = query.lower()
-
-        if any(w in query_lower for w in ["cherche", "recherche", "trouve", "montre", "veux"]):
-            return "search"
-        if any(w in query_lower for w in ["prix", "coût", "budget", "combien"]):
-            return "price_inquiry"
-        if any(w in query_lower for w in ["quartier", "zone", "où", "localisation"]):
-            return "location_inquiry"
-        if any(w in query_lower for w in ["similaire", "comme", "autre", "alternative"]):
-            return "similar_search"
-        if any(w in query_lower for w in ["détail", "plus d'info", "description"]):
-            return "details"
-        if any(w in query_lower for w in ["bonjour", "salut", "hello", "bonsoir"]):
-            return "greeting"
-        if any(w in query_lower for w in ["merci", "au revoir", "bye"]):
-            return "farewell"
-
-        return "general"
-
-    def _update_client_profile(self, profile: Dict, query: str) -> Dict:
+        return analyze_query(query).chat_intent
+
+    def _update_client_profile(self, profile: Dict, parsed: ParsedQuery) -> Dict:
         """Update client profile based on conversation."""
-        query_lower = query.lower()
-
-        # Detect budget mentions
-        import re
-        budget_match = re.search(r'(\d+(?:\.\d+)?)\s*(?:millions?|m|mad|dh)', query_lower)
-        if budget_match:
-            value = float(budget_match.group(1))
-            if "million" in query_lower or "m" in budget_match.group(0):
-                value *= 1_000_000
-            profile["budget"] = value
-
-        # Detect bedroom preferences
-        bed_match = re.search(r'(\d+)\s*(?:chambre|ch\b|bedroom)', query_lower)
-        if bed_match:
-            profile["preferred_beds"] = int(bed_match.group(1))
-
-        # Detect location preferences
-        locations = ["anfa", "californie", "maarif", "racine", "gauthier", "bouskoura"]
-        for loc in locations:
-            if loc in query_lower:
-                profile.setdefault("preferred_locations", []).append(loc)
-                profile["preferred_locations"] = list(set(profile["preferred_locations"]))
-
-        # Detect transaction type
-        if any(w in query_lower for w in ["acheter", "achat", "vente"]):
-            profile["transaction_type"] = "SALE"
-        elif any(w in query_lower for w in ["louer", "location", "bail"]):
-            profile["transaction_type"] = "RENT"
+        # Budget mentions
+        if parsed.budget is not None:
+            profile["budget"] = parsed.budget
+
+        # Bedroom preferences
+        if parsed.bedrooms is not None:
+            profile["preferred_beds"] = parsed.bedrooms
+
+        # Location preferences
+        if parsed.locations:
+            profile["preferred_locations"] = list(
+                set(profile.get("preferred_locations", [])) | set(parsed.locations)
+            )
+
+        # Transaction type
+        if parsed.transaction_type:
+            profile["transaction_type"] = parsed.transaction_type
 
         return profile
 
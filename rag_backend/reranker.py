@@ -0,0 +1,146 @@
+"""
+Reranker Module
+===============
+Vectorized relevance scoring and reranking of search results.
+Results are mapped to catalog rows once; filter/intent match boosts are
+mask operations over those rows, and the query-independent priors
+(completeness, smartTags) come precomputed from the catalog.
+"""
+
+from typing import List, Dict, Any
+import numpy as np
+
+from catalog import PropertyCatalog
+
+# Catalog category expected for a transactional intent
+INTENT_CATEGORIES = {"buy": "SALE", "rent": "RENT"}
+
+# Pipeline rerank boosts (RAGSearchPipeline)
+INTENT_CATEGORY_BOOST = 1.3
+LOCATION_MATCH_BOOST = 1.25
+TYPE_MATCH_BOOST = 1.2
+FEATURE_MATCH_BOOST = 0.1  # per matched feature
+
+# Agent ranking boosts (PropertySearchAgent)
+AGENT_CATEGORY_BOOST = 1.2
+FILTER_MATCH_BOOST = 0.1  # per matched hard filter
+SMART_TAGS_BOOST = 1.1
+COMPLETENESS_BOOST = 0.1  # at full completeness
+
+
+class ResultReranker:
+    """
+    Scores result dicts as columns over their catalog rows.
+    Row i == properties[i], so the masks come straight from the catalog.
+    """
+
+    def __init__(self, catalog: PropertyCatalog, id_to_idx: Dict[str, int]):
+        self.catalog = catalog
+        self.id_to_idx = id_to_idx
+
+    def rows(self, results: List[Dict[str, Any]]) -> np.ndarray:
+        """Catalog rows of the results, in result order."""
+        return np.fromiter(
+            (self.id_to_idx[r["id"]] for r in results), dtype=np.int64, count=len(results)
+        )
+
+    # ========================================================================
+    # MATCHES
+    # ========================================================================
+
+    def filter_masks(self, rows: np.ndarray, filters: Dict[str, Any]) -> List[np.ndarray]:
+        """
+        One boolean array per relevance check: type, category, location,
+        beds and each requested feature, for the filters that are present.
+        """
+        masks = []
+        if "type" in filters:
+            masks.append(self.catalog.equals_mask("type", filters["type"])[rows])
+        if "category" in filters:
+            masks.append(self.catalog.equals_mask("category", filters["category"])[rows])
+        if "location" in filters:
+            masks.append(self.catalog.contains_mask("location", filters["location"])[rows])
+        if "beds" in filters:
+            masks.append(self.catalog.beds[rows] >= filters["beds"])
+        for feature in filters.get("features", []):
+            masks.append(self.catalog.features_mask([feature])[rows])
+        return masks
+
+    def feature_matches(self, rows: np.ndarray, features: List[str]) -> np.ndarray:
+        """Number of requested features each row has."""
+        matches = np.zeros(len(rows), dtype=np.int64)
+        for feature in features:
+            matches += self.catalog.features_mask([feature])[rows]
+        return matches
+
+    # ========================================================================
+    # SCORING
+    # ========================================================================
+
+    def relevance(
+        self,
+        rows: np.ndarray,
+        filters: Dict[str, Any],
+        scores: np.ndarray
+    ) -> np.ndarray:
+        """
+        Share of the structured checks each row passes (0-1).
+        Without structured filters, the given (semantic) scores are used.
+        """
+        masks = self.filter_masks(rows, filters)
+        if not masks:
+            return np.asarray(scores, dtype=np.float64)
+        return np.sum(masks, axis=0) / len(masks)
+
+    def intent_scores(
+        self,
+        rows: np.ndarray,
+        scores: np.ndarray,
+        intent: str,
+        filters: Dict[str, Any]
+    ) -> np.ndarray:
+        """Scores boosted by intent category, location, type and feature matches."""
+        final = np.array(scores, dtype=np.float64)
+
+        if intent in INTENT_CATEGORIES:
+            final[self.catalog.equals_mask("category", INTENT_CATEGORIES[intent])[rows]] *= INTENT_CATEGORY_BOOST
+        if "location" in filters:
+            final[self.catalog.contains_mask("location", filters["location"])[rows]] *= LOCATION_MATCH_BOOST
+        if "type" in filters:
+            final[self.catalog.equals_mask("type", filters["type"])[rows]] *= TYPE_MATCH_BOOST
+        if "features" in filters:
+            matches = self.feature_matches(rows, filters["features"])
+            matched = matches > 0
+            final[matched] *= 1 + FEATURE_MATCH_BOOST * matches[matched]
+
+        return final
+
+    def agent_scores(
+        self,
+        rows: np.ndarray,
+        scores: np.ndarray,
+        intent: str,
+        filter_matches: np.ndarray
+    ) -> np.ndarray:
+        """Scores boosted by intent category, hard-filter matches and priors."""
+        boost = np.ones(len(rows), dtype=np.float64)
+
+        if intent in INTENT_CATEGORIES:
+            boost[self.catalog.equals_mask("category", INTENT_CATEGORIES[intent])[rows]] *= AGENT_CATEGORY_BOOST
+        boost *= 1 + FILTER_MATCH_BOOST * filter_matches
+        boost[self.catalog.has_smart_tags[rows]] *= SMART_TAGS_BOOST
+        boost *= 1 + COMPLETENESS_BOOST * self.catalog.completeness[rows]
+
+        return np.asarray(scores, dtype=np.float64) * boost
+
+
+def sort_by_scores(
+    results: List[Dict[str, Any]],
+    scores: np.ndarray,
+    key: str = "_final_score"
+) -> List[Dict[str, Any]]:
+    """Store scores on the results and sort best first (stable on ties)."""
+    for result, score in zip(results, scores.tolist()):
+        result[key] = score
+    order = np.argsort(-scores, kind="stable")
+    return [results[i] for i in order.tolist()]
@@ -0,0 +1,148 @@
+"""
+Result Cache Module
+===================
+In-memory cache for search/listing responses, tagged with the version of
+the index snapshot that produced them. A version change drops every
+entry, so results stay correct across reloads and index updates.
+Entries past their TTL are served stale for a grace period while a
+background task recomputes them (stale-while-revalidate).
+"""
+
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Callable, Tuple, Set
+import orjson
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_TTL_SECONDS = 300
+DEFAULT_STALE_SECONDS = 3600
+
+
+def normalize_request_query(query: str) -> str:
+    """Lowercase and collapse whitespace (search is case-insensitive)."""
+    return " ".join(query.lower().split())
+
+
+class ResultCache:
+    """
+    Versioned LRU response cache with stale-while-revalidate.
+    Meant for the event loop thread: lookups are synchronous dict
+    operations, computations (misses, revalidation) run in worker threads
+    so concurrent misses overlap.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        stale_seconds: float = DEFAULT_STALE_SECONDS
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+
+        self.version: Optional[str] = None
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._refreshing: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self._counters = {
+            "hits": 0,
+            "stale_hits": 0,
+            "misses": 0,
+            "refreshes": 0,
+            "invalidations": 0,
+            "evictions": 0,
+        }
+
+    @staticmethod
+    def make_key(endpoint: str, **params: Any) -> str:
+        """Canonical key: endpoint + parameters with sorted (nested) keys."""
+        return orjson.dumps({"endpoint": endpoint, **params}, option=orjson.OPT_SORT_KEYS).decode()
+
+    def _check_version(self, version: str) -> None:
+        """Drop every entry when the index snapshot version changes."""
+        if version != self.version:
+            if self._entries:
+                self._counters["invalidations"] += 1
+                logger.info(f"Result cache invalidated: {self.version} -> {version}")
+            self._entries.clear()
+            self.version = version
+
+    def _store(self, key: str, version: str, value: Any) -> None:
+        # Results computed for an older snapshot are never stored
+        if version != self.version:
+            return
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    def _revalidate(self, key: str, version: str, compute: Callable[[], Any]) -> None:
+        """Recompute an entry in the background (once per key at a time)."""
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+
+        async def refresh():
+            try:
+                value = await asyncio.to_thread(compute)
+                self._store(key, version, value)
+                self._counters["refreshes"] += 1
+            except Exception as e:
+                logger.warning(f"Result cache refresh failed: {e}")
+            finally:
+                self._refreshing.discard(key)
+
+        task = asyncio.get_running_loop().create_task(refresh())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def get_or_compute(
+        self,
+        key: str,
+        version: str,
+        compute: Callable[[], Any]
+    ) -> Tuple[Any, str]:
+        """
+        Cached value for the key at this snapshot version, computing it on
+        a miss. Returns (value, status) with status hit / stale / miss /
+        bypass (cache disabled).
+        """
+        if self.max_entries <= 0:
+            return await asyncio.to_thread(compute), "bypass"
+
+        self._check_version(version)
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            age = time.monotonic() - entry[0]
+            if age < self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self._counters["hits"] += 1
+                return entry[1], "hit"
+            if age < self.ttl_seconds + self.stale_seconds:
+                self._entries.move_to_end(key)
+                self._counters["stale_hits"] += 1
+                self._revalidate(key, version, compute)
+                return entry[1], "stale"
+
+        self._counters["misses"] += 1
+        value = await asyncio.to_thread(compute)
+        self._store(key, version, value)
+        return value, "miss"
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters, size and the snapshot version the entries belong to."""
+        lookups = self._counters["hits"] + self._counters["stale_hits"] + self._counters["misses"]
+        served = self._counters["hits"] + self._counters["stale_hits"]
+        return {
+            **self._counters,
+            "hit_rate": round(served / lookups, 4) if lookups else 0.0,
+            "entries": len(self._entries),
+            "version": self.version
+        }
@@ -0,0 +1,62 @@
+"""
+Scoring Module
+==============
+Vectorized score fusion helpers shared by the search paths.
+All arrays are aligned with FAISS row ids (row i == properties[i]).
+"""
+
+from typing import Optional
+import numpy as np
+
+
+def scatter_scores(
+    size: int,
+    indices: np.ndarray,
+    scores: np.ndarray,
+    dtype=np.float32
+) -> np.ndarray:
+    """
+    Build a dense score vector from (index, score) pairs.
+    Negative indices (FAISS padding for missing results) are ignored.
+    """
+    dense = np.zeros(size, dtype=dtype)
+    indices = np.asarray(indices, dtype=np.int64)
+    valid = indices >= 0
+    dense[indices[valid]] = np.asarray(scores, dtype=dtype)[valid]
+    return dense
+
+
+def normalize_max(scores: np.ndarray) -> np.ndarray:
+    """Scale scores to 0-1 by their maximum (single pass, no-op when empty)."""
+    if scores.size == 0:
+        return scores
+    max_score = scores.max()
+    if max_score <= 0:
+        return np.zeros_like(scores)
+    return scores / max_score
+
+
+def top_k_indices(
+    scores: np.ndarray,
+    k: int,
+    mask: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """
+    Return the indices of the k highest scores, sorted descending.
+    Uses a partition so selection is O(n) instead of a full sort.
+    """
+    candidates = np.flatnonzero(mask) if mask is not None else np.arange(scores.size)
+    if k <= 0 or candidates.size == 0:
+        return candidates[:0]
+
+    if candidates.size > k:
+        # O(n) selection of the k-th best score, boundary ties kept in row order
+        values = scores[candidates]
+        kth = np.partition(values, values.size - k)[values.size - k]
+        above = candidates[values > kth]
+        ties = candidates[values == kth][:k - above.size]
+        candidates = np.concatenate([above, ties])
+
+    # Best score first, ties broken by row id like a stable sort
+    order = np.lexsort((candidates, -scores[candidates]))
+    return candidates[order]
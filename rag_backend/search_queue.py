@@ -0,0 +1,120 @@
+"""
+Search Queue Module
+===================
+Request-coalescing search worker for the in-process model stack.
+Queries arriving within a short window are encoded as one batch and
+searched with one multi-query index.search() per k, instead of one
+model call and one nq=1 search each; results go back to the waiting
+callers. Throughput under load scales with the batch, not the request.
+"""
+
+from dataclasses import dataclass
+from typing import List, Callable, Optional, Tuple
+import numpy as np
+import faiss
+
+from embedding_batcher import MicroBatcher
+from faiss_utils import filtered_search
+from query_expansion import fold_expansion
+
+DEFAULT_SEARCH_BATCH = 32
+DEFAULT_SEARCH_WAIT_MS = 2.0
+
+
+@dataclass
+class SearchRequest:
+    """
+    One query: text to encode, or an already known vector. A shift
+    (synonym expansion) is folded into the vector before searching.
+    """
+    query: Optional[str]
+    k: int
+    candidates: Optional[np.ndarray] = None
+    vector: Optional[np.ndarray] = None
+    shift: Optional[np.ndarray] = None
+
+
+class SearchQueue(MicroBatcher):
+    """
+    Single worker (the model and FAISS already use every core): each
+    batch is one encode_fn(queries) call for the requests without a
+    vector, then one search per distinct k for unrestricted requests and
+    a selector search per candidate-restricted request.
+    """
+
+    def __init__(
+        self,
+        encode_fn: Callable[[List[str]], np.ndarray],
+        index_fn: Callable[[], faiss.Index],
+        max_batch: int = DEFAULT_SEARCH_BATCH,
+        max_wait_ms: float = DEFAULT_SEARCH_WAIT_MS
+    ):
+        super().__init__(max_batch, max_wait_ms, max_inflight=1, name="search-queue")
+        self.encode_fn = encode_fn
+        self.index_fn = index_fn
+        self._counters["encoded"] = 0
+        self._counters["index_searches"] = 0
+
+    def search(
+        self,
+        query: Optional[str],
+        k: int,
+        candidates: Optional[np.ndarray] = None,
+        vector: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        (query vector (1, d), scores (1, k), ids (1, k)) for one query,
+        as a single index.search() / filtered_search() would return them.
+        """
+        return self.call(SearchRequest(query, k, candidates, vector))
+
+    def search_many(
+        self,
+        requests: List[SearchRequest]
+    ) -> List[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """
+        search() for several requests, queued together so they share a
+        batch. Shifted requests return the vector actually searched.
+        """
+        futures = [self.submit(request) for request in requests]
+        return [future.result() for future in futures]
+
+    def process_batch(self, requests: List[SearchRequest]) -> List[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        # One encode for every distinct query that still needs a vector
+        pending = [r for r in requests if r.vector is None]
+        texts = list(dict.fromkeys(r.query for r in pending))
+        if texts:
+            encoded = dict(zip(texts, self.encode_fn(texts)))
+            for request in pending:
+                request.vector = encoded[request.query]
+        vectors = [
+            fold_expansion(np.asarray(r.vector, dtype=np.float32), r.shift).reshape(1, -1)
+            for r in requests
+        ]
+
+        index = self.index_fn()
+        results: List[Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]] = [None] * len(requests)
+        searches = 0
+
+        # Unrestricted queries: one multi-query search per k (same results as nq=1)
+        by_k = {}
+        for i, request in enumerate(requests):
+            if request.candidates is None:
+                by_k.setdefault(request.k, []).append(i)
+        for k, rows in by_k.items():
+            scores, ids = index.search(np.concatenate([vectors[i] for i in rows]), k)
+            searches += 1
+            for j, i in enumerate(rows):
+                results[i] = (vectors[i], scores[j:j + 1], ids[j:j + 1])
+
+        # Candidate-restricted queries carry their own selector
+        for i, request in enumerate(requests):
+            if request.candidates is not None:
+                scores, ids = filtered_search(index, vectors[i], request.k, request.candidates)
+                searches += 1
+                results[i] = (vectors[i], scores, ids)
+
+        with self._lock:
+            self._counters["encoded"] += len(texts)
+            self._counters["index_searches"] += searches
+        return results
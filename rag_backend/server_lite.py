@@ -11,20 +11,32 @@ import logging
 import time
 import json
 import os
-import pickle
+import asyncio
+import hmac
 import numpy as np
 from pathlib import Path
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
 
-from fastapi import FastAPI, HTTPException, Query, BackgroundTasks
+from fastapi import FastAPI, HTTPException, Query, BackgroundTasks, Header, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import ORJSONResponse
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 from sse_starlette.sse import EventSourceResponse
 from dotenv import load_dotenv
 import openai
 
+from catalog import normalize_filters
+from faiss_utils import RERANK_FACTOR, filtered_search, rerank_exact, similar_rows
+from index_updates import append_journal, apply_updates, create_search_text
+from index_snapshot import IndexSnapshot, artifact_fingerprint, load_snapshot
+from query_analysis import analyze_query
+from embedding_cache import QueryEmbeddingCache
+from embedding_batcher import EmbeddingBatcher
+from onnx_encoder import QUERY_PREFIX, OnnxQueryEncoder, load_onnx_encoder, query_cache_model
+from result_cache import ResultCache, normalize_request_query
+
 # Load environment variables
 load_dotenv()
 
@@ -43,22 +55,102 @@ CORS_ORIGINS = ["*"]
 # Paths
 BASE_DIR = Path(__file__).parent
 INDEX_DIR = BASE_DIR / "faiss_index"
-EMBEDDINGS_CACHE = BASE_DIR / "embeddings_cache.pkl"
+
+# Index variant: float32 | sq8 | pq (compressed variants from generate_index.py)
+INDEX_VARIANT = os.getenv("INDEX_VARIANT", "float32")
+# Rerank compressed-index candidates with the stored embeddings
+EXACT_RERANK = os.getenv("EXACT_RERANK", "true").lower() == "true"
+
+# Index hot reload: poll INDEX_DIR for new artifacts every N seconds (0 = off)
+INDEX_WATCH_INTERVAL = float(os.getenv("INDEX_WATCH_INTERVAL", "0"))
+# Admin endpoints require this value in the X-Admin-Token header when set
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+# Keyword index weights (per matching query term / full query match)
+KEYWORD_FIELD_WEIGHTS = {
+    "name": 3.0,
+    "location": 2.5,
+    "type": 2.0,
+    "city": 1.5,
+    "features": 1.0,
+    "description": 0.5,
+}
+KEYWORD_PHRASE_WEIGHTS = {"name": 10.0, "location": 8.0}
+CATEGORY_MATCH_BOOST = 5.0
 
 # OpenAI config
 OPENAI_EMBEDDING_MODEL = "text-embedding-3-small"
 EMBEDDING_DIMENSION = 384  # We'll truncate OpenAI embeddings to match
 
+# Model of the document vectors (generate_index.py), for indexes whose
+# index_info.json does not record it
+INDEX_EMBEDDING_MODEL = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+
+# Local query encoder: ONNX export of the index model written by
+# generate_index.py (auto = ONNX when available, else OpenAI; openai = never local)
+QUERY_ENCODER = os.getenv("QUERY_ENCODER", "auto")
+ONNX_MODEL_DIR = Path(os.getenv("ONNX_MODEL_DIR", str(BASE_DIR / "onnx_model")))
+ONNX_QUANTIZED = os.getenv("ONNX_QUANTIZED", "true").lower() == "true"
+ONNX_THREADS = int(os.getenv("ONNX_THREADS", "1"))
+
+# Query embedding cache: in-process LRU (entries, TTL seconds) in front of
+# a SQLite store that survives restarts (QUERY_CACHE_DB="" disables it;
+# same TTL, at most QUERY_CACHE_DB_SIZE rows)
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "2048"))
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "86400"))
+QUERY_CACHE_DB = os.getenv("QUERY_CACHE_DB", str(BASE_DIR / "cache" / "query_embeddings.sqlite3"))
+QUERY_CACHE_DB_SIZE = int(os.getenv("QUERY_CACHE_DB_SIZE", "100000"))
+
+# Concurrent OpenAI query embeddings go out as one list-input call: a batch
+# closes after EMBED_BATCH_WAIT_MS or at EMBED_BATCH_SIZE queries (1 = off)
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "32"))
+EMBED_BATCH_WAIT_MS = float(os.getenv("EMBED_BATCH_WAIT_MS", "5"))
+# Worker threads for searches computed off the event loop (mostly waiting
+# on embeddings, so well above the CPU count)
+WORKER_THREADS = int(os.getenv("WORKER_THREADS", "32"))
+
+# Response cache tagged with the index snapshot version: entries are fresh
+# for RESULT_CACHE_TTL seconds, then served stale for up to
+# RESULT_CACHE_STALE seconds while being recomputed (size 0 = off)
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "1024"))
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", "300"))
+RESULT_CACHE_STALE = float(os.getenv("RESULT_CACHE_STALE", "3600"))
+
 # ============================================================================
 # GLOBAL STATE
 # ============================================================================
 
-faiss_index = None
-properties: List[Dict[str, Any]] = []
-embeddings_cache: Optional[np.ndarray] = None
-property_ids: List[str] = []
+# Active index snapshot: replaced as a whole on reload / update, never mutated.
+# Handlers read it once so in-flight requests finish on the snapshot they started with.
+snapshot: Optional[IndexSnapshot] = None
+index_lock = asyncio.Lock()  # serializes reloads and updates
 openai_client = None
-is_ready = False
+local_encoder: Optional[OnnxQueryEncoder] = None
+
+
+def new_query_cache(model: str, dimension: int) -> QueryEmbeddingCache:
+    """Query embedding cache keyed on the active encoder."""
+    return QueryEmbeddingCache(
+        model,
+        dimension,
+        max_entries=QUERY_CACHE_SIZE,
+        ttl_seconds=QUERY_CACHE_TTL,
+        db_path=QUERY_CACHE_DB or None,
+        max_disk_entries=QUERY_CACHE_DB_SIZE
+    )
+
+
+query_cache = new_query_cache(OPENAI_EMBEDDING_MODEL, EMBEDDING_DIMENSION)
+embedding_batcher = EmbeddingBatcher(
+    lambda texts: get_embeddings_openai(texts),
+    max_batch=EMBED_BATCH_SIZE,
+    max_wait_ms=EMBED_BATCH_WAIT_MS
+)
+result_cache = ResultCache(
+    max_entries=RESULT_CACHE_SIZE,
+    ttl_seconds=RESULT_CACHE_TTL,
+    stale_seconds=RESULT_CACHE_STALE
+)
 
 # Conversation memory for session tracking
 conversations: Dict[str, List[Dict[str, str]]] = {}
@@ -73,6 +165,12 @@ class SearchRequest(BaseModel):
     mode: str = Field(default="semantic")
     filters: Optional[Dict[str, Any]] = None
 
+    @field_validator("filters")
+    @classmethod
+    def check_filters(cls, filters: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        # Numeric filters as numbers; invalid values are a 422, not a 500
+        return normalize_filters(filters) if filters else filters
+
 
 class QuickSearchResponse(BaseModel):
     success: bool
@@ -81,6 +179,11 @@ class QuickSearchResponse(BaseModel):
     processing_time_ms: float
 
 
+class IndexUpsertRequest(BaseModel):
+    properties: List[Dict[str, Any]] = Field(default_factory=list)
+    delete_ids: List[str] = Field(default_factory=list)
+
+
 class HealthResponse(BaseModel):
     status: str
     version: str
@@ -88,6 +191,7 @@ class HealthResponse(BaseModel):
     total_properties: int
     embedding_model: str
     chatbot_ready: bool
+    index_version: Optional[str] = None
 
 
 class PropertiesResponse(BaseModel):
@@ -106,8 +210,19 @@ class FiltersResponse(BaseModel):
 # EMBEDDING FUNCTIONS
 # ============================================================================
 
-def get_query_embedding_openai(query: str) -> np.ndarray:
-    """Get embedding for query using OpenAI API."""
+def get_query_embedding(query: str) -> np.ndarray:
+    """
+    Get embedding for query with the local ONNX encoder (prefixed like the
+    index build's queries), or the OpenAI API when it is not available
+    (repeat queries come from the cache).
+    """
+    if local_encoder is not None:
+        return query_cache.get_or_compute(query, lambda q: local_encoder.encode_query(f"{QUERY_PREFIX}{q}"))
+    return query_cache.get_or_compute(query, embedding_batcher.embed)
+
+
+def get_embeddings_openai(texts: List[str]) -> np.ndarray:
+    """Embed texts (batched queries or listings) in one OpenAI call."""
     global openai_client
 
     if not openai_client:
@@ -115,18 +230,35 @@ def get_query_embedding_openai(query: str) -> np.ndarray:
 
     response = openai_client.embeddings.create(
         model=OPENAI_EMBEDDING_MODEL,
-        input=query,
-        dimensions=EMBEDDING_DIMENSION  # OpenAI supports dimension reduction
+        input=texts,
+        dimensions=EMBEDDING_DIMENSION
     )
 
-    embedding = np.array(response.data[0].embedding, dtype=np.float32)
+    embeddings = np.array([d.embedding for d in response.data], dtype=np.float32)
 
     # Normalize for cosine similarity
-    norm = np.linalg.norm(embedding)
-    if norm > 0:
-        embedding = embedding / norm
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return embeddings / np.maximum(norms, 1e-12)
 
-    return embedding
+
+def document_encoder(snap: IndexSnapshot) -> Optional[OnnxQueryEncoder]:
+    """
+    The local encoder if it runs the model the snapshot's document vectors
+    were built with, else None: vectors of another model (e.g. OpenAI)
+    are not comparable with the rest of the index.
+    """
+    index_model = snap.embedding_model or INDEX_EMBEDDING_MODEL
+    if local_encoder is not None and local_encoder.model_name == index_model:
+        return local_encoder
+    return None
+
+
+def get_document_embeddings(texts: List[str]) -> np.ndarray:
+    """Embed listing texts in the index vector space (never mixes models)."""
+    encoder = document_encoder(snapshot)
+    if encoder is None:
+        raise RuntimeError("No encoder for the index embedding model")
+    return encoder.encode(texts)
 
 
 def get_query_embedding_fallback(query: str) -> np.ndarray:
@@ -158,34 +290,64 @@ def get_query_embedding_fallback(query: str) -> np.ndarray:
 # SEARCH FUNCTIONS
 # ============================================================================
 
-def semantic_search(query: str, top_k: int = 12) -> List[Dict[str, Any]]:
-    """Perform semantic search using FAISS."""
-    global faiss_index, properties, openai_client
+def semantic_search(
+    query: str,
+    top_k: int = 12,
+    filters: Optional[Dict[str, Any]] = None,
+    autocomplete: bool = False
+) -> List[Dict[str, Any]]:
+    """
+    Perform semantic search using FAISS, restricted to the filtered properties.
+    Autocomplete queries are encoded with the static word encoder (the last
+    word may be unfinished) when the index ships one.
+    """
+    global openai_client
 
-    if faiss_index is None or not properties:
+    snap = snapshot
+    if snap is None or not snap.properties:
         return []
 
     try:
-        # Get query embedding
-        if openai_client:
-            query_embedding = get_query_embedding_openai(query)
-        else:
-            logger.warning("OpenAI not available, using fallback embedding")
-            query_embedding = get_query_embedding_fallback(query)
+        # Explicit filters become the FAISS candidate set
+        candidates = None
+        if filters:
+            candidates = np.flatnonzero(snap.catalog.mask_from_filters(filters))
+            if candidates.size == 0:
+                return []
+
+        # Get query embedding (static word vectors: no model / API call)
+        query_embedding = None
+        no_encoder = local_encoder is None and not openai_client
+        if snap.static_encoder is not None and (autocomplete or no_encoder):
+            query_embedding = snap.static_encoder.encode(query, prefix=autocomplete)
+        if query_embedding is None:
+            if not no_encoder:
+                query_embedding = get_query_embedding(query)
+            else:
+                logger.warning("No query encoder available, using fallback embedding")
+                query_embedding = get_query_embedding_fallback(query)
 
         # Reshape for FAISS
         query_embedding = query_embedding.reshape(1, -1)
 
-        # Search FAISS index
-        scores, indices = faiss_index.search(query_embedding, min(top_k * 2, len(properties)))
+        # Search FAISS index (only the candidates, only top_k)
+        k = min(top_k, len(snap.properties))
+        rerank = EXACT_RERANK and INDEX_VARIANT != "float32" and snap.embeddings is not None
+        fetch_k = min(k * RERANK_FACTOR, len(snap.properties)) if rerank else k
+        scores, indices = filtered_search(snap.index, query_embedding, fetch_k, candidates)
+        scores, indices = scores[0], indices[0]
+
+        # Compressed index: rescore the candidates with the stored vectors
+        if rerank:
+            scores, indices = rerank_exact(query_embedding, indices, snap.embeddings, k)
 
         # Build results
         results = []
-        for score, idx in zip(scores[0], indices[0]):
-            if idx < 0 or idx >= len(properties):
+        for score, idx in zip(scores, indices):
+            if idx < 0 or idx >= len(snap.properties):
                 continue
 
-            prop = properties[idx]
+            prop = snap.properties[idx]
             result = {
                 "id": prop.get("id"),
                 "name": prop.get("name"),
@@ -214,64 +376,30 @@ def semantic_search(query: str, top_k: int = 12) -> List[Dict[str, Any]]:
     except Exception as e:
         logger.error(f"Semantic search error: {e}")
         # Fallback to keyword search
-        return keyword_search(query, top_k)
+        return keyword_search(query, top_k, filters)
 
 
-def keyword_search(query: str, limit: int = 12) -> List[Dict[str, Any]]:
+def keyword_search(
+    query: str,
+    limit: int = 12,
+    filters: Optional[Dict[str, Any]] = None
+) -> List[Dict[str, Any]]:
     """Fallback keyword-based search."""
-    if not properties:
+    snap = snapshot
+    if snap is None or not snap.properties:
         return []
 
-    query_lower = query.lower()
-    query_terms = query_lower.split()
-
-    scored_results = []
-
-    for prop in properties:
-        score = 0.0
-
-        name = prop.get("name", "").lower()
-        location = prop.get("location", "").lower()
-        prop_type = prop.get("type", "").lower()
-        city = prop.get("city", "").lower()
-        description = prop.get("description", "").lower()
-        features = " ".join(prop.get("features", [])).lower()
-
-        # Full query match
-        if query_lower in name:
-            score += 10
-        if query_lower in location:
-            score += 8
+    # Category detection
+    boosts = []
+    category = analyze_query(query).category_boost
+    if category:
+        boosts.append((snap.keyword_index.docs_with_value("category", category), CATEGORY_MATCH_BOOST))
 
-        # Term matches
-        for term in query_terms:
-            if len(term) < 2:
-                continue
-            if term in name:
-                score += 3
-            if term in location:
-                score += 2.5
-            if term in prop_type:
-                score += 2
-            if term in city:
-                score += 1.5
-            if term in features:
-                score += 1
-            if term in description:
-                score += 0.5
-
-        # Category detection
-        if any(w in query_lower for w in ["louer", "location", "à louer"]):
-            if prop.get("category") == "RENT":
-                score += 5
-        elif any(w in query_lower for w in ["acheter", "vente", "à vendre"]):
-            if prop.get("category") == "SALE":
-                score += 5
-
-        if score > 0:
-            scored_results.append((prop, score))
-
-    scored_results.sort(key=lambda x: x[1], reverse=True)
+    mask = snap.catalog.mask_from_filters(filters) if filters else None
+    scored_results = [
+        (snap.properties[idx], score)
+        for idx, score in snap.keyword_index.search(query, limit, boosts=boosts, mask=mask)
+    ]
 
     return [
         {
@@ -301,25 +429,7 @@ def keyword_search(query: str, limit: int = 12) -> List[Dict[str, Any]]:
 
 def detect_intent(query: str) -> Dict[str, Any]:
     """Detect search intent from query."""
-    query_lower = query.lower()
-
-    intent = "general"
-    confidence = 0.5
-
-    if any(w in query_lower for w in ["louer", "location"]):
-        intent = "rent"
-        confidence = 0.9
-    elif any(w in query_lower for w in ["acheter", "vente"]):
-        intent = "buy"
-        confidence = 0.9
-    elif any(w in query_lower for w in ["villa", "appartement", "bureau", "maison"]):
-        intent = "search_type"
-        confidence = 0.8
-    elif any(w in query_lower for w in ["anfa", "maarif", "californie", "bouskoura"]):
-        intent = "search_location"
-        confidence = 0.85
-
-    return {"intent": intent, "confidence": confidence}
+    return analyze_query(query).search_intent
 
 
 def analyze_conversation_urgency(conversation_history: List[Dict[str, str]]) -> Dict[str, Any]:
@@ -374,62 +484,100 @@ Respond ONLY with valid JSON:
 # ============================================================================
 
 def load_index():
-    """Load pre-computed FAISS index and metadata."""
-    global faiss_index, properties, embeddings_cache, property_ids, openai_client, is_ready
+    """Initialize the OpenAI client and query encoder, then load the first index snapshot."""
+    global snapshot, openai_client, local_encoder, query_cache
+
+    # Initialize OpenAI client
+    openai_key = os.getenv("OPENAI_API_KEY")
+    if openai_key:
+        openai_client = openai.OpenAI(api_key=openai_key)
+        logger.info("OpenAI client initialized")
+    else:
+        logger.warning("OPENAI_API_KEY not set - chatbot disabled")
+
+    # Local query encoder: same vector space as the index, no network call
+    if QUERY_ENCODER in ("auto", "onnx"):
+        local_encoder = load_onnx_encoder(ONNX_MODEL_DIR, quantized=ONNX_QUANTIZED, num_threads=ONNX_THREADS)
+        if local_encoder is not None:
+            query_cache.close()
+            query_cache = new_query_cache(query_cache_model(local_encoder.model_id), local_encoder.dimension)
+        elif QUERY_ENCODER == "onnx":
+            logger.error(f"QUERY_ENCODER=onnx but no usable encoder in {ONNX_MODEL_DIR}")
+    if local_encoder is None and not openai_client:
+        logger.warning("No query encoder - semantic search will use fallback")
 
     try:
-        # Initialize OpenAI client
-        openai_key = os.getenv("OPENAI_API_KEY")
-        if openai_key:
-            openai_client = openai.OpenAI(api_key=openai_key)
-            logger.info("OpenAI client initialized")
-        else:
-            logger.warning("OPENAI_API_KEY not set - semantic search will use fallback")
-
-        # Load FAISS index
-        index_path = INDEX_DIR / "index.faiss"
-        if index_path.exists():
-            import faiss
-            faiss_index = faiss.read_index(str(index_path))
-            logger.info(f"Loaded FAISS index with {faiss_index.ntotal} vectors")
-        else:
-            logger.error(f"FAISS index not found at {index_path}")
-            is_ready = False
-            return
-
-        # Load metadata
-        metadata_path = INDEX_DIR / "metadata.json"
-        if metadata_path.exists():
-            with open(metadata_path, "r", encoding="utf-8") as f:
-                properties = json.load(f)
-            logger.info(f"Loaded {len(properties)} properties from metadata")
-        else:
-            logger.error(f"Metadata not found at {metadata_path}")
-            is_ready = False
-            return
+        snapshot = load_snapshot(INDEX_DIR, INDEX_VARIANT, KEYWORD_FIELD_WEIGHTS, KEYWORD_PHRASE_WEIGHTS)
+        logger.info(f"Server ready! (index version {snapshot.version})")
+    except Exception as e:
+        logger.error(f"Failed to load index: {e}")
 
-        # Load embeddings cache (optional, for similar property search)
-        if EMBEDDINGS_CACHE.exists():
-            with open(EMBEDDINGS_CACHE, "rb") as f:
-                cache_data = pickle.load(f)
-                embeddings_cache = cache_data.get("embeddings")
-                property_ids = cache_data.get("property_ids", [])
-            logger.info("Loaded embeddings cache")
 
-        is_ready = True
-        logger.info("Server ready!")
+async def reload_index() -> Tuple[Optional[str], str]:
+    """
+    Load a new snapshot in a worker thread, then swap it in atomically.
+    Requests already running keep the previous snapshot; on failure the
+    previous snapshot stays active. Returns (previous, new) versions.
+    """
+    global snapshot
 
-    except Exception as e:
-        logger.error(f"Failed to load index: {e}")
-        is_ready = False
+    async with index_lock:
+        new_snapshot = await asyncio.to_thread(
+            load_snapshot, INDEX_DIR, INDEX_VARIANT, KEYWORD_FIELD_WEIGHTS, KEYWORD_PHRASE_WEIGHTS
+        )
+        previous = snapshot
+        snapshot = new_snapshot
+
+    previous_version = previous.version if previous else None
+    logger.info(f"Index snapshot swapped: {previous_version} -> {new_snapshot.version}")
+    return previous_version, new_snapshot.version
+
+
+async def watch_index_dir():
+    """Reload when a new artifact generation lands in INDEX_DIR (index_info.json marker, once settled)."""
+    pending = None
+    while True:
+        await asyncio.sleep(INDEX_WATCH_INTERVAL)
+        current = await asyncio.to_thread(artifact_fingerprint, INDEX_DIR)
+        if snapshot is not None and current == snapshot.fingerprint:
+            pending = None
+            continue
+        if current != pending:
+            # Changed since the last poll: wait one more interval
+            pending = current
+            continue
+        try:
+            await reload_index()
+        except Exception as e:
+            logger.error(f"Index reload failed, keeping current snapshot: {e}")
+        pending = None
+
+
+def check_admin_token(token: Optional[str]) -> None:
+    """
+    Admin endpoints require X-Admin-Token == ADMIN_TOKEN; without a
+    configured ADMIN_TOKEN they are disabled (fail closed).
+    """
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled (ADMIN_TOKEN not set)")
+    if not hmac.compare_digest(token or "", ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifecycle."""
     logger.info("Starting RAG Production Server...")
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=WORKER_THREADS, thread_name_prefix="search")
+    )
     load_index()
+    watcher = asyncio.create_task(watch_index_dir()) if INDEX_WATCH_INTERVAL > 0 else None
     yield
+    if watcher:
+        watcher.cancel()
+    embedding_batcher.close()
+    query_cache.close()
     logger.info("Shutting down...")
 
 
@@ -464,24 +612,39 @@ async def health_check():
     return HealthResponse(
         status="healthy",
         version="2.1.0-memory",
-        index_loaded=is_ready,
-        total_properties=len(properties),
-        embedding_model="openai/text-embedding-3-small",
+        index_loaded=snapshot is not None,
+        index_version=snapshot.version if snapshot else None,
+        total_properties=len(snapshot.properties) if snapshot else 0,
+        embedding_model=local_encoder.model_id if local_encoder else f"openai/{OPENAI_EMBEDDING_MODEL}",
         chatbot_ready=openai_client is not None
     )
 
 
 @app.post("/api/search", tags=["Search"])
-async def search(request: SearchRequest):
+async def search(request: SearchRequest, response: Response):
     """Semantic search endpoint."""
-    if not is_ready:
+    snap = snapshot
+    if snap is None:
         raise HTTPException(status_code=503, detail="Service not ready")
 
     start_time = time.time()
 
-    # Use semantic search
-    results = semantic_search(request.query, request.top_k)
-    intent_info = detect_intent(request.query)
+    def compute():
+        # Use semantic search (explicit filters are pushed down into FAISS)
+        return (
+            semantic_search(request.query, request.top_k, request.filters),
+            detect_intent(request.query)
+        )
+
+    key = result_cache.make_key(
+        "search",
+        query=normalize_request_query(request.query),
+        mode=request.mode,
+        top_k=request.top_k,
+        filters=request.filters
+    )
+    (results, intent_info), cache_status = await result_cache.get_or_compute(key, snap.version, compute)
+    response.headers["X-Cache"] = cache_status.upper()
 
     processing_time = (time.time() - start_time) * 1000
 
@@ -502,15 +665,21 @@ async def search(request: SearchRequest):
 @app.get("/api/quick-search", response_model=QuickSearchResponse, tags=["Search"])
 async def quick_search(
     q: str = Query(..., min_length=2, max_length=200),
-    limit: int = Query(default=8, ge=1, le=20)
+    limit: int = Query(default=8, ge=1, le=20),
+    response: Response = None
 ):
     """Quick search for autocomplete."""
-    if not is_ready:
+    snap = snapshot
+    if snap is None:
         raise HTTPException(status_code=503, detail="Service not ready")
 
     start_time = time.time()
 
-    results = semantic_search(q, limit)
+    key = result_cache.make_key("quick-search", query=normalize_request_query(q), limit=limit)
+    results, cache_status = await result_cache.get_or_compute(
+        key, snap.version, lambda: semantic_search(q, limit, autocomplete=True)
+    )
+    response.headers["X-Cache"] = cache_status.upper()
 
     processing_time = (time.time() - start_time) * 1000
 
@@ -525,35 +694,156 @@ async def quick_search(
 @app.get("/api/property/{property_id}", tags=["Properties"])
 async def get_property(property_id: str):
     """Get property by ID."""
-    if not is_ready:
+    snap = snapshot
+    if snap is None:
         raise HTTPException(status_code=503, detail="Service not ready")
 
-    for prop in properties:
-        if prop.get("id") == property_id:
-            return {"success": True, "data": prop}
+    idx = snap.id_to_idx.get(property_id)
+    if idx is not None:
+        return {"success": True, "data": snap.properties[idx]}
 
     raise HTTPException(status_code=404, detail="Property not found")
 
 
+@app.get("/api/property/{property_id}/similar", tags=["Properties"])
+async def get_similar_properties(
+    property_id: str,
+    limit: int = Query(default=6, ge=1, le=50)
+):
+    """Similar properties, from the precomputed table or the stored vectors."""
+    snap = snapshot
+    if snap is None:
+        raise HTTPException(status_code=503, detail="Service not ready")
+
+    idx = snap.id_to_idx.get(property_id)
+    if idx is None:
+        raise HTTPException(status_code=404, detail="Property not found")
+
+    indices, scores = similar_rows(snap.index, idx, limit, snap.embeddings, snap.neighbors)
+
+    return {
+        "success": True,
+        "property_id": property_id,
+        "results": [
+            {**snap.properties[i], "_similarity_score": float(score)}
+            for score, i in zip(scores, indices)
+        ]
+    }
+
+
+@app.post("/api/index/upsert", tags=["Index"])
+async def upsert_index(
+    request: IndexUpsertRequest,
+    x_admin_token: Optional[str] = Header(default=None)
+):
+    """
+    Batch upsert / delete listings by id without a full rebuild.
+    Only new listings and listings whose text changed are embedded.
+    The batch is journaled in faiss_index/ before it is swapped in, so
+    it survives reloads and restarts until the next generate_index.py run.
+    """
+    global snapshot
+
+    check_admin_token(x_admin_token)
+    if snapshot is None:
+        raise HTTPException(status_code=503, detail="Service not ready")
+    if request.properties and document_encoder(snapshot) is None:
+        index_model = snapshot.embedding_model or INDEX_EMBEDDING_MODEL
+        raise HTTPException(
+            status_code=503,
+            detail=f"Embedding listings requires the local encoder of the index model ({index_model})"
+        )
+
+    start_time = time.time()
+
+    async with index_lock:
+        snap = snapshot
+        try:
+            # Embedding + index edits run off the event loop; searches keep
+            # using the current snapshot meanwhile
+            result = await asyncio.to_thread(
+                apply_updates,
+                snap.properties,
+                snap.embeddings,
+                snap.index,
+                request.properties,
+                request.delete_ids,
+                text_fn=create_search_text,
+                embed_fn=get_document_embeddings,
+                hashes=snap.content_hashes
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        try:
+            await asyncio.to_thread(
+                append_journal,
+                INDEX_DIR,
+                snap.version.split("+")[0],
+                request.properties,
+                request.delete_ids,
+                result["embedded"]
+            )
+        except OSError as e:
+            logger.error(f"Index update not journaled: {e}")
+            raise HTTPException(status_code=500, detail="Index update could not be persisted")
+
+        # Swap in the new snapshot
+        snapshot = snap.with_updates(result, snap.updates + 1)
+
+    return {
+        "success": True,
+        **result["stats"],
+        "total_properties": len(snapshot.properties),
+        "version": snapshot.version,
+        "processing_time_ms": round((time.time() - start_time) * 1000, 2)
+    }
+
+
+@app.post("/api/admin/reload", tags=["Index"])
+async def reload_index_endpoint(x_admin_token: Optional[str] = Header(default=None)):
+    """Load the artifacts in faiss_index/ into a new snapshot and swap it in."""
+    check_admin_token(x_admin_token)
+
+    start_time = time.time()
+    try:
+        previous_version, version = await reload_index()
+    except Exception as e:
+        logger.error(f"Index reload failed: {e}")
+        raise HTTPException(status_code=500, detail=f"Reload failed: {e}")
+
+    return {
+        "success": True,
+        "previous_version": previous_version,
+        "version": version,
+        "total_properties": len(snapshot.properties),
+        "processing_time_ms": round((time.time() - start_time) * 1000, 2)
+    }
+
+
 @app.get("/api/stats", tags=["Properties"])
 async def get_stats():
     """Get statistics."""
-    if not is_ready:
+    snap = snapshot
+    if snap is None:
         raise HTTPException(status_code=503, detail="Service not ready")
 
-    sale_count = sum(1 for p in properties if p.get("category") == "SALE")
-    rent_count = sum(1 for p in properties if p.get("category") == "RENT")
+    sale_count = sum(1 for p in snap.properties.iter_hot() if p.get("category") == "SALE")
+    rent_count = sum(1 for p in snap.properties.iter_hot() if p.get("category") == "RENT")
 
     type_counts = {}
-    for p in properties:
+    for p in snap.properties.iter_hot():
         t = p.get("type", "Autre")
         type_counts[t] = type_counts.get(t, 0) + 1
 
     return {
         "success": True,
-        "total_properties": len(properties),
+        "total_properties": len(snap.properties),
         "by_category": {"SALE": sale_count, "RENT": rent_count},
-        "by_type": sorted(type_counts.items(), key=lambda x: x[1], reverse=True)
+        "by_type": sorted(type_counts.items(), key=lambda x: x[1], reverse=True),
+        "query_embedding_cache": query_cache.stats(),
+        "embedding_batcher": embedding_batcher.stats(),
+        "result_cache": result_cache.stats()
     }
 
 
@@ -570,64 +860,89 @@ async def get_properties(
     search: Optional[str] = Query(None, description="Text search"),
     sort: Optional[str] = Query("date_desc", description="Sort order"),
     page: int = Query(1, ge=1),
-    limit: int = Query(12, ge=1, le=100)
+    limit: int = Query(12, ge=1, le=100),
+    response: Response = None
 ):
     """Get properties with filtering and pagination."""
-    if not is_ready:
+    snap = snapshot
+    if snap is None:
         raise HTTPException(status_code=503, detail="Service not ready")
 
-    results = list(properties)
-
-    # Filter by category
-    if category:
-        results = [p for p in results if p.get("category") == category]
-
-    # Filter by type
-    if type:
-        results = [p for p in results if p.get("type") == type]
-
-    # Filter by location
-    if location:
-        location_lower = location.lower()
-        results = [p for p in results if location_lower in p.get("location", "").lower()]
-
-    # Filter by price range
-    if min_price is not None:
-        results = [p for p in results if (p.get("priceNumeric") or 0) >= min_price]
-    if max_price is not None:
-        results = [p for p in results if (p.get("priceNumeric") or 0) <= max_price]
-
-    # Filter by area range
-    if min_area is not None:
-        results = [p for p in results if (p.get("areaNumeric") or 0) >= min_area]
-    if max_area is not None:
-        results = [p for p in results if (p.get("areaNumeric") or 0) <= max_area]
-
-    # Filter by bedrooms
-    if beds is not None:
-        results = [p for p in results if (p.get("beds") or 0) >= beds]
+    key = result_cache.make_key(
+        "properties",
+        category=category,
+        type=type,
+        location=location,
+        min_price=min_price,
+        max_price=max_price,
+        min_area=min_area,
+        max_area=max_area,
+        beds=beds,
+        search=search.lower() if search else search,
+        sort=sort,
+        page=page,
+        limit=limit
+    )
+    result, cache_status = await result_cache.get_or_compute(
+        key, snap.version, lambda: list_properties(
+            snap, category, type, location, min_price, max_price,
+            min_area, max_area, beds, search, sort, page, limit
+        )
+    )
+    response.headers["X-Cache"] = cache_status.upper()
+    return result
+
+
+def list_properties(
+    snap: IndexSnapshot,
+    category: Optional[str],
+    type: Optional[str],
+    location: Optional[str],
+    min_price: Optional[float],
+    max_price: Optional[float],
+    min_area: Optional[float],
+    max_area: Optional[float],
+    beds: Optional[int],
+    search: Optional[str],
+    sort: Optional[str],
+    page: int,
+    limit: int
+) -> Dict[str, Any]:
+    """Filtered, sorted page of the catalog."""
+    # Structured filters as one vectorized mask over the catalog columns
+    mask = snap.catalog.mask(
+        category=category,
+        type=type,
+        location=location,
+        min_price=min_price,
+        max_price=max_price,
+        min_area=min_area,
+        max_area=max_area,
+        min_beds=beds
+    )
+    indices = np.flatnonzero(mask)
 
     # Text search
     if search and len(search) >= 2:
         search_lower = search.lower()
-        results = [p for p in results if (
-            search_lower in p.get("name", "").lower() or
-            search_lower in p.get("location", "").lower() or
-            search_lower in p.get("type", "").lower()
-        )]
+        indices = np.array([i for i in indices if (
+            search_lower in snap.properties.hot(i).get("name", "").lower() or
+            search_lower in snap.properties.hot(i).get("location", "").lower() or
+            search_lower in snap.properties.hot(i).get("type", "").lower()
+        )], dtype=np.int64)
 
     # Sort
     if sort == "price_asc":
-        results.sort(key=lambda p: p.get("priceNumeric") or 0)
+        indices = snap.catalog.sort_indices(indices, "price")
     elif sort == "price_desc":
-        results.sort(key=lambda p: p.get("priceNumeric") or 0, reverse=True)
+        indices = snap.catalog.sort_indices(indices, "price", descending=True)
     elif sort == "area_desc":
-        results.sort(key=lambda p: p.get("areaNumeric") or 0, reverse=True)
+        indices = snap.catalog.sort_indices(indices, "area", descending=True)
 
     # Paginate
-    total = len(results)
+    total = len(indices)
     start_idx = (page - 1) * limit
-    paginated = results[start_idx:start_idx + limit]
+    paginated = [snap.properties[i] for i in indices[start_idx:start_idx + limit]]
 
     return {
         "success": True,
@@ -651,7 +966,8 @@ async def get_properties(
 @app.get("/api/filters", response_model=FiltersResponse, tags=["Properties"])
 async def get_filters():
     """Get available filter options."""
-    if not is_ready:
+    snap = snapshot
+    if snap is None:
         raise HTTPException(status_code=503, detail="Service not ready")
 
     types_set = set()
@@ -659,7 +975,7 @@ async def get_filters():
     features_set = set()
     beds_set = set()
 
-    for p in properties:
+    for p in snap.properties.iter_hot():
         if p.get("type"):
             types_set.add(p["type"])
         loc = p.get("location", "")
@@ -739,7 +1055,7 @@ async def chat(message: str = "", conversation_id: str = "default", stream: bool
         is_property_search = any(kw in message.lower() for kw in search_keywords)
 
         # Search for relevant properties
-        relevant = semantic_search(message, 5) if is_property_search else []
+        relevant = await asyncio.to_thread(semantic_search, message, 5) if is_property_search else []
 
         # Format properties for display (clean structure for frontend)
         suggested_properties = []
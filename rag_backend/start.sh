@@ -41,10 +41,10 @@ echo -e "${GREEN}Installing dependencies...${NC}"
 pip install -q --upgrade pip
 pip install -q -r requirements.txt
 
-# Check if index needs to be built
-if [ ! -f "embeddings_cache.pkl" ]; then
+# Check if the pre-computed index needs to be built (index_info.json is written last)
+if [ ! -f "faiss_index/index_info.json" ]; then
     echo -e "${YELLOW}Building FAISS index (first time setup)...${NC}"
-    python main.py --build
+    python generate_index.py
 fi
 
 # Start server
@@ -0,0 +1,149 @@
+"""
+Static Encoder Module
+=====================
+Model2Vec-style static query encoder distilled from the index model.
+generate_index.py runs every catalog / query-vocabulary word through the
+sentence-transformer once and ships the vectors next to the FAISS index,
+with SIF weights from catalog word frequencies. A query is the weighted
+mean of its word vectors: dictionary lookups and one small matrix
+product, in the same space as the document vectors.
+"""
+
+import re
+import bisect
+import logging
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import List, Dict, Iterable, Optional
+import numpy as np
+
+from embedding_cache import normalize_query
+
+logger = logging.getLogger(__name__)
+
+STATIC_ENCODER_FILE = "static_encoder.npz"
+
+# SIF weight a / (a + p(word)): frequent words count less
+SIF_SMOOTHING = 1e-3
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Words of the text, casefolded and without accents."""
+    return TOKEN_PATTERN.findall(normalize_query(text))
+
+
+class StaticQueryEncoder:
+    """
+    Word -> vector table (vocabulary sorted for prefix lookups).
+    Unknown words are skipped; encode() returns None when no word is known.
+    """
+
+    def __init__(self, vocab: List[str], vectors: np.ndarray, weights: np.ndarray):
+        self.vocab = list(vocab)
+        self.vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        self.weights = np.asarray(weights, dtype=np.float32)
+        self.lookup: Dict[str, int] = {word: i for i, word in enumerate(self.vocab)}
+
+    @property
+    def dimension(self) -> int:
+        return self.vectors.shape[1]
+
+    def complete(self, prefix: str) -> Optional[int]:
+        """Row of the most frequent vocabulary word starting with prefix."""
+        lo = bisect.bisect_left(self.vocab, prefix)
+        hi = bisect.bisect_left(self.vocab, prefix + "\uffff", lo)
+        if lo == hi:
+            return None
+        # Lowest SIF weight == most frequent word
+        return lo + int(np.argmin(self.weights[lo:hi]))
+
+    def encode(self, query: str, prefix: bool = False) -> Optional[np.ndarray]:
+        """
+        Normalized query embedding, or None without any known word.
+        With prefix=True an unfinished last word is completed from the
+        vocabulary (autocomplete).
+        """
+        tokens = tokenize(query)
+        rows = [self.lookup.get(token) for token in tokens]
+        if prefix and rows and rows[-1] is None:
+            rows[-1] = self.complete(tokens[-1])
+
+        rows = [row for row in rows if row is not None]
+        if not rows:
+            return None
+
+        embedding = self.weights[rows] @ self.vectors[rows]
+        norm = np.linalg.norm(embedding)
+        if norm == 0:
+            return None
+        return (embedding / norm).astype(np.float32)
+
+    def save(self, path: Path) -> None:
+        np.savez(
+            path,
+            vocab=np.array(self.vocab),
+            vectors=self.vectors.astype(np.float16),
+            weights=self.weights
+        )
+
+    @classmethod
+    def load(cls, path: Path) -> "StaticQueryEncoder":
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data["vocab"].tolist(), data["vectors"], data["weights"])
+
+
+# ============================================================================
+# DISTILLATION (local, needs sentence-transformers)
+# ============================================================================
+
+def distill_static_encoder(
+    model,
+    texts: Iterable[str],
+    extra_words: Iterable[str] = (),
+    batch_size: int = 256
+) -> StaticQueryEncoder:
+    """
+    Embed each distinct word of the texts (plus extra_words, e.g. the
+    query vocabulary) with the model. Words are keyed normalized and
+    embedded in their most frequent written form (accents kept).
+    """
+    counts: Counter = Counter()
+    forms: Dict[str, Counter] = defaultdict(Counter)
+    for text in texts:
+        for word in TOKEN_PATTERN.findall(text.casefold()):
+            key = normalize_query(word)
+            counts[key] += 1
+            forms[key][word] += 1
+    for phrase in extra_words:
+        for word in TOKEN_PATTERN.findall(phrase.casefold()):
+            forms[normalize_query(word)][word] += 0
+
+    vocab = sorted(forms)
+    surface = [forms[key].most_common(1)[0][0] for key in vocab]
+    vectors = model.encode(
+        surface,
+        normalize_embeddings=True,
+        batch_size=batch_size,
+        show_progress_bar=False
+    )
+
+    total = max(sum(counts.values()), 1)
+    frequencies = np.array([counts[key] / total for key in vocab], dtype=np.float64)
+    weights = SIF_SMOOTHING / (SIF_SMOOTHING + frequencies)
+
+    return StaticQueryEncoder(vocab, vectors, weights)
+
+
+def load_static_encoder(path: Path) -> Optional[StaticQueryEncoder]:
+    """The shipped static encoder, or None when absent / unreadable."""
+    if not path.exists():
+        return None
+    try:
+        encoder = StaticQueryEncoder.load(path)
+        logger.info(f"Loaded static query encoder ({len(encoder.vocab)} words)")
+        return encoder
+    except Exception as e:
+        logger.warning(f"Failed to load static query encoder: {e}")
+        return None
@@ -0,0 +1,16 @@
+"""
+Test configuration: the backend modules import each other by flat name
+(as when run from rag_backend/), so rag_backend/ goes on sys.path.
+"""
+
+import os
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+# No persistent caches or OpenAI client in tests
+os.environ.setdefault("QUERY_CACHE_DB", "")
+os.environ.setdefault("DOCUMENT_CACHE_DB", "")
+os.environ.pop("OPENAI_API_KEY", None)
@@ -0,0 +1,87 @@
+"""Admin index endpoints: fail-closed auth, index embedding model."""
+
+import importlib
+import types
+
+import pytest
+from fastapi.testclient import TestClient
+
+SERVERS = ["server", "server_lite", "server_production"]
+
+UPSERT = ("/api/index/upsert", {"properties": [], "delete_ids": ["p1"]})
+RELOAD = ("/api/admin/reload", None)
+
+
+def post(module, monkeypatch, admin_token, endpoint, body, header=None):
+    server = importlib.import_module(module)
+    monkeypatch.setattr(server, "ADMIN_TOKEN", admin_token)
+    headers = {"X-Admin-Token": header} if header is not None else {}
+    return TestClient(server.app).post(endpoint, json=body, headers=headers)
+
+
+@pytest.mark.parametrize("module", SERVERS)
+@pytest.mark.parametrize("header", [None, "", "anything"])
+def test_upsert_disabled_without_admin_token(module, monkeypatch, header):
+    response = post(module, monkeypatch, None, *UPSERT, header=header)
+    assert response.status_code == 403
+
+
+@pytest.mark.parametrize("module", SERVERS)
+@pytest.mark.parametrize("header", [None, "wrong"])
+def test_upsert_rejects_wrong_admin_token(module, monkeypatch, header):
+    response = post(module, monkeypatch, "secret", *UPSERT, header=header)
+    assert response.status_code == 401
+
+
+@pytest.mark.parametrize("module", SERVERS)
+def test_upsert_accepts_admin_token(module, monkeypatch):
+    # Past the token check: no snapshot loaded in tests
+    response = post(module, monkeypatch, "secret", *UPSERT, header="secret")
+    assert response.status_code == 503
+
+
+@pytest.mark.parametrize("module", SERVERS)
+@pytest.mark.parametrize("header", [None, "anything"])
+def test_reload_disabled_without_admin_token(module, monkeypatch, header):
+    response = post(module, monkeypatch, None, *RELOAD, header=header)
+    assert response.status_code == 403
+
+
+@pytest.mark.parametrize("module", SERVERS)
+@pytest.mark.parametrize("header", [None, "wrong"])
+def test_reload_rejects_wrong_admin_token(module, monkeypatch, header):
+    response = post(module, monkeypatch, "secret", *RELOAD, header=header)
+    assert response.status_code == 401
+
+
+class FakeEncoder:
+    def __init__(self, model_name):
+        self.model_name = model_name
+
+
+@pytest.mark.parametrize("module", SERVERS)
+def test_document_encoder_requires_index_model(module, monkeypatch):
+    server = importlib.import_module(module)
+    snap = types.SimpleNamespace(embedding_model="sentence-transformers/index-model")
+
+    monkeypatch.setattr(server, "local_encoder", None)
+    assert server.document_encoder(snap) is None
+
+    monkeypatch.setattr(server, "local_encoder", FakeEncoder("text-embedding-3-small"))
+    assert server.document_encoder(snap) is None
+
+    encoder = FakeEncoder("sentence-transformers/index-model")
+    monkeypatch.setattr(server, "local_encoder", encoder)
+    assert server.document_encoder(snap) is encoder
+
+
+@pytest.mark.parametrize("module", SERVERS)
+def test_upsert_refuses_listings_without_index_encoder(module, monkeypatch):
+    server = importlib.import_module(module)
+    monkeypatch.setattr(server, "snapshot", types.SimpleNamespace(embedding_model=None))
+    monkeypatch.setattr(server, "local_encoder", None)
+    monkeypatch.setattr(server, "openai_client", object())
+    body = {"properties": [{"id": "p1", "name": "Villa"}]}
+    response = post(module, monkeypatch, "secret", "/api/index/upsert", body, header="secret")
+    assert response.status_code == 503
+    assert server.INDEX_EMBEDDING_MODEL in response.json()["detail"]
@@ -0,0 +1,29 @@
+"""MicroBatcher: abstract base, batched results per caller."""
+
+import pytest
+
+from embedding_batcher import MicroBatcher
+
+
+def test_process_batch_is_abstract():
+    with pytest.raises(TypeError):
+        MicroBatcher()
+
+    class Incomplete(MicroBatcher):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_subclass_gets_one_result_per_item():
+    class Doubler(MicroBatcher):
+        def process_batch(self, items):
+            return [item * 2 for item in items]
+
+    batcher = Doubler(max_wait_ms=1)
+    try:
+        futures = [batcher.submit(i) for i in range(10)]
+        assert [future.result(timeout=5) for future in futures] == [i * 2 for i in range(10)]
+    finally:
+        batcher.close()
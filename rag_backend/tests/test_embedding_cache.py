@@ -0,0 +1,96 @@
+"""Query embedding cache: disk tier TTL, pruning and batched writes."""
+
+import importlib
+
+import numpy as np
+import pytest
+
+import embedding_cache
+from embedding_cache import QueryEmbeddingCache, WRITE_BATCH
+from onnx_encoder import QUERY_PREFIX, query_cache_model
+
+SERVERS = ["server", "server_lite", "server_production"]
+
+
+def vector(seed, dimension=8):
+    return np.random.default_rng(seed).random(dimension, dtype=np.float32)
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    cache = QueryEmbeddingCache("m", 8, db_path=tmp_path / "q.sqlite3")
+    cache.put("Villa à Anfa", vector(1))
+    cache.close()
+
+    reopened = QueryEmbeddingCache("m", 8, db_path=tmp_path / "q.sqlite3")
+    assert np.array_equal(reopened.get("villa a anfa"), vector(1))
+    assert reopened.stats()["disk_hits"] == 1
+
+
+def test_disk_tier_applies_ttl(tmp_path, monkeypatch):
+    cache = QueryEmbeddingCache("m", 8, ttl_seconds=60, db_path=tmp_path / "q.sqlite3")
+    cache.put("villa", vector(1))
+    cache.close()
+
+    now = embedding_cache.time.time()
+    monkeypatch.setattr(embedding_cache.time, "time", lambda: now + 61)
+    reopened = QueryEmbeddingCache("m", 8, ttl_seconds=60, db_path=tmp_path / "q.sqlite3")
+    assert reopened.get("villa") is None
+    assert reopened.stats()["expired"] == 1
+
+
+def test_disk_tier_is_capped(tmp_path):
+    cache = QueryEmbeddingCache("m", 8, db_path=tmp_path / "q.sqlite3", max_disk_entries=10)
+    for i in range(3 * WRITE_BATCH):
+        cache.put(f"query {i}", vector(i))
+    cache.flush()
+    stats = cache.stats()
+    assert stats["disk_entries"] == 10
+    assert stats["disk_pruned"] == 3 * WRITE_BATCH - 10
+
+    # The newest entries are kept
+    cache.clear_memory()
+    assert np.array_equal(cache.get(f"query {3 * WRITE_BATCH - 1}"), vector(3 * WRITE_BATCH - 1))
+    assert cache.get("query 0") is None
+
+
+def test_writes_are_batched(tmp_path):
+    cache = QueryEmbeddingCache("m", 8, db_path=tmp_path / "q.sqlite3")
+    cache.put("villa", vector(1))
+    assert cache.stats()["pending_writes"] == 1
+    assert cache.stats()["disk_entries"] is None  # nothing written yet
+
+    for i in range(WRITE_BATCH - 1):
+        cache.put(f"query {i}", vector(i))
+    stats = cache.stats()
+    assert stats["pending_writes"] == 0
+    assert stats["disk_entries"] == WRITE_BATCH
+
+
+class FakeEncoder:
+    model_id = "index-model#onnx-int8"
+
+    def __init__(self):
+        self.queries = []
+
+    def encode_query(self, query):
+        self.queries.append(query)
+        return vector(2)
+
+
+@pytest.mark.parametrize("module", SERVERS)
+def test_server_encodes_prefixed_queries(module, tmp_path, monkeypatch):
+    server = importlib.import_module(module)
+    db_path = tmp_path / "q.sqlite3"
+
+    # Unprefixed vector cached before the prefix was added
+    stale = QueryEmbeddingCache(FakeEncoder.model_id, 8, db_path=db_path)
+    stale.put("villa", vector(1))
+    stale.close()
+
+    encoder = FakeEncoder()
+    monkeypatch.setattr(server, "local_encoder", encoder)
+    monkeypatch.setattr(server, "query_cache", QueryEmbeddingCache(
+        query_cache_model(encoder.model_id), 8, db_path=db_path
+    ))
+    assert np.array_equal(server.get_query_embedding("villa"), vector(2))
+    assert encoder.queries == [f"{QUERY_PREFIX}villa"]
@@ -0,0 +1,48 @@
+"""Artifact writes under memory-mapped readers."""
+
+import faiss
+import numpy as np
+import pytest
+
+from faiss_utils import atomic_path, read_index_mmap
+
+
+def save(path, array):
+    with atomic_path(path) as tmp, open(tmp, "wb") as f:
+        np.save(f, array)
+
+
+def test_rewrite_keeps_mapped_array(tmp_path):
+    path = tmp_path / "embeddings.npy"
+    save(path, np.ones((100, 8), dtype=np.float32))
+    mapped = np.load(path, mmap_mode="r")
+
+    save(path, np.zeros((2, 8), dtype=np.float32))
+    assert mapped.shape == (100, 8) and float(mapped.sum()) == 800
+    assert np.load(path).shape == (2, 8)
+
+
+def test_rewrite_keeps_mapped_index(tmp_path):
+    path = tmp_path / "index.faiss"
+    vectors = np.eye(8, dtype=np.float32)
+    index = faiss.IndexFlatIP(8)
+    index.add(vectors)
+    with atomic_path(path) as tmp:
+        faiss.write_index(index, str(tmp))
+    mapped = read_index_mmap(path)
+
+    with atomic_path(path) as tmp:
+        faiss.write_index(faiss.IndexFlatIP(8), str(tmp))
+    _, ids = mapped.search(vectors[3:4], 1)
+    assert ids[0, 0] == 3
+
+
+def test_failed_write_keeps_previous_file(tmp_path):
+    path = tmp_path / "embeddings.npy"
+    save(path, np.ones(4, dtype=np.float32))
+    with pytest.raises(RuntimeError):
+        with atomic_path(path) as tmp:
+            tmp.write_bytes(b"partial")
+            raise RuntimeError("interrupted")
+    assert np.load(path).tolist() == [1, 1, 1, 1]
+    assert [p.name for p in tmp_path.iterdir()] == ["embeddings.npy"]
@@ -0,0 +1,62 @@
+"""Structured filter validation (catalog + /api/search request model)."""
+
+import importlib
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from catalog import PropertyCatalog, normalize_filters
+
+SERVERS = ["server", "server_lite", "server_production"]
+
+PROPERTIES = [
+    {"id": "a", "category": "SALE", "type": "Villa", "priceNumeric": 3000, "areaNumeric": 80, "beds": 2},
+    {"id": "b", "category": "SALE", "type": "Villa", "priceNumeric": 8000, "areaNumeric": 200, "beds": 4},
+    {"id": "c", "category": "RENT", "type": "Appartement", "priceNumeric": 6000, "areaNumeric": 120, "beds": 3},
+]
+
+
+def test_string_filters_are_converted():
+    assert normalize_filters({"minPrice": "5000", "beds": "3", "type": "Villa"}) == {
+        "minPrice": 5000.0, "beds": 3, "type": "Villa"
+    }
+
+
+def test_mask_accepts_string_filters():
+    catalog = PropertyCatalog([dict(p) for p in PROPERTIES])
+    mask = catalog.mask_from_filters({"minPrice": "5000", "maxArea": "150", "beds": "3"})
+    assert np.flatnonzero(mask).tolist() == [2]
+
+
+def test_single_feature_string_is_wrapped():
+    assert normalize_filters({"features": "piscine"}) == {"features": ["piscine"]}
+    properties = [dict(p, features=f) for p, f in zip(PROPERTIES, [["Piscine"], [], ["Piscine", "Jardin"]])]
+    catalog = PropertyCatalog(properties)
+    assert np.flatnonzero(catalog.mask_from_filters({"features": "piscine"})).tolist() == [0, 2]
+
+
+@pytest.mark.parametrize("filters", [
+    {"features": 3},
+    {"features": {"piscine": True}},
+    {"features": ["piscine", 1]},
+    {"minPrice": "abc"},
+    {"maxPrice": [1]},
+    {"minArea": "nan"},
+    {"beds": "2.5"},
+    {"beds": True},
+])
+def test_invalid_filters_raise_value_error(filters):
+    with pytest.raises(ValueError):
+        normalize_filters(filters)
+
+
+@pytest.mark.parametrize("module", SERVERS)
+@pytest.mark.parametrize("filters", [{"minPrice": "cinq mille"}, {"features": 3}])
+def test_search_rejects_invalid_filters_with_422(module, filters):
+    app = importlib.import_module(module).app
+    response = TestClient(app).post(
+        "/api/search",
+        json={"query": "villa", "filters": filters}
+    )
+    assert response.status_code == 422
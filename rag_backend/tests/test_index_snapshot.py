@@ -0,0 +1,150 @@
+"""Index snapshots: artifact validation, generation marker, swaps."""
+
+import asyncio
+import importlib
+import json
+
+import faiss
+import numpy as np
+import pytest
+
+import index_snapshot
+from faiss_utils import EMBEDDINGS_FILE, INDEX_INFO_FILE, NEIGHBORS_FILE, build_neighbor_table
+from index_snapshot import artifact_fingerprint, load_snapshot
+from index_updates import apply_updates
+from metadata_store import write_metadata
+
+SERVERS = ["server", "server_lite", "server_production"]
+COUNT, DIMENSION = 6, 8
+
+
+def unit_vectors(count, seed=0):
+    vectors = np.random.default_rng(seed).normal(size=(count, DIMENSION)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def write_info(index_dir, version, ntotal=COUNT):
+    (index_dir / INDEX_INFO_FILE).write_text(json.dumps({"version": version, "ntotal": ntotal}))
+
+
+@pytest.fixture
+def index_dir(tmp_path):
+    embeddings = unit_vectors(COUNT)
+    index = faiss.IndexFlatIP(DIMENSION)
+    index.add(embeddings)
+    faiss.write_index(index, str(tmp_path / "index.faiss"))
+    write_metadata(
+        [{"id": f"p{i}", "name": f"Villa {i}", "description": f"Villa numéro {i}"} for i in range(COUNT)],
+        tmp_path
+    )
+    np.save(tmp_path / EMBEDDINGS_FILE, embeddings)
+    ids, scores = build_neighbor_table(index, embeddings, k=3)
+    np.savez(tmp_path / NEIGHBORS_FILE, ids=ids, scores=scores)
+    write_info(tmp_path, "v1")
+    return tmp_path
+
+
+def load(index_dir):
+    return load_snapshot(index_dir, "float32", {"name": 1.0}, {"name": 1.0})
+
+
+def test_loads_consistent_artifacts(index_dir):
+    snap = load(index_dir)
+    assert snap.version == "v1"
+    assert snap.embeddings.shape == (COUNT, DIMENSION)
+    assert snap.neighbors[0].shape == (COUNT, 3)
+    assert snap.id_to_idx["p4"] == 4
+
+
+def test_rejects_embeddings_of_another_generation(index_dir):
+    np.save(index_dir / EMBEDDINGS_FILE, unit_vectors(COUNT + 1))
+    with pytest.raises(ValueError, match=EMBEDDINGS_FILE):
+        load(index_dir)
+
+
+def test_rejects_neighbor_table_of_another_generation(index_dir):
+    ids = np.zeros((COUNT - 1, 3), dtype=np.int32)
+    np.savez(index_dir / NEIGHBORS_FILE, ids=ids, scores=np.zeros(ids.shape, dtype=np.float32))
+    with pytest.raises(ValueError, match=NEIGHBORS_FILE):
+        load(index_dir)
+
+
+def test_rejects_index_not_matching_marker(index_dir):
+    write_info(index_dir, "v2", ntotal=COUNT + 2)
+    with pytest.raises(ValueError, match=INDEX_INFO_FILE):
+        load(index_dir)
+
+
+def test_rejects_generation_written_while_loading(index_dir, monkeypatch):
+    load_static_encoder = index_snapshot.load_static_encoder
+
+    def new_generation_lands(path):
+        write_info(index_dir, "v2")
+        return load_static_encoder(path)
+
+    monkeypatch.setattr(index_snapshot, "load_static_encoder", new_generation_lands)
+    with pytest.raises(ValueError, match="changed while loading"):
+        load(index_dir)
+
+
+def test_fingerprint_follows_the_marker(index_dir):
+    before = artifact_fingerprint(index_dir)
+
+    # Artifacts of a generation in progress do not change it
+    np.save(index_dir / EMBEDDINGS_FILE, unit_vectors(COUNT, seed=1))
+    (index_dir / "index_sq8.faiss").write_bytes(b"partial")
+    assert artifact_fingerprint(index_dir) == before
+
+    write_info(index_dir, "v2")
+    assert artifact_fingerprint(index_dir) != before
+
+
+def test_fingerprint_without_marker_covers_every_file(index_dir):
+    (index_dir / INDEX_INFO_FILE).unlink()
+    before = artifact_fingerprint(index_dir)
+    np.save(index_dir / EMBEDDINGS_FILE, unit_vectors(COUNT, seed=1))
+    assert artifact_fingerprint(index_dir) != before
+
+
+def test_with_updates_keeps_rows_aligned(index_dir):
+    snap = load(index_dir)
+    vector = unit_vectors(1, seed=7)
+    result = apply_updates(
+        snap.properties, snap.embeddings, snap.index,
+        [{"id": "new", "name": "Riad"}], ["p1"],
+        text_fn=lambda p: p["name"],
+        embed_fn=lambda texts: np.repeat(vector, len(texts), axis=0)
+    )
+    updated = snap.with_updates(result, 1)
+
+    assert updated.version == "v1+1"
+    assert updated.fingerprint == snap.fingerprint
+    assert updated.neighbors is None
+    assert len(updated.properties) == COUNT
+    row = updated.id_to_idx["new"]
+    assert updated.properties[row]["name"] == "Riad"
+    _, ids = updated.index.search(vector, 1)
+    assert ids[0, 0] == row
+    # The original snapshot is untouched
+    assert snap.id_to_idx["p1"] == 1 and snap.index.ntotal == COUNT
+
+
+@pytest.mark.parametrize("module", SERVERS)
+def test_failed_reload_keeps_current_snapshot(module, index_dir, monkeypatch):
+    server = importlib.import_module(module)
+    current = load(index_dir)
+    monkeypatch.setattr(server, "snapshot", current)
+
+    def broken(*args):
+        raise ValueError("inconsistent artifacts")
+
+    monkeypatch.setattr(server, "load_snapshot", broken)
+    with pytest.raises(ValueError):
+        asyncio.run(server.reload_index())
+    assert server.snapshot is current
+
+    monkeypatch.setattr(server, "INDEX_DIR", index_dir)
+    monkeypatch.setattr(server, "load_snapshot", load_snapshot)
+    write_info(index_dir, "v2")
+    assert asyncio.run(server.reload_index()) == ("v1", "v2")
+    assert server.snapshot.version == "v2"
@@ -0,0 +1,187 @@
+"""Incremental index updates: row alignment, HNSW refill, journal replay."""
+
+import importlib
+import json
+
+import faiss
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from faiss_utils import EMBEDDINGS_FILE, INDEX_INFO_FILE
+from index_snapshot import load_snapshot
+from index_updates import UPDATES_JOURNAL_FILE, append_journal, apply_updates, create_search_text
+from metadata_store import write_metadata
+
+SERVERS = ["server", "server_lite", "server_production"]
+DIMENSION = 8
+MODEL = "sentence-transformers/index-model"
+
+
+def embed(texts):
+    """Deterministic unit vector per text."""
+    vectors = np.stack([
+        np.random.default_rng(abs(hash(text)) % 2**32).normal(size=DIMENSION) for text in texts
+    ]).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def listing(i, name=None):
+    return {"id": f"p{i}", "name": name or f"Villa {i}"}
+
+
+def text(prop):
+    return prop["name"]
+
+
+def build(count, index_type="flat"):
+    properties = [listing(i) for i in range(count)]
+    embeddings = embed([text(p) for p in properties])
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(DIMENSION, 16, faiss.METRIC_INNER_PRODUCT)
+    else:
+        index = faiss.IndexFlatIP(DIMENSION)
+    index.add(embeddings)
+    return properties, embeddings, index
+
+
+def assert_row_aligned(result):
+    properties, embeddings, index = result["properties"], result["embeddings"], result["index"]
+    assert index.ntotal == len(properties) == len(embeddings)
+    assert np.allclose(embeddings, embed([text(p) for p in properties]))
+    _, ids = index.search(np.ascontiguousarray(embeddings, dtype=np.float32), 1)
+    assert ids[:, 0].tolist() == list(range(len(properties)))
+
+
+def update(state, upserts=(), delete_ids=()):
+    return apply_updates(*state, list(upserts), list(delete_ids), text_fn=text, embed_fn=embed)
+
+
+def test_upsert_adds_changes_and_skips_unchanged():
+    result = update(build(5), upserts=[listing(1), listing(2, "Riad rénové"), listing(9)])
+    assert result["stats"] == {"added": 1, "updated": 1, "unchanged": 1, "deleted": 0, "embedded": 2}
+    assert [p["id"] for p in result["properties"]] == ["p0", "p1", "p2", "p3", "p4", "p9"]
+    assert result["properties"][2]["name"] == "Riad rénové"
+    assert len(result["embedded"]["hashes"]) == 2
+    assert_row_aligned(result)
+
+
+def test_delete_last_row():
+    result = update(build(5), delete_ids=["p4"])
+    assert [p["id"] for p in result["properties"]] == ["p0", "p1", "p2", "p3"]
+    assert result["stats"]["deleted"] == 1
+    assert_row_aligned(result)
+
+
+def test_delete_middle_row_moves_last_row():
+    result = update(build(5), delete_ids=["p1", "missing"])
+    assert [p["id"] for p in result["properties"]] == ["p0", "p4", "p2", "p3"]
+    assert result["stats"]["deleted"] == 1
+    assert_row_aligned(result)
+
+
+def test_inputs_are_not_modified():
+    properties, embeddings, index = build(5)
+    update((properties, embeddings, index), upserts=[listing(7)], delete_ids=["p0"])
+    assert [p["id"] for p in properties] == [f"p{i}" for i in range(5)]
+    assert index.ntotal == 5
+
+
+def test_hnsw_is_refilled_from_stored_vectors():
+    state = build(20, "hnsw")
+    result = update(state, upserts=[listing(3, "Duplex"), listing(30)], delete_ids=["p5", "p19"])
+    assert isinstance(faiss.downcast_index(result["index"]), faiss.IndexIDMap2)
+    assert len(result["properties"]) == 19
+    assert_row_aligned(result)
+
+
+def test_upsert_needs_an_id():
+    with pytest.raises(ValueError):
+        update(build(2), upserts=[{"name": "Sans id"}])
+
+
+# ============================================================================
+# JOURNAL
+# ============================================================================
+
+@pytest.fixture
+def index_dir(tmp_path):
+    properties = [listing(i) for i in range(5)]
+    embeddings = embed([create_search_text(p) for p in properties])
+    index = faiss.IndexFlatIP(DIMENSION)
+    index.add(embeddings)
+    faiss.write_index(index, str(tmp_path / "index.faiss"))
+    write_metadata(properties, tmp_path)
+    np.save(tmp_path / EMBEDDINGS_FILE, embeddings)
+    (tmp_path / INDEX_INFO_FILE).write_text(json.dumps({"version": "v1", "ntotal": 5, "embedding_model": MODEL}))
+    return tmp_path
+
+
+def load(index_dir):
+    return load_snapshot(index_dir, "float32", {"name": 1.0}, {"name": 1.0})
+
+
+def journal(index_dir, base, upserts=(), delete_ids=()):
+    snap = load(index_dir)
+    result = apply_updates(
+        snap.properties, snap.embeddings, snap.index, list(upserts), list(delete_ids),
+        text_fn=create_search_text, embed_fn=embed, hashes=snap.content_hashes
+    )
+    append_journal(index_dir, base, list(upserts), list(delete_ids), result["embedded"])
+
+
+def test_load_replays_journal(index_dir):
+    journal(index_dir, "v1", upserts=[listing(7, "Riad")], delete_ids=["p0"])
+    journal(index_dir, "v1", upserts=[listing(2, "Penthouse")])
+
+    snap = load(index_dir)
+    assert snap.version == "v1+2"
+    assert snap.updates == 2
+    assert sorted(snap.id_to_idx) == ["p1", "p2", "p3", "p4", "p7"]
+    row = snap.id_to_idx["p2"]
+    assert snap.properties[row]["name"] == "Penthouse"
+    _, ids = snap.index.search(embed([create_search_text(snap.properties[row])]), 1)
+    assert ids[0, 0] == row
+
+
+def test_journal_of_another_generation_is_ignored(index_dir):
+    journal(index_dir, "v0", delete_ids=["p0"])
+    snap = load(index_dir)
+    assert snap.version == "v1" and "p0" in snap.id_to_idx
+
+
+def test_torn_last_entry_is_dropped(index_dir):
+    journal(index_dir, "v1", delete_ids=["p0"])
+    with open(index_dir / UPDATES_JOURNAL_FILE, "ab") as f:
+        f.write(b"\x85\xa4base")
+    snap = load(index_dir)
+    assert snap.updates == 1 and "p0" not in snap.id_to_idx
+
+
+class FakeEncoder:
+    model_name = MODEL
+
+    def encode(self, texts):
+        return embed(texts)
+
+
+@pytest.mark.parametrize("module", SERVERS)
+def test_upsert_survives_reload(module, index_dir, monkeypatch):
+    server = importlib.import_module(module)
+    monkeypatch.setattr(server, "ADMIN_TOKEN", "secret")
+    monkeypatch.setattr(server, "INDEX_DIR", index_dir)
+    monkeypatch.setattr(server, "local_encoder", FakeEncoder())
+    monkeypatch.setattr(server, "snapshot", load(index_dir))
+    client = TestClient(server.app)
+
+    response = client.post(
+        "/api/index/upsert",
+        json={"properties": [listing(8, "Loft")], "delete_ids": ["p3"]},
+        headers={"X-Admin-Token": "secret"}
+    )
+    assert response.status_code == 200
+    assert response.json()["version"] == "v1+1"
+
+    response = client.post("/api/admin/reload", headers={"X-Admin-Token": "secret"})
+    assert response.json()["version"] == "v1+1"
+    assert "p8" in server.snapshot.id_to_idx and "p3" not in server.snapshot.id_to_idx
@@ -0,0 +1,91 @@
+"""KeywordIndex: same matches and scores as a linear substring scan."""
+
+import numpy as np
+import pytest
+
+from keyword_index import KeywordIndex, field_text
+
+FIELD_WEIGHTS = {"name": 1.0, "location": 0.9, "type": 0.8, "features": 0.6, "description": 0.3}
+PHRASE_WEIGHTS = {"name": 4.0, "location": 3.0, "type": 2.0}
+
+PROPERTIES = [
+    {"id": "a", "name": "Villa Anfa Supérieur", "location": "Anfa", "type": "Villa",
+     "features": ["Piscine", "Jardin privé"], "description": "Belle villa avec piscine", "category": "SALE"},
+    {"id": "b", "name": "Appartement Maarif", "location": "Maarif", "type": "Appartement",
+     "features": ["Ascenseur"], "description": "Proche du parc", "category": "RENT"},
+    {"id": "c", "name": "Villa contemporaine", "location": "Bouskoura", "type": "Villa",
+     "features": ["Jardin"], "description": "", "category": "SALE"},
+    {"id": "d", "name": "Bureau centre ville", "location": "Anfa Place", "type": "Bureau",
+     "features": [], "description": "Plateau de bureaux à Anfa", "category": "RENT"},
+]
+
+
+def linear_scan(query):
+    """Reference: the historical per-listing substring checks."""
+    query_lower = query.lower()
+    terms = query_lower.split()
+    scores = {}
+    for row, prop in enumerate(PROPERTIES):
+        score = 0.0
+        if terms:
+            score += sum(w for f, w in PHRASE_WEIGHTS.items() if query_lower in field_text(prop, f))
+        for term in terms:
+            if len(term) >= 2:
+                score += sum(w for f, w in FIELD_WEIGHTS.items() if term in field_text(prop, f))
+        if score > 0:
+            scores[row] = score
+    return scores
+
+
+@pytest.fixture(scope="module")
+def index():
+    return KeywordIndex(PROPERTIES, FIELD_WEIGHTS, PHRASE_WEIGHTS)
+
+
+@pytest.mark.parametrize("query", [
+    "villa",              # whole token, several fields
+    "VIL",                # substring of a token, case-insensitive
+    "nfa",                # inner substring
+    "villa anfa",         # phrase in the name, terms in several fields
+    "anfa place",         # phrase in the location
+    "jardin privé",       # phrase across a list field (features are not phrase fields)
+    "piscine jardin",     # terms in one multi-value field
+    "a",                  # single-letter term: phrase only
+    "bureau à anfa",
+    "  villa   contemporaine ",
+    "riad",               # no match
+])
+def test_matches_linear_scan(index, query):
+    doc_ids, scores = index.score(query)
+    assert dict(zip(doc_ids.tolist(), scores.tolist())) == pytest.approx(linear_scan(query))
+
+
+@pytest.mark.parametrize("query", ["", " ", "\t\n"])
+def test_empty_query_matches_nothing(index, query):
+    doc_ids, scores = index.score(query)
+    assert doc_ids.size == 0 and scores.size == 0
+    assert index.search(query) == []
+
+
+def test_score_many_matches_score(index):
+    queries = ["villa anfa", "villa", "jardin", ""]
+    for (doc_ids, scores), query in zip(index.score_many(queries), queries):
+        expected_ids, expected_scores = index.score(query)
+        assert doc_ids.tolist() == expected_ids.tolist()
+        assert np.allclose(scores, expected_scores)
+
+
+def test_search_ranks_and_masks(index):
+    expected = sorted(linear_scan("villa anfa").items(), key=lambda item: (-item[1], item[0]))
+    assert [row for row, _ in index.search("villa anfa")] == [row for row, _ in expected]
+    assert index.search("villa anfa", top_k=1) == [(expected[0][0], pytest.approx(expected[0][1]))]
+
+    mask = np.array([False, True, True, True])
+    assert all(row != 0 for row, _ in index.search("villa anfa", mask=mask))
+
+
+def test_boosts_and_values(index):
+    rent = index.docs_with_value("category", "RENT")
+    assert rent.tolist() == [1, 3]
+    doc_ids, scores = index.score("riad", boosts=[(rent, 0.5)])
+    assert doc_ids.tolist() == [1, 3] and scores.tolist() == [0.5, 0.5]
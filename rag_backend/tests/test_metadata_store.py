@@ -0,0 +1,22 @@
+"""Binary metadata: rewriting the files under an open store."""
+
+from metadata_store import METADATA_COLD_FILE, METADATA_HOT_FILE, load_metadata, write_metadata
+
+
+def listings(description):
+    return [{"id": f"p{i}", "name": f"Villa {i}", "description": description * (i + 1)} for i in range(5)]
+
+
+def test_rewrite_keeps_open_store_readable(tmp_path):
+    write_metadata(listings("ancienne "), tmp_path)
+    store = load_metadata(tmp_path)
+
+    # New generation with a shorter cold file
+    write_metadata(listings("x"), tmp_path)
+    assert [p["description"] for p in store] == ["ancienne " * (i + 1) for i in range(5)]
+    assert [p["description"] for p in load_metadata(tmp_path)] == ["x" * (i + 1) for i in range(5)]
+
+
+def test_no_temporary_files_left(tmp_path):
+    write_metadata(listings("a"), tmp_path)
+    assert sorted(p.name for p in tmp_path.iterdir()) == sorted([METADATA_COLD_FILE, METADATA_HOT_FILE])
@@ -0,0 +1,57 @@
+"""Agent expansion mode selection."""
+
+import importlib
+
+import numpy as np
+import pytest
+
+from query_expansion import (
+    SYNONYM_VECTORS_FILE,
+    build_synonym_vectors,
+    load_synonym_vectors,
+    use_vector_expansion
+)
+
+
+def encode(terms):
+    vectors = np.random.default_rng(0).normal(size=(len(terms), 8)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+@pytest.fixture
+def built():
+    return build_synonym_vectors(encode, "m")
+
+
+@pytest.fixture
+def shipped(tmp_path, built):
+    path = tmp_path / SYNONYM_VECTORS_FILE
+    built.save(path)
+    return load_synonym_vectors(path, model_name="m", dimension=8)
+
+
+def test_text_is_the_default_mode(monkeypatch):
+    import config
+    monkeypatch.delenv("QUERY_EXPANSION_MODE", raising=False)
+    assert importlib.reload(config).QUERY_EXPANSION_MODE == "text"
+
+
+@pytest.mark.parametrize("mode", ["text", "vector", "auto"])
+def test_no_vector_expansion_without_vectors(mode):
+    assert not use_vector_expansion(mode, None)
+
+
+def test_text_mode_never_uses_vectors(built, shipped):
+    assert not use_vector_expansion("text", built)
+    assert not use_vector_expansion("text", shipped)
+
+
+def test_vector_mode_uses_any_vectors(built, shipped):
+    assert use_vector_expansion("vector", built)
+    assert use_vector_expansion("vector", shipped)
+
+
+def test_auto_mode_needs_shipped_vectors(built, shipped):
+    assert not built.shipped and shipped.shipped
+    assert not use_vector_expansion("auto", built)
+    assert use_vector_expansion("auto", shipped)
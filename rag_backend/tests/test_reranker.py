@@ -0,0 +1,70 @@
+"""ResultReranker boosts against hand-computed scores."""
+
+import numpy as np
+import pytest
+
+from catalog import PropertyCatalog
+from reranker import ResultReranker, sort_by_scores
+
+PROPERTIES = [
+    # completeness 4/4, smartTags
+    {"id": "a", "category": "SALE", "type": "Villa", "location": "Anfa Supérieur", "beds": 4, "baths": 2,
+     "area": "300 m²", "description": "Villa avec piscine", "features": ["Piscine", "Jardin"], "smartTags": ["Luxe"]},
+    # completeness 1/4
+    {"id": "b", "category": "RENT", "type": "Appartement", "location": "Maarif", "beds": 2,
+     "features": ["Piscine"]},
+    # completeness 1/4
+    {"id": "c", "category": "SALE", "type": "Appartement", "location": "Anfa", "beds": 3},
+]
+
+
+@pytest.fixture
+def reranker():
+    properties = [dict(p) for p in PROPERTIES]
+    return ResultReranker(PropertyCatalog(properties), {p["id"]: i for i, p in enumerate(properties)})
+
+
+def test_rows_follow_result_order(reranker):
+    assert reranker.rows([{"id": "c"}, {"id": "a"}]).tolist() == [2, 0]
+
+
+def test_intent_scores(reranker):
+    rows = np.array([0, 1, 2])
+    filters = {"location": "anfa", "type": "Villa", "features": ["piscine", "jardin"]}
+    scores = reranker.intent_scores(rows, np.ones(3), "buy", filters)
+    assert scores == pytest.approx([
+        1.3 * 1.25 * 1.2 * (1 + 0.1 * 2),  # SALE, Anfa, Villa, 2 features
+        1 + 0.1 * 1,                        # 1 feature
+        1.3 * 1.25,                         # SALE, Anfa
+    ])
+
+
+def test_intent_scores_scale_given_scores(reranker):
+    rows = np.array([2, 1])
+    scores = reranker.intent_scores(rows, np.array([0.5, 0.8]), "rent", {})
+    assert scores == pytest.approx([0.5, 0.8 * 1.3])
+
+
+def test_agent_scores(reranker):
+    rows = np.array([0, 1, 2])
+    scores = reranker.agent_scores(rows, np.ones(3), "rent", np.array([2, 0, 1]))
+    assert scores == pytest.approx([
+        (1 + 0.1 * 2) * 1.1 * (1 + 0.1 * 1.0),  # 2 filter matches, smartTags, complete
+        1.2 * (1 + 0.1 * 0.25),                  # RENT
+        (1 + 0.1 * 1) * (1 + 0.1 * 0.25),        # 1 filter match
+    ])
+
+
+def test_relevance(reranker):
+    rows = np.array([0, 1, 2])
+    filters = {"type": "Appartement", "beds": 3, "features": ["jardin"]}
+    assert reranker.relevance(rows, filters, np.zeros(3)) == pytest.approx([2 / 3, 1 / 3, 2 / 3])
+    # Without structured filters the semantic scores are kept
+    assert reranker.relevance(rows, {}, np.array([0.3, 0.2, 0.1])) == pytest.approx([0.3, 0.2, 0.1])
+
+
+def test_sort_by_scores_is_stable():
+    results = [{"id": "a"}, {"id": "b"}, {"id": "c"}]
+    ordered = sort_by_scores(results, np.array([0.5, 0.9, 0.5]))
+    assert [r["id"] for r in ordered] == ["b", "a", "c"]
+    assert ordered[0]["_final_score"] == 0.9
@@ -0,0 +1,148 @@
+"""ResultCache: version invalidation, LRU, stale-while-revalidate."""
+
+import asyncio
+import threading
+
+import pytest
+
+import result_cache
+from result_cache import ResultCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(result_cache.time, "monotonic", clock)
+    return clock
+
+
+def counter(value="v"):
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return f"{value}{len(calls)}"
+
+    return compute, calls
+
+
+def test_hit_after_miss(clock):
+    cache = ResultCache()
+    compute, calls = counter()
+
+    async def run():
+        return [await cache.get_or_compute("k", "v1", compute) for _ in range(2)]
+
+    assert asyncio.run(run()) == [("v1", "miss"), ("v1", "hit")]
+    assert len(calls) == 1
+
+
+def test_version_change_drops_entries(clock):
+    cache = ResultCache()
+    compute, calls = counter()
+
+    async def run():
+        await cache.get_or_compute("k", "v1", compute)
+        return await cache.get_or_compute("k", "v2", compute)
+
+    assert asyncio.run(run()) == ("v2", "miss")
+    stats = cache.stats()
+    assert stats["invalidations"] == 1 and stats["version"] == "v2" and stats["entries"] == 1
+
+
+def test_result_of_older_version_is_not_stored(clock):
+    cache = ResultCache()
+    started, release = threading.Event(), threading.Event()
+
+    def slow():
+        started.set()
+        release.wait(5)
+        return "old"
+
+    async def run():
+        old = asyncio.create_task(cache.get_or_compute("k", "v1", slow))
+        await asyncio.to_thread(started.wait, 5)
+        # The index is swapped while the v1 computation runs
+        await cache.get_or_compute("other", "v2", lambda: "new")
+        release.set()
+        assert await old == ("old", "miss")
+        return await cache.get_or_compute("k", "v2", lambda: "fresh")
+
+    assert asyncio.run(run()) == ("fresh", "miss")
+
+
+def test_stale_entry_is_served_and_refreshed(clock):
+    cache = ResultCache(ttl_seconds=10, stale_seconds=60)
+    compute, calls = counter()
+
+    async def run():
+        await cache.get_or_compute("k", "v1", compute)
+        clock.now += 30
+        stale = await cache.get_or_compute("k", "v1", compute)
+        await asyncio.gather(*cache._tasks)
+        fresh = await cache.get_or_compute("k", "v1", compute)
+        return stale, fresh
+
+    assert asyncio.run(run()) == (("v1", "stale"), ("v2", "hit"))
+    assert cache.stats()["refreshes"] == 1
+
+
+def test_refresh_for_older_version_is_not_stored(clock):
+    cache = ResultCache(ttl_seconds=10, stale_seconds=60)
+
+    async def run():
+        await cache.get_or_compute("k", "v1", lambda: "old")
+        clock.now += 30
+        release = threading.Event()
+
+        def slow():
+            release.wait(5)
+            return "refreshed for v1"
+
+        assert await cache.get_or_compute("k", "v1", slow) == ("old", "stale")
+        await cache.get_or_compute("other", "v2", lambda: "new")
+        release.set()
+        await asyncio.gather(*cache._tasks)
+        return await cache.get_or_compute("k", "v2", lambda: "fresh")
+
+    assert asyncio.run(run()) == ("fresh", "miss")
+
+
+def test_expired_entry_is_recomputed(clock):
+    cache = ResultCache(ttl_seconds=10, stale_seconds=60)
+    compute, calls = counter()
+
+    async def run():
+        await cache.get_or_compute("k", "v1", compute)
+        clock.now += 100
+        return await cache.get_or_compute("k", "v1", compute)
+
+    assert asyncio.run(run()) == ("v2", "miss")
+
+
+def test_lru_eviction_and_bypass(clock):
+    cache = ResultCache(max_entries=2)
+
+    async def run():
+        for key in ("a", "b", "a", "c"):
+            await cache.get_or_compute(key, "v1", lambda: key)
+        return [await cache.get_or_compute(key, "v1", lambda: "recomputed") for key in ("a", "b")]
+
+    assert asyncio.run(run()) == [("a", "hit"), ("recomputed", "miss")]
+    assert cache.stats()["evictions"] == 2
+
+    disabled = ResultCache(max_entries=0)
+    assert asyncio.run(disabled.get_or_compute("k", "v1", lambda: 1)) == (1, "bypass")
+
+
+def test_keys_ignore_parameter_order():
+    assert ResultCache.make_key("search", q="villa", filters={"a": 1, "b": 2}) == \
+        ResultCache.make_key("search", filters={"b": 2, "a": 1}, q="villa")
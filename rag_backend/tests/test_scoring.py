@@ -0,0 +1,54 @@
+"""Score fusion helpers: dense scatter, max normalization, top-k selection."""
+
+import numpy as np
+
+from scoring import normalize_max, scatter_scores, top_k_indices
+
+
+def test_scatter_ignores_faiss_padding():
+    dense = scatter_scores(5, np.array([3, -1, 0, -1]), np.array([0.7, 9.0, 0.2, 9.0]))
+    assert dense.dtype == np.float32
+    assert dense.tolist() == np.array([0.2, 0, 0, 0.7, 0], dtype=np.float32).tolist()
+
+
+def test_scatter_all_padding():
+    assert not scatter_scores(3, np.full(4, -1), np.ones(4)).any()
+
+
+def test_normalize_max():
+    assert normalize_max(np.array([2.0, 0.0, 4.0])).tolist() == [0.5, 0.0, 1.0]
+
+
+def test_normalize_all_zeros_and_empty():
+    assert normalize_max(np.zeros(3)).tolist() == [0.0, 0.0, 0.0]
+    assert normalize_max(np.array([])).size == 0
+
+
+def test_top_k_best_first():
+    scores = np.array([0.1, 0.9, 0.5, 0.7])
+    assert top_k_indices(scores, 3).tolist() == [1, 3, 2]
+    assert top_k_indices(scores, 10).tolist() == [1, 3, 2, 0]
+
+
+def test_top_k_boundary_ties_in_row_order():
+    scores = np.array([1.0, 3.0, 2.0, 2.0, 0.0, 2.0])
+    assert top_k_indices(scores, 2).tolist() == [1, 2]
+    assert top_k_indices(scores, 3).tolist() == [1, 2, 3]
+    # Same order as a stable sort, whatever k
+    stable = np.argsort(-scores, kind="stable")
+    for k in range(1, scores.size + 1):
+        assert top_k_indices(scores, k).tolist() == stable[:k].tolist()
+
+
+def test_top_k_with_mask():
+    scores = np.array([1.0, 3.0, 2.0, 2.0, 0.0, 2.0])
+    mask = np.array([True, False, False, True, True, True])
+    assert top_k_indices(scores, 2, mask).tolist() == [3, 5]
+    assert top_k_indices(scores, 2, np.zeros(6, dtype=bool)).size == 0
+
+
+def test_top_k_nothing_to_select():
+    scores = np.array([1.0, 2.0])
+    assert top_k_indices(scores, 0).size == 0
+    assert top_k_indices(scores, -1).size == 0
+    assert top_k_indices(np.array([]), 3).size == 0
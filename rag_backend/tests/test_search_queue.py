@@ -0,0 +1,96 @@
+"""SearchQueue: batched encodes and searches match one-by-one searches."""
+
+import faiss
+import numpy as np
+import pytest
+
+from faiss_utils import filtered_search
+from query_expansion import fold_expansion
+from search_queue import SearchQueue, SearchRequest
+
+DIMENSION = 16
+
+
+def unit(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=-1, keepdims=True)
+
+
+def encode_one(text):
+    return unit(np.random.default_rng(abs(hash(text)) % 2**32).normal(size=DIMENSION))
+
+
+class Encoder:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        return np.stack([encode_one(text) for text in texts])
+
+
+@pytest.fixture(scope="module")
+def index():
+    index = faiss.IndexFlatIP(DIMENSION)
+    index.add(unit(np.random.default_rng(0).normal(size=(200, DIMENSION))))
+    return index
+
+
+def requests():
+    candidates = np.array([3, 17, 42, 99, 150, 151, 152])
+    shift = 0.3 * encode_one("piscine")
+    return [
+        SearchRequest("villa anfa", 5),
+        SearchRequest("appartement maarif", 10),
+        SearchRequest("villa anfa", 5),                      # duplicate text
+        SearchRequest("bureau", 5, candidates=candidates),   # filter pushdown
+        SearchRequest(None, 3, vector=encode_one("riad")),   # known vector
+        SearchRequest("villa", 10, shift=shift),              # synonym expansion
+    ]
+
+
+def one_by_one(index, request):
+    vector = request.vector if request.vector is not None else encode_one(request.query)
+    vector = fold_expansion(vector, request.shift).reshape(1, -1)
+    if request.candidates is not None:
+        return vector, *filtered_search(index, vector, request.k, request.candidates)
+    return vector, *index.search(vector, request.k)
+
+
+def assert_same(batched, expected):
+    for (vector, scores, ids), (exp_vector, exp_scores, exp_ids) in zip(batched, expected):
+        assert np.allclose(vector, exp_vector)
+        assert ids.tolist() == exp_ids.tolist()
+        assert np.allclose(scores, exp_scores, atol=1e-6)
+
+
+def test_batch_matches_single_searches(index):
+    encoder = Encoder()
+    queue = SearchQueue(encoder, lambda: index)
+    batch = requests()
+    results = queue.process_batch(batch)
+
+    assert_same(results, [one_by_one(index, r) for r in requests()])
+    # One encode of the distinct texts, one search per k + one per filter
+    assert encoder.calls == [["villa anfa", "appartement maarif", "bureau", "villa"]]
+    stats = queue.stats()
+    assert stats["encoded"] == 4 and stats["index_searches"] == 4
+
+
+def test_queued_requests_match_single_searches(index):
+    queue = SearchQueue(Encoder(), lambda: index, max_wait_ms=20)
+    try:
+        results = queue.search_many(requests())
+        assert_same(results, [one_by_one(index, r) for r in requests()])
+
+        vector, scores, ids = queue.search("villa anfa", 5)
+        _, exp_scores, exp_ids = one_by_one(index, SearchRequest("villa anfa", 5))
+        assert ids.tolist() == exp_ids.tolist() and np.allclose(scores, exp_scores, atol=1e-6)
+    finally:
+        queue.close()
+
+
+def test_empty_candidates_return_padding(index):
+    queue = SearchQueue(Encoder(), lambda: index)
+    [(_, scores, ids)] = queue.process_batch([SearchRequest("villa", 4, candidates=np.array([], dtype=np.int64))])
+    assert ids.tolist() == [[-1] * 4] and np.all(np.isneginf(scores))
@@ -0,0 +1,159 @@
+"""Hybrid search: same ranking as the historical full-scan fusion."""
+
+import random
+import zlib
+
+import faiss
+import numpy as np
+import pytest
+
+from config import KEYWORD_FIELD_WEIGHTS, KEYWORD_PHRASE_WEIGHTS, MIN_SIMILARITY_THRESHOLD
+from keyword_index import field_text
+from vector_store import PropertyVectorStore
+
+DIMENSION = 8
+TYPES = ["Villa", "Appartement", "Bureau", "Duplex"]
+LOCATIONS = ["Anfa", "Maarif", "Bouskoura", "Gauthier"]
+FEATURES = ["Piscine", "Jardin", "Ascenseur", "Terrasse"]
+
+
+def encode(text):
+    """Deterministic unit vector per text."""
+    vector = np.random.default_rng(zlib.crc32(text.encode())).normal(size=DIMENSION)
+    return (vector / np.linalg.norm(vector)).astype(np.float32)
+
+
+class StubEmbedder:
+    model_name = "stub"
+
+    def embed_queries(self, texts):
+        return np.stack([encode(text) for text in texts])
+
+
+def catalog(count, seed=0):
+    rng = random.Random(seed)
+    properties = []
+    for i in range(count):
+        prop_type, location = rng.choice(TYPES), rng.choice(LOCATIONS)
+        properties.append({
+            "id": f"p{i}",
+            "name": f"{prop_type} {location}",
+            "type": prop_type,
+            "location": location,
+            "city": "Casablanca",
+            "beds": rng.randint(1, 5),
+            "features": rng.sample(FEATURES, rng.randint(0, 2)),
+            "description": f"Bien numéro {i}",
+        })
+    return properties
+
+
+def build_store(count, seed=0):
+    store = PropertyVectorStore(StubEmbedder())
+    store.properties = catalog(count, seed)
+    store.property_ids = [p["id"] for p in store.properties]
+    vectors = np.random.default_rng(seed + 1).normal(size=(count, DIMENSION))
+    store.embeddings = np.ascontiguousarray(vectors / np.linalg.norm(vectors, axis=1, keepdims=True), dtype=np.float32)
+    store.index = faiss.IndexFlatIP(DIMENSION)
+    store.index.add(store.embeddings)
+    store._build_lookups()
+    store.is_initialized = True
+    return store
+
+
+def linear_scan(properties, query):
+    """Reference: the historical per-listing substring checks."""
+    query_lower = query.lower()
+    terms = query_lower.split()
+    results = []
+    for row, prop in enumerate(properties):
+        score = sum(w for f, w in KEYWORD_PHRASE_WEIGHTS.items() if query_lower in field_text(prop, f))
+        for term in terms:
+            if len(term) >= 2:
+                score += sum(w for f, w in KEYWORD_FIELD_WEIGHTS.items() if term in field_text(prop, f))
+        if score > 0:
+            results.append((row, score))
+    results.sort(key=lambda x: x[1], reverse=True)
+    return results[:50]
+
+
+def baseline_hybrid(store, query, top_k, semantic_weight=0.6, keyword_weight=0.4):
+    """Reference: the historical dict-based fusion over a full-index scan."""
+    filters = store._extract_filters_from_query(query)
+    candidates = list(range(len(store.properties)))
+    if filters:
+        candidates = store._apply_filters(filters).tolist() or candidates
+
+    keyword_scores = dict(linear_scan(store.properties, query))
+    max_kw = max(keyword_scores.values()) if keyword_scores else 1
+    semantic_scores = store.embeddings @ encode(query)
+
+    def fused(idx):
+        kw_norm = keyword_scores.get(idx, 0) / max_kw if max_kw > 0 else 0
+        return semantic_scores[idx] * semantic_weight + kw_norm * keyword_weight
+
+    combined = {idx: fused(idx) * (1.2 if filters else 1.0) for idx in candidates}
+    for idx in np.argsort(-semantic_scores, kind="stable").tolist():
+        if idx not in combined and semantic_scores[idx] > 0.5:
+            combined[idx] = fused(idx)
+
+    ranked = sorted(combined, key=lambda idx: combined[idx], reverse=True)[:top_k]
+    return [
+        (store.property_ids[idx], combined[idx])
+        for idx in ranked
+        if combined[idx] >= MIN_SIMILARITY_THRESHOLD * 0.5
+    ]
+
+
+def ranking(results):
+    return [(r["id"], r["_score"]) for r in results]
+
+
+def assert_same_ranking(results, expected):
+    assert [pid for pid, _ in ranking(results)] == [pid for pid, _ in expected]
+    assert [score for _, score in ranking(results)] == pytest.approx([score for _, score in expected], abs=1e-5)
+
+
+QUERIES = [
+    "villa anfa",                     # type + location filters
+    "appartement 3 chambres maarif",  # beds filter too
+    "piscine jardin",                 # feature filters
+    "duplex",
+    "bien lumineux",                  # no filter, every listing is a keyword hit
+    "riad",                           # filter without matches: full search
+]
+
+
+@pytest.fixture(scope="module")
+def store():
+    return build_store(40)
+
+
+@pytest.mark.parametrize("query", QUERIES)
+@pytest.mark.parametrize("top_k", [5, 20])
+def test_matches_full_scan_fusion(store, query, top_k):
+    assert_same_ranking(store.hybrid_search(query, top_k), baseline_hybrid(store, query, top_k))
+
+
+@pytest.mark.parametrize("query", ["villa", "piscine jardin", "bien lumineux", "appartement anfa"])
+def test_only_top_keyword_hits_are_fused(query):
+    # More keyword hits than KEYWORD_FUSION_TOP_K, with score ties at the cut
+    store = build_store(300, seed=1)
+    assert len(store.keyword_index.score(query)[0]) > 50
+    assert_same_ranking(store.hybrid_search(query, 20), baseline_hybrid(store, query, 20))
+
+
+@pytest.mark.parametrize("queries", [
+    ["villa anfa", "bien lumineux"],                  # filtered first
+    ["duplex", "appartement 3 chambres maarif"],      # both filtered
+    ["bien lumineux", "piscine jardin", "riad", "villa anfa"],
+])
+def test_many_matches_one_by_one(store, queries):
+    # Filtered queries queue two searches each, read back in plan order
+    top_ks = [5, 20, 8, 3][:len(queries)]
+    batched = store.hybrid_search_many(queries, top_ks)
+    assert len(batched) == len(queries)
+    for query, top_k, results in zip(queries, top_ks, batched):
+        single = store.hybrid_search(query, top_k)
+        assert ranking(results) == ranking(single)
+        assert [r["_filters_matched"] for r in results] == [r["_filters_matched"] for r in single]
@@ -5,7 +5,6 @@ FAISS-based vector store for semantic property search.
 Optimized for high-precision retrieval with hybrid search.
 """
 
-import json
 import logging
 from pathlib import Path
 from typing import List, Dict, Any, Optional, Tuple
@@ -15,13 +14,34 @@ import faiss
 from config import (
     PROPERTIES_JSON,
     FAISS_INDEX_PATH,
+    FAISS_INDEX_TYPE,
     DEFAULT_TOP_K,
+    SIMILAR_NEIGHBORS,
+    SIMILAR_PRECOMPUTE_MAX,
     MIN_SIMILARITY_THRESHOLD,
-    EXACT_MATCH_BOOST,
-    PARTIAL_MATCH_BOOST,
-    EMBEDDING_DIMENSION
+    KEYWORD_FIELD_WEIGHTS,
+    KEYWORD_PHRASE_WEIGHTS,
+    KEYWORD_FUSION_TOP_K,
+    EMBEDDING_DIMENSION,
+    SEARCH_BATCH_SIZE,
+    SEARCH_BATCH_WAIT_MS,
+    SYNONYM_EXPANSION_WEIGHT
+)
+from embeddings import PropertyEmbedder
+from catalog import PropertyCatalog
+from catalog_loader import catalog_path, read_catalog
+from keyword_index import KeywordIndex
+from faiss_utils import build_ann_index, build_neighbor_table, similar_rows
+from index_updates import apply_updates
+from scoring import scatter_scores, normalize_max, top_k_indices
+from query_analysis import RequestContext, analyze_query
+from search_queue import SearchQueue, SearchRequest
+from query_expansion import (
+    SYNONYM_VECTORS_FILE,
+    SynonymVectors,
+    build_synonym_vectors,
+    load_synonym_vectors
 )
-from embeddings import PropertyEmbedder, QueryExpander
 
 logger = logging.getLogger(__name__)
 
@@ -36,267 +56,188 @@ class PropertyVectorStore:
     def __init__(self, embedder: PropertyEmbedder):
         """Initialize vector store with embedder."""
         self.embedder = embedder
-        self.index: Optional[faiss.IndexFlatIP] = None
+        self.index: Optional[faiss.Index] = None
+        self.index_info: Dict[str, Any] = {}
         self.properties: List[Dict[str, Any]] = []
         self.property_ids: List[str] = []
+        self.embeddings: Optional[np.ndarray] = None
         self.id_to_idx: Dict[str, int] = {}
+        self.catalog: Optional[PropertyCatalog] = None
+        self.keyword_index: Optional[KeywordIndex] = None
+        self.content_hashes: Optional[List[str]] = None
+        self.neighbors: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        self.synonym_vectors: Optional[SynonymVectors] = None
         self.is_initialized = False
 
+        # Concurrent searches are encoded and searched in batches
+        self.search_queue = SearchQueue(
+            embedder.embed_queries,
+            lambda: self.index,
+            max_batch=SEARCH_BATCH_SIZE,
+            max_wait_ms=SEARCH_BATCH_WAIT_MS
+        )
+
     def load_properties(self, path: Path = PROPERTIES_JSON) -> List[Dict[str, Any]]:
-        """Load properties from JSON file."""
+        """
+        Load properties from the catalog file (JSONL variant when present).
+        Handles both a direct array and a nested {"properties": [...]},
+        parsed incrementally.
+        """
+        path = catalog_path(path)
         logger.info(f"Loading properties from {path}")
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-
-        # Handle both direct array and nested structure
-        if isinstance(data, dict) and "properties" in data:
-            properties = data["properties"]
-        else:
-            properties = data
-
+        properties = read_catalog(path)
         logger.info(f"Loaded {len(properties)} properties")
         return properties
 
     def build_index(self, force_rebuild: bool = False) -> None:
         """
         Build or load FAISS index.
-        Uses cached embeddings if available.
+        Listings whose document text is in the embedding cache are not
+        re-encoded (force_rebuild encodes everything again).
         """
         logger.info("Building vector index...")
 
         # Load properties
         self.properties = self.load_properties()
 
-        # Try to load cached embeddings
-        cached = self.embedder.load_embeddings() if not force_rebuild else None
+        # Embeddings per listing, from the document cache where unchanged
+        embeddings, self.property_ids = self.embedder.embed_properties(
+            self.properties, refresh=force_rebuild
+        )
 
-        if cached is not None:
-            embeddings, self.property_ids = cached
-            logger.info("Using cached embeddings")
-        else:
-            # Generate fresh embeddings
-            logger.info("Generating embeddings for all properties...")
-            embeddings, self.property_ids = self.embedder.embed_properties(self.properties)
-            # Cache for next time
-            self.embedder.save_embeddings(embeddings, self.property_ids)
+        # Build ID mapping, catalog and keyword index
+        self._build_lookups()
+
+        # Keep the vectors for exact re-scoring of filtered/keyword candidates
+        self.embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
 
+        # Create FAISS index (Inner Product for cosine similarity with normalized vectors)
+        dimension = self.embeddings.shape[1]
+        self.index, self.index_info = build_ann_index(self.embeddings, FAISS_INDEX_TYPE)
+        self._build_neighbors()
+        self._build_synonym_vectors()
+
+        self.is_initialized = True
+        logger.info(
+            f"Index built with {self.index.ntotal} vectors (dim={dimension}, "
+            f"type={self.index_info['index_type']})"
+        )
+
+    def _build_lookups(self) -> None:
+        """Build the row-aligned structures derived from self.properties."""
         # Build ID to index mapping
         self.id_to_idx = {pid: idx for idx, pid in enumerate(self.property_ids)}
 
-        # Create FAISS index (Inner Product for cosine similarity with normalized vectors)
-        dimension = embeddings.shape[1]
-        self.index = faiss.IndexFlatIP(dimension)
+        # Build columnar catalog for structured filters
+        self.catalog = PropertyCatalog(self.properties)
 
-        # Add vectors to index
-        self.index.add(embeddings.astype(np.float32))
+        # Build keyword index once (shared by keyword and hybrid search)
+        self.keyword_index = KeywordIndex(
+            self.properties,
+            field_weights=KEYWORD_FIELD_WEIGHTS,
+            phrase_weights=KEYWORD_PHRASE_WEIGHTS
+        )
 
-        self.is_initialized = True
-        logger.info(f"Index built with {self.index.ntotal} vectors (dim={dimension})")
+    def _build_neighbors(self) -> None:
+        """Precompute the similar-properties table for small catalogs."""
+        if len(self.properties) <= SIMILAR_PRECOMPUTE_MAX:
+            self.neighbors = build_neighbor_table(self.index, self.embeddings, SIMILAR_NEIGHBORS)
+        else:
+            self.neighbors = None
 
-    def _keyword_search(
+    def _build_synonym_vectors(self) -> None:
+        """
+        Synonym vectors for embedding-space expansion: the ones shipped by
+        generate_index.py, else embedded now (one batch, ~100 terms).
+        """
+        self.synonym_vectors = load_synonym_vectors(
+            FAISS_INDEX_PATH / SYNONYM_VECTORS_FILE,
+            model_name=self.embedder.model_name,
+            dimension=self.embeddings.shape[1]
+        )
+        if self.synonym_vectors is None:
+            self.synonym_vectors = build_synonym_vectors(
+                self.embedder.encode_queries, self.embedder.model_name
+            )
+
+    def upsert_properties(
         self,
-        query: str,
         properties: List[Dict[str, Any]],
-        top_k: int = 50
-    ) -> List[Tuple[int, float]]:
+        delete_ids: Optional[List[str]] = None
+    ) -> Dict[str, int]:
+        """
+        Add, update or delete properties without a full rebuild.
+        Only new listings and listings whose document text changed are
+        embedded. Returns counts (added/updated/unchanged/deleted/embedded).
+        """
+        if not self.is_initialized:
+            raise RuntimeError("Vector store not initialized. Call build_index() first.")
+
+        result = apply_updates(
+            self.properties,
+            self.embeddings,
+            self.index,
+            properties,
+            delete_ids or [],
+            text_fn=self.embedder.create_document_text,
+            embed_fn=self.embedder.embed_texts,
+            hashes=self.content_hashes
+        )
+
+        self.properties = result["properties"]
+        self.property_ids = [p["id"] for p in self.properties]
+        self.embeddings = result["embeddings"]
+        self.index = result["index"]
+        self.content_hashes = result["hashes"]
+        self._build_lookups()
+        self._build_neighbors()
+
+        return result["stats"]
+
+    def _keyword_search(self, query: str, top_k: int = 50) -> List[Tuple[int, float]]:
         """
         Perform keyword-based search for exact/partial matches.
         Returns list of (index, score) tuples.
         """
-        query_lower = query.lower()
-        query_terms = query_lower.split()
-        results = []
-
-        for idx, prop in enumerate(properties):
-            score = 0.0
-
-            # Searchable text fields
-            name = prop.get("name", "").lower()
-            location = prop.get("location", "").lower()
-            prop_type = prop.get("type", "").lower()
-            description = prop.get("description", "").lower()
-            city = prop.get("city", "").lower()
-            features = " ".join(prop.get("features", [])).lower()
-
-            # Full query exact match (highest priority)
-            if query_lower in name:
-                score += EXACT_MATCH_BOOST * 2
-            if query_lower in location:
-                score += EXACT_MATCH_BOOST * 1.5
-            if query_lower in prop_type:
-                score += EXACT_MATCH_BOOST
-
-            # Individual term matching
-            for term in query_terms:
-                if len(term) < 2:
-                    continue
-
-                # Name matches
-                if term in name:
-                    score += PARTIAL_MATCH_BOOST
-                # Location matches
-                if term in location:
-                    score += PARTIAL_MATCH_BOOST * 0.9
-                # Type matches
-                if term in prop_type:
-                    score += PARTIAL_MATCH_BOOST * 0.8
-                # Feature matches
-                if term in features:
-                    score += PARTIAL_MATCH_BOOST * 0.7
-                # Description matches
-                if term in description:
-                    score += PARTIAL_MATCH_BOOST * 0.5
-                # City matches
-                if term in city:
-                    score += PARTIAL_MATCH_BOOST * 0.6
-
-            if score > 0:
-                results.append((idx, score))
-
-        # Sort by score descending
-        results.sort(key=lambda x: x[1], reverse=True)
-        return results[:top_k]
+        return self.keyword_index.search(query, top_k)
 
     def _extract_filters_from_query(self, query: str) -> Dict[str, Any]:
         """
         Extract structured filters from natural language query.
         E.g., "villa 4 chambres anfa" -> {type: "Villa", beds: 4, location: "anfa"}
         """
-        filters = {}
-        query_lower = query.lower()
-
-        # Property type detection
-        type_mapping = {
-            "villa": "Villa",
-            "appartement": "Appartement",
-            "appart": "Appartement",
-            "bureau": "Bureau",
-            "magasin": "Magasin",
-            "boutique": "Magasin",
-            "terrain": "Terrain",
-            "entrepôt": "Entrepôt",
-            "entrepot": "Entrepôt",
-            "studio": "Studio",
-            "duplex": "Duplex",
-            "riad": "Riad",
-            "ferme": "Ferme",
-            "immeuble": "Immeuble",
-        }
-
-        for keyword, prop_type in type_mapping.items():
-            if keyword in query_lower:
-                filters["type"] = prop_type
-                break
-
-        # Category detection
-        if any(word in query_lower for word in ["louer", "location", "à louer", "bail", "loue"]):
-            filters["category"] = "RENT"
-        elif any(word in query_lower for word in ["acheter", "vendre", "vente", "à vendre", "achat"]):
-            filters["category"] = "SALE"
-
-        # Bedroom count extraction
-        import re
-        bed_patterns = [
-            r"(\d+)\s*chambre",
-            r"(\d+)\s*ch\b",
-            r"(\d+)\s*pièce",
-            r"(\d+)\s*bedroom",
-        ]
-        for pattern in bed_patterns:
-            match = re.search(pattern, query_lower)
-            if match:
-                filters["beds"] = int(match.group(1))
-                break
-
-        # Location detection (common areas)
-        locations = [
-            "anfa", "californie", "maarif", "racine", "gauthier",
-            "bouskoura", "ain diab", "corniche", "triangle d'or",
-            "bourgogne", "palmier", "oasis", "val fleuri", "oulfa",
-            "hay hassani", "sidi maarouf", "lissasfa", "polo"
-        ]
-        for loc in locations:
-            if loc in query_lower:
-                filters["location"] = loc
-                break
-
-        # Feature detection
-        feature_keywords = {
-            "meublé": "Meublé",
-            "meuble": "Meublé",
-            "piscine": "Piscine",
-            "terrasse": "Terrasse",
-            "jardin": "Jardin",
-            "parking": "Parking",
-            "garage": "Garage",
-            "ascenseur": "Ascenseur",
-            "neuf": "Neuf",
-            "climatisation": "Climatisation",
-            "clim": "Climatisation",
-        }
-
-        detected_features = []
-        for keyword, feature in feature_keywords.items():
-            if keyword in query_lower:
-                detected_features.append(feature)
-
-        if detected_features:
-            filters["features"] = detected_features
-
-        return filters
-
-    def _apply_filters(
-        self,
-        properties: List[Dict[str, Any]],
-        filters: Dict[str, Any]
-    ) -> List[int]:
+        return analyze_query(query).filters
+
+    def _apply_filters(self, filters: Dict[str, Any]) -> np.ndarray:
         """
         Apply extracted filters to narrow down results.
         Returns indices of matching properties.
         """
-        matching_indices = []
-
-        for idx, prop in enumerate(properties):
-            matches = True
-
-            # Type filter
-            if "type" in filters and prop.get("type") != filters["type"]:
-                matches = False
-
-            # Category filter
-            if "category" in filters and prop.get("category") != filters["category"]:
-                matches = False
-
-            # Bedroom filter
-            if "beds" in filters:
-                prop_beds = prop.get("beds") or 0
-                if prop_beds < filters["beds"]:
-                    matches = False
-
-            # Location filter
-            if "location" in filters:
-                prop_location = prop.get("location", "").lower()
-                if filters["location"].lower() not in prop_location:
-                    matches = False
+        return np.flatnonzero(self.catalog.mask_from_filters(filters))
 
-            # Features filter
-            if "features" in filters:
-                prop_features = [f.lower() for f in prop.get("features", [])]
-                for required_feature in filters["features"]:
-                    if required_feature.lower() not in prop_features:
-                        matches = False
-                        break
-
-            if matches:
-                matching_indices.append(idx)
-
-        return matching_indices
+    def _queued_search(
+        self,
+        query: str,
+        k: int,
+        candidates: Optional[np.ndarray],
+        context: RequestContext
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Search through the search queue: (query vector (1, d), scores, ids).
+        The query is encoded once per request context.
+        """
+        query_vector, scores, indices = self.search_queue.search(
+            query, k, candidates, vector=context.cached_embedding(query)
+        )
+        context.embedding(query, lambda _: query_vector[0])
+        return query_vector, scores, indices
 
     def semantic_search(
         self,
         query: str,
         top_k: int = DEFAULT_TOP_K,
-        min_score: float = MIN_SIMILARITY_THRESHOLD
+        min_score: float = MIN_SIMILARITY_THRESHOLD,
+        context: Optional[RequestContext] = None
     ) -> List[Dict[str, Any]]:
         """
         Pure semantic search using FAISS.
@@ -304,12 +245,10 @@ class PropertyVectorStore:
         if not self.is_initialized:
             raise RuntimeError("Vector store not initialized. Call build_index() first.")
 
-        # Generate query embedding
-        query_embedding = self.embedder.embed_query(query)
-        query_vector = query_embedding.reshape(1, -1).astype(np.float32)
-
-        # Search FAISS index
-        scores, indices = self.index.search(query_vector, top_k)
+        # Encode (once per request with a context) and search FAISS, batched
+        # with concurrent requests
+        context = context or RequestContext(query)
+        _, scores, indices = self._queued_search(query, top_k, None, context)
 
         results = []
         for score, idx in zip(scores[0], indices[0]):
@@ -328,90 +267,143 @@ class PropertyVectorStore:
         query: str,
         top_k: int = DEFAULT_TOP_K,
         semantic_weight: float = 0.6,
-        keyword_weight: float = 0.4
+        keyword_weight: float = 0.4,
+        filters: Optional[Dict[str, Any]] = None,
+        context: Optional[RequestContext] = None,
+        expand: bool = False
     ) -> List[Dict[str, Any]]:
         """
         Hybrid search combining semantic and keyword search.
         This achieves the highest precision by leveraging both approaches.
+        Explicit filters are merged over the ones extracted from the query.
+        The request context reuses the query's analysis and embedding
+        across calls made for the same request. With expand=True the
+        query's synonyms are folded into its vector (embedding-space
+        query expansion, still one search).
+        """
+        return self.hybrid_search_many(
+            [query], [top_k], semantic_weight, keyword_weight, filters, context, expand
+        )[0]
+
+    def hybrid_search_many(
+        self,
+        queries: List[str],
+        top_ks: List[int],
+        semantic_weight: float = 0.6,
+        keyword_weight: float = 0.4,
+        filters: Optional[Dict[str, Any]] = None,
+        context: Optional[RequestContext] = None,
+        expand: bool = False
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        hybrid_search() for several queries at once (a query and its
+        expansions): query terms are resolved against the keyword index
+        once, and all queries are embedded and searched in one search
+        queue batch. One result list per query, as hybrid_search() would
+        return it.
         """
         if not self.is_initialized:
             raise RuntimeError("Vector store not initialized. Call build_index() first.")
 
-        # Step 1: Extract filters from query
-        filters = self._extract_filters_from_query(query)
-        logger.info(f"Extracted filters: {filters}")
-
-        # Step 2: Get candidate pool
-        if filters:
-            # Apply hard filters first
-            candidate_indices = self._apply_filters(self.properties, filters)
-            if not candidate_indices:
-                # If no matches with filters, fall back to full search
-                candidate_indices = list(range(len(self.properties)))
-        else:
-            candidate_indices = list(range(len(self.properties)))
-
-        logger.info(f"Candidate pool size: {len(candidate_indices)}")
-
-        # Step 3: Keyword search on candidates
-        keyword_results = self._keyword_search(query, self.properties)
-        keyword_scores = {idx: score for idx, score in keyword_results}
-
-        # Step 4: Semantic search
-        query_embedding = self.embedder.embed_query(query)
-        query_vector = query_embedding.reshape(1, -1).astype(np.float32)
-
-        # Search entire index
-        semantic_scores_raw, semantic_indices = self.index.search(query_vector, len(self.properties))
-        semantic_scores = {
-            int(idx): float(score)
-            for score, idx in zip(semantic_scores_raw[0], semantic_indices[0])
-            if idx >= 0
-        }
-
-        # Step 5: Combine scores with priority for filtered candidates
-        combined_scores = {}
-        for idx in candidate_indices:
-            sem_score = semantic_scores.get(idx, 0)
-            kw_score = keyword_scores.get(idx, 0)
-
-            # Normalize keyword score to 0-1 range
-            max_kw = max(keyword_scores.values()) if keyword_scores else 1
-            kw_score_norm = kw_score / max_kw if max_kw > 0 else 0
-
-            # Combined score
-            combined = (sem_score * semantic_weight) + (kw_score_norm * keyword_weight)
-
-            # Boost for filter matches
-            if filters:
-                combined *= 1.2  # 20% boost for filter-matching results
-
-            combined_scores[idx] = combined
-
-        # Step 6: Also include top semantic results not in candidates
-        # (for cases where filters might be too restrictive)
-        for idx, sem_score in semantic_scores.items():
-            if idx not in combined_scores and sem_score > 0.5:
-                kw_score = keyword_scores.get(idx, 0)
-                max_kw = max(keyword_scores.values()) if keyword_scores else 1
-                kw_score_norm = kw_score / max_kw if max_kw > 0 else 0
-                combined_scores[idx] = (sem_score * semantic_weight) + (kw_score_norm * keyword_weight)
-
-        # Step 7: Sort and return top results
-        sorted_indices = sorted(combined_scores.keys(), key=lambda x: combined_scores[x], reverse=True)
+        context = context or RequestContext(queries[0])
+        num_properties = len(self.properties)
+
+        # Step 1-2: Filters extracted from each query, and their candidate pools
+        plans = []
+        for query, top_k in zip(queries, top_ks):
+            parsed = context.analyze(query)
+            query_filters = {**parsed.filters, **(filters or {})}
+            logger.info(f"Extracted filters: {query_filters}")
+
+            candidate_indices = None
+            if query_filters:
+                # Apply hard filters first
+                candidate_indices = self._apply_filters(query_filters)
+                if candidate_indices.size in (0, num_properties):
+                    # No matches with filters (or nothing filtered out): full search
+                    candidate_indices = None
+
+            # Synonym centroid added to the query vector (expand=True)
+            shift = None
+            if expand and self.synonym_vectors is not None:
+                shift = self.synonym_vectors.shift(parsed.expansion_terms, SYNONYM_EXPANSION_WEIGHT)
+            plans.append((query, top_k, query_filters, candidate_indices, shift))
+
+        # Step 3: Keyword search (sparse scores from the inverted index),
+        # keeping the KEYWORD_FUSION_TOP_K best hits (ties in row order)
+        keyword_hits = []
+        for keyword_indices, keyword_values in self.keyword_index.score_many(queries):
+            best = top_k_indices(keyword_values, KEYWORD_FUSION_TOP_K)
+            keyword_hits.append((keyword_indices[best], keyword_values[best]))
+
+        # Step 4: Semantic search, pushed down into FAISS for the candidates;
+        # filtered queries also look for strong matches outside (see Step 6)
+        requests = []
+        for query, top_k, _, candidate_indices, shift in plans:
+            k = min(top_k, num_properties)
+            vector = context.cached_embedding(query)
+            requests.append(SearchRequest(query, k, candidate_indices, vector, shift))
+            if candidate_indices is not None:
+                requests.append(SearchRequest(query, k, None, vector, shift))
+        responses = iter(zip(requests, self.search_queue.search_many(requests)))
 
         results = []
-        for idx in sorted_indices[:top_k]:
-            if combined_scores[idx] < MIN_SIMILARITY_THRESHOLD * 0.5:
-                continue
-
-            property_data = self.properties[idx].copy()
-            property_data["_score"] = combined_scores[idx]
-            property_data["_semantic_score"] = semantic_scores.get(idx, 0)
-            property_data["_keyword_score"] = keyword_scores.get(idx, 0)
-            property_data["_match_type"] = "hybrid"
-            property_data["_filters_matched"] = filters
-            results.append(property_data)
+        for (query, top_k, query_filters, candidate_indices, _), (keyword_indices, keyword_values) in zip(
+            plans, keyword_hits
+        ):
+            # The searched vector (synonyms folded in) scores; the plain
+            # query embedding is what the request context memoizes
+            request, (query_vector, scores_raw, indices_raw) = next(responses)
+            context.embedding(query, lambda _: request.vector)
+
+            candidate_mask = np.ones(num_properties, dtype=bool)
+            if candidate_indices is not None:
+                candidate_mask[:] = False
+                candidate_mask[candidate_indices] = True
+
+            logger.info(f"Candidate pool size: {int(candidate_mask.sum())}")
+
+            semantic_scores = scatter_scores(num_properties, indices_raw[0], scores_raw[0])
+
+            if candidate_indices is not None:
+                # Strong semantic matches outside the candidates (see Step 6)
+                _, (_, scores_raw, indices_raw) = next(responses)
+                outside = scores_raw[0] > 0.5
+                semantic_scores[indices_raw[0][outside]] = scores_raw[0][outside]
+
+            # Exact semantic scores for keyword hits outside the FAISS top-k,
+            # so the fused ranking matches a full-index scan
+            if keyword_indices.size:
+                semantic_scores[keyword_indices] = self.embeddings[keyword_indices] @ query_vector[0]
+
+            # Step 5: Combine scores on dense arrays aligned with FAISS row ids
+            keyword_scores = scatter_scores(num_properties, keyword_indices, keyword_values)
+
+            # Normalize keyword score to 0-1 range (once, not per candidate)
+            combined_scores = (
+                semantic_scores * semantic_weight +
+                normalize_max(keyword_scores) * keyword_weight
+            )
+
+            if query_filters:
+                combined_scores[candidate_mask] *= 1.2  # 20% boost for filter-matching results
+
+            # Step 6: Also include top semantic results not in candidates
+            # (for cases where filters might be too restrictive)
+            keep_mask = candidate_mask | (semantic_scores > 0.5)
+            keep_mask &= combined_scores >= MIN_SIMILARITY_THRESHOLD * 0.5
+
+            # Step 7: Select and return top results
+            query_results = []
+            for idx in top_k_indices(combined_scores, top_k, keep_mask):
+                property_data = self.properties[idx].copy()
+                property_data["_score"] = float(combined_scores[idx])
+                property_data["_semantic_score"] = float(semantic_scores[idx])
+                property_data["_keyword_score"] = float(keyword_scores[idx])
+                property_data["_match_type"] = "hybrid"
+                property_data["_filters_matched"] = query_filters
+                query_results.append(property_data)
+            results.append(query_results)
 
         return results
 
@@ -419,22 +411,23 @@ class PropertyVectorStore:
         self,
         query: str,
         top_k: int = DEFAULT_TOP_K,
-        search_mode: str = "hybrid"
+        search_mode: str = "hybrid",
+        context: Optional[RequestContext] = None
     ) -> List[Dict[str, Any]]:
         """
         Main search interface.
         Supports: "hybrid", "semantic", "keyword"
         """
         if search_mode == "semantic":
-            return self.semantic_search(query, top_k)
+            return self.semantic_search(query, top_k, context=context)
         elif search_mode == "keyword":
-            results = self._keyword_search(query, self.properties, top_k)
+            results = self._keyword_search(query, top_k)
             return [
                 {**self.properties[idx], "_score": score, "_match_type": "keyword"}
                 for idx, score in results
             ]
         else:  # hybrid (default)
-            return self.hybrid_search(query, top_k)
+            return self.hybrid_search(query, top_k, context=context)
 
     def get_property_by_id(self, property_id: str) -> Optional[Dict[str, Any]]:
         """Get a specific property by ID."""
@@ -448,26 +441,19 @@ class PropertyVectorStore:
         property_id: str,
         top_k: int = 5
     ) -> List[Dict[str, Any]]:
-        """Find properties similar to a given property."""
+        """
+        Find properties similar to a given property.
+        Uses the precomputed neighbor table, or the stored vector
+        (no re-embedding) for larger requests.
+        """
         idx = self.id_to_idx.get(property_id)
         if idx is None:
             return []
 
-        # Get embedding for this property
-        property_text = self.embedder.create_document_text(self.properties[idx])
-        embedding = self.embedder.embed_text(property_text)
-        query_vector = embedding.reshape(1, -1).astype(np.float32)
-
-        # Search (get top_k + 1 to exclude self)
-        scores, indices = self.index.search(query_vector, top_k + 1)
+        indices, scores = similar_rows(self.index, idx, top_k, self.embeddings, self.neighbors)
 
         results = []
-        for score, result_idx in zip(scores[0], indices[0]):
-            if result_idx < 0 or result_idx == idx:
-                continue
-            if len(results) >= top_k:
-                break
-
+        for score, result_idx in zip(scores, indices):
             property_data = self.properties[result_idx].copy()
             property_data["_similarity_score"] = float(score)
             results.append(property_data)